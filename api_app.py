@@ -1,79 +1,373 @@
-from fastapi import FastAPI
+import asyncio
+import datetime
+import itertools
+import json
+import math
+from contextlib import asynccontextmanager, suppress
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+# Before the project imports below: several modules read their settings at import time
+load_dotenv()
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
-from flow.agent_flow_controller import GoldInvestmentSession, gold_investment_api, gold_purchase_node
-from database.supabase_client import SupabaseDB  # <-- ADD THIS
+from flow.conversation_engine import conversation_engine
+from flow.session_store import create_session_store
+from database.purchase_analytics import purchase_analytics, rebuild_from_db
+from database.purchase_writer import purchase_writer
+from database.transcript_log import transcript_log
+from nodes.gold_investment_node import gold_investment_api_async
+from nodes.gold_purchase_batch import MAX_BATCH_ORDERS, place_orders
+from nodes.gold_purchase_node import gold_purchase_node_async
+from utils.admission import AdmissionRejected, admission, llm_limiter
+from utils.gold_price_api import aget_current_gold_price_inr, is_live, price_cache
+from utils.clients import clients, get_db, get_llm
+from utils.metrics import MetricsMiddleware, metrics
+from utils.price_ticker import price_history, price_ticker
+from utils.quote_store import quote_store
+from utils import resilience
+from utils.resilience import DeadlineExceeded, DeadlineMiddleware, UpstreamUnavailable
+from utils.shared_state import multi_worker, worker_stats
+from utils.response_cache import response_cache
+from utils.single_flight import llm_flights
+
+def _rebuild_analytics():
+    """
+    Returns the spool cursor to follow purchases from (several workers only).
+    """
+    try:
+        cursor = purchase_writer.last_written_at()
+        pending = purchase_writer.pending_receipts()
+        rows = rebuild_from_db(purchase_analytics, get_db(), exclude=pending)
+        print(f"[Analytics] Aggregated {rows} purchases")
+    except Exception as e:
+        print(f"[Warning] Analytics rebuild failed: {e}")
+        return purchase_writer.last_written_at()
+    # Another worker may have written purchases during the rebuild: those
+    # pending beforehand were left out of it, later ones are in the DB scan
+    records, cursor = purchase_writer.written_since(cursor)
+    pending = set(pending)
+    purchase_analytics.record_many([r for r in records if r["receipt_id"] in pending])
+    return cursor
+
+async def _follow_purchases(cursor):
+    # Only the leading worker flushes the spool, so each worker picks the
+    # written purchases up from it rather than from a writer listener
+    while True:
+        await asyncio.sleep(purchase_writer.flush_interval)
+        try:
+            records, cursor = await asyncio.to_thread(purchase_writer.written_since, cursor)
+            if records:
+                purchase_analytics.record_many(records)
+        except Exception as e:
+            print(f"[Warning] Following purchases failed: {e}")
+
+async def _warm_up():
+    """
+    Runs once the server is accepting requests, so health checks answer
+    without waiting on the supabase import chain or a DB round trip.
+    Requests that arrive first build the clients they need on first use.
+    """
+    try:
+        await asyncio.to_thread(clients.startup)
+        # Rebuilt before the writer starts, so no purchase is counted twice
+        cursor = await asyncio.to_thread(_rebuild_analytics)
+    finally:
+        purchase_writer.start()  # also writes anything a previous process left in the spool
+    if multi_worker():
+        await _follow_purchases(cursor)
+
+@asynccontextmanager
+async def lifespan(app):
+    price_ticker.start()
+    # Purchases confirmed during warm-up stay in the spool until the rebuild is done
+    purchase_writer.autostart = False
+    if not multi_worker() and purchase_analytics.record_many not in purchase_writer.listeners:
+        purchase_writer.listeners.append(purchase_analytics.record_many)
+    warm_up = asyncio.create_task(_warm_up())
+    yield
+    warm_up.cancel()
+    with suppress(asyncio.CancelledError):
+        await warm_up
+    await price_ticker.stop()
+    await asyncio.to_thread(purchase_writer.stop)
+    await asyncio.to_thread(transcript_log.stop)
+    await clients.aclose()
+
+app = FastAPI(title="Gold Investment AI Agent", lifespan=lifespan)
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(UpstreamUnavailable)
+async def upstream_unavailable(request, exc: UpstreamUnavailable):
+    headers = {"Retry-After": str(math.ceil(exc.retry_after))} if exc.retry_after else None
+    return JSONResponse({"detail": "The assistant is temporarily unavailable, please try again shortly."},
+                        status_code=503, headers=headers)
 
-app = FastAPI(title="Gold Investment AI Agent")
-db = SupabaseDB()  # <-- ADD THIS
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(request, exc: AdmissionRejected):
+    return JSONResponse({"detail": f"Too many requests: {exc}. Please retry shortly."},
+                        status_code=429, headers={"Retry-After": str(math.ceil(exc.retry_after))})
 
-sessions = {}
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded(request, exc: DeadlineExceeded):
+    return JSONResponse({"detail": "The request took too long, please try again."}, status_code=504)
+
+session_store = create_session_store()
 
 class ChatRequest(BaseModel):
     user_id: str
     message: str
 
+class PurchaseRequest(ChatRequest):
+    quote_id: Optional[str] = None  # from an earlier /purchase reply; the message then carries phone and email
+
+class BatchOrder(BaseModel):
+    user_name: str
+    amount: float
+    unit: str = "INR"  # or "grams"
+    phone: str
+    email: str
+    order_id: Optional[str] = None  # partner's idempotency key
+
+class BatchPurchaseRequest(BaseModel):
+    orders: List[BatchOrder]
+    quote_only: bool = False
+    partner_id: str = "default"  # admission key; batches from one partner share its rate and pending cap
+
 @app.post("/agent")
-def agent_chat(request: ChatRequest):
-    session = sessions.get(request.user_id)
-    if not session:
-        session = GoldInvestmentSession(user_name=request.user_id)
-        sessions[request.user_id] = session
-    if session.state == "investment":
-        result = gold_investment_api(request.message, session.user_name, chat_history=session.chat_history)
-        session.chat_history.append({"role": "user", "content": request.message})
-        session.chat_history.append({"role": "assistant", "content": result["message"]})
-        if result.get("purchase_triggered"):
-            session.state = "purchase"
-            session.pending_purchase = None
-        return {
-            "reply": result["message"],
-            "state": session.state
-        }
-    elif session.state == "purchase":
-        node_result = gold_purchase_node(
-            user_message=request.message,
-            user_name=session.user_name,
-            chat_history=session.chat_history,
-            pending_purchase=session.pending_purchase,
-        )
-        session.chat_history.append({"role": "user", "content": request.message})
-        session.chat_history.append({"role": "assistant", "content": node_result["message"]})
-        if not node_result["success"] and node_result.get("pending_purchase"):
-            session.pending_purchase = node_result["pending_purchase"]
-        elif node_result["success"]:
-            session.state = "investment"
-            session.pending_purchase = None
-        return {
-            "reply": node_result["message"],
-            "state": session.state
-        }
+async def agent_chat(request: ChatRequest):
+    """
+    One conversation turn. Turns for a user run one at a time; a user over
+    their rate or with too many turns waiting gets 429 with Retry-After.
+    """
+    with admission.admit(request.user_id):
+        return await _agent_turn(request)
+
+async def _agent_turn(request: ChatRequest):
+    async with session_store.lock(request.user_id):
+        session = await session_store.aget_or_create(request.user_id)
+        turn = await conversation_engine.aturn(session, request.message)
+        await session_store.asave(request.user_id, session)
+        return turn.to_response()
+
+def _sse(data: dict, event: str = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/agent/stream")
+async def agent_chat_stream(request: ChatRequest):
+    """
+    Same conversation as /agent, streamed as Server-Sent Events.
+    Emits `data: {"token": ...}` events as reply text arrives, then one
+    `event: done` with the final {"reply", "state"}. Clients should display
+    the final reply, which replaces the streamed text when they differ
+    (e.g. a purchase-intent hand-off). If the LLM is unavailable or
+    overloaded the stream ends with `event: error` instead. Admission is
+    checked before the stream starts, as for /agent.
+    """
+    ticket = admission.admit(request.user_id)
+
+    async def events():
+        try:
+            with ticket:
+                async for event in turn_events():
+                    yield event
+        except (UpstreamUnavailable, DeadlineExceeded, AdmissionRejected) as e:
+            yield _sse({"error": str(e)}, event="error")
+
+    async def turn_events():
+        async with session_store.lock(request.user_id):
+            session = await session_store.aget_or_create(request.user_id)
+            async for event in conversation_engine.astream(session, request.message):
+                if event["type"] == "token":
+                    yield _sse({"token": event["text"]})
+                else:
+                    await session_store.asave(request.user_id, session)
+                    yield _sse({"reply": event["turn"].reply, "state": event["turn"].state}, event="done")
+
+    # The background task releases the ticket if the client left before the stream started
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"},
+                             background=BackgroundTask(ticket.release))
 
 @app.post("/investment-chat")
-def investment_only(request: ChatRequest):
-    result = gold_investment_api(request.message, request.user_id, chat_history=[])
+async def investment_only(request: ChatRequest):
+    with admission.admit(request.user_id):
+        result = await gold_investment_api_async(request.message, request.user_id, chat_history=[])
     return {"reply": result["message"]}
 
 @app.post("/purchase")
-def direct_purchase(request: ChatRequest):
-    node_result = gold_purchase_node(
-        user_message=request.message,
-        user_name=request.user_id,
-        chat_history=[],
-        pending_purchase=None
-    )
-    return {"reply": node_result["message"]}
+async def direct_purchase(request: PurchaseRequest):
+    """
+    Stateless purchase in two calls: a message with an amount returns a
+    `quote_id` holding the price; sending that `quote_id` back with a message
+    carrying phone and email confirms it and returns a `receipt_id`.
+    Admission is checked as for /agent.
+    """
+    pending = {"quote_id": request.quote_id, "user_name": request.user_id} if request.quote_id else None
+    with admission.admit(request.user_id):
+        node_result = await gold_purchase_node_async(
+            user_message=request.message,
+            user_name=request.user_id,
+            chat_history=[],
+            pending_purchase=pending
+        )
+    response = {"reply": node_result["message"]}
+    if node_result.get("receipt_id"):
+        response["receipt_id"] = node_result["receipt_id"]
+    elif node_result.get("pending_purchase"):
+        response["quote_id"] = node_result["pending_purchase"]["quote_id"]
+    return response
+
+@app.post("/purchase/batch")
+async def purchase_batch(request: BatchPurchaseRequest):
+    """
+    Quotes (and, unless quote_only, places) up to PURCHASE_BATCH_MAX_ORDERS
+    INR or gram orders at a single gold price. Orders failing validation are
+    returned as rejected with their errors; the rest get grams, rupees and a
+    receipt_id for /purchase/status. Answers 503 rather than trade at the
+    static fallback or a stale price while the price API is down. Admission
+    is checked per `partner_id`, as /agent checks it per user.
+    """
+    if len(request.orders) > MAX_BATCH_ORDERS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_ORDERS} orders per batch")
+    with admission.admit(f"batch:{request.partner_id}"):
+        price = await aget_current_gold_price_inr()
+        if not is_live(price):
+            raise HTTPException(status_code=503, detail="The live gold price is unavailable, please retry shortly.",
+                                headers={"Retry-After": "30"})
+        orders = [order.model_dump() for order in request.orders]
+        result = await asyncio.to_thread(place_orders, orders, price, request.quote_only)
+    return JSONResponse(result)  # already JSON-safe; skips the encoder's walk over every order
+
+@app.get("/purchase/status/{receipt_id}")
+def purchase_status(receipt_id: str):
+    """
+    Persistence status of a confirmed purchase: pending (queued locally),
+    written (stored in the database) or failed (gave up after retries).
+    """
+    status = purchase_writer.status(receipt_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown receipt ID")
+    return status
+
+@app.get("/portfolio/{user_id}")
+async def get_portfolio(user_id: str):
+    """
+    Holdings of one user: total grams, amount invested, average cost per gram
+    and unrealised P&L at the current gold price. Served from memory.
+    """
+    price = await aget_current_gold_price_inr()
+    portfolio = purchase_analytics.portfolio(user_id, price["price_per_gram"])
+    if portfolio is None:
+        raise HTTPException(status_code=404, detail="No purchases for this user")
+    return portfolio
+
+@app.get("/stats/daily")
+def get_daily_stats(days: int = 30):
+    """
+    Platform purchase volume per day (purchases, grams, rupees, distinct users)
+    for the most recent `days` days with purchases, newest first.
+    """
+    return {"days": purchase_analytics.daily(days)}
 
 @app.get("/")
 def root():
     return {"message": "Gold Investment Agent multi-API is running!"}
 
+@app.get("/price/history")
+def get_price_history(limit: int = 60):
+    """
+    Returns the most recent ticks recorded by the background price ticker, newest first.
+    Never calls the upstream price API.
+    """
+    ticks = [
+        {
+            "timestamp": datetime.datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S"),
+            "price_per_gram": price,
+        }
+        for ts, price in price_history.recent(limit)
+    ]
+    return {"ticks": ticks, "count": len(ticks)}
+
+@app.get("/cache/stats")
+def cache_stats():
+    """
+    Returns hit/miss/staleness counters for the in-process caches.
+    """
+    return {
+        "price": price_cache.stats(),
+        "responses": response_cache.stats(),
+        "sessions": session_store.stats(),
+        "quotes": quote_store.stats(),
+        "transcripts": transcript_log.stats(),
+        "worker": worker_stats(),
+    }
+
+@app.get("/metrics")
+def get_metrics(format: str = "prometheus"):
+    """
+    Latency histograms for every node, upstream call, DB call and endpoint,
+    circuit breaker state and retry/hedge counters per upstream, and the LLM
+    router's per-model latency and error averages and coalesced vs issued
+    LLM calls, in the Prometheus text format; format=json returns
+    p50/p95/p99 per span and the routing order.
+    """
+    try:
+        router = get_llm()
+    except ValueError:
+        router = None  # LLM not configured
+    if format == "json":
+        return {**metrics.snapshot(), "upstreams": resilience.upstream_stats(),
+                "llm_router": router.stats() if router else None, "llm_coalescing": llm_flights.stats(),
+                "admission": {"users": admission.stats(), "llm": llm_limiter.stats()}}
+    text = metrics.render_prometheus() + resilience.render_prometheus() + llm_flights.render_prometheus("llm")
+    if router:
+        text += router.render_prometheus()
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+def _ndjson(chunks):
+    for rows in chunks:
+        yield "".join(json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in rows)
+
 @app.get("/transactions")
-def get_transactions():
+def get_transactions(
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    user_name: Optional[str] = None,
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    columns: Optional[str] = None,
+    format: str = "json",
+):
     """
-    Returns all gold purchases from the database as JSON.
+    Returns gold purchases newest first, one page at a time. Pass the returned
+    `next_cursor` as `cursor` to get the next page; it is null on the last page.
+    `columns` is a comma-separated projection. With format=ndjson every matching
+    row is streamed as newline-delimited JSON (limit and cursor are ignored).
     """
+    filters = {
+        "user_name": user_name,
+        "since": since.isoformat() if since else None,
+        "until": until.isoformat() if until else None,
+        "min_amount": min_amount,
+        "max_amount": max_amount,
+    }
+    fields = [c.strip() for c in columns.split(",") if c.strip()] if columns else None
     try:
-        transactions = db.get_all_purchases()
-        return {"transactions": transactions}
+        if format == "ndjson":
+            chunks = get_db().iter_purchases(columns=fields, **filters)
+            first = next(chunks, [])  # surfaces bad input and DB errors before the 200 goes out
+            return StreamingResponse(_ndjson(itertools.chain([first], chunks)), media_type="application/x-ndjson")
+        transactions, next_cursor = get_db().get_purchases(limit, cursor, fields, **filters)
+        return {"transactions": transactions, "next_cursor": next_cursor}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         return {"error": str(e), "transactions": []}
@@ -0,0 +1,105 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+import re
+import time
+
+from tests.test_amount_parser import generate_cases
+from utils.amount_parser import parse_amount
+
+
+# The previous implementation, kept here as the baseline
+def legacy_parse_amount(user_message):
+    message = user_message.lower()
+
+    # 1. Number in digits (with or without units/rupees/grams)
+    matches = re.findall(r'(\d+(?:\.\d+)?)(?:\s*)(rupees?|rs\.?|₹|inr|grams?|g\b)?', message)
+    for match in matches:
+        num, unit = match
+        amount = float(num)
+        # Normalize and guess unit
+        if unit:
+            if 'gram' in unit or 'g' == unit.strip('.'):
+                return {"amount": amount, "unit": "grams"}
+            else:
+                return {"amount": amount, "unit": "INR"}
+        else:
+            # No explicit unit: assume INR for amounts >= 10, grams for < 10
+            return {"amount": amount, "unit": "INR" if amount >= 10 else "grams"}
+
+    # 2. Numbers in words (rudimentary support for English, e.g. "one thousand")
+    words_to_numbers = {
+        "zero": 0,
+        "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+        "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+        "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50,
+        "hundred": 100, "thousand": 1000, "lakh": 100000, "crore": 10000000
+    }
+    # Trivial logic: look for "X thousand/lakh/crore"
+    for key in ["thousand", "lakh", "crore"]:
+        pattern = r'(\w+)\s*' + key
+        match = re.search(pattern, message)
+        if match and match.group(1) in words_to_numbers:
+            base = words_to_numbers[match.group(1)]
+            total = base * words_to_numbers[key]
+            # Guess unit
+            if "gram" in message:
+                return {"amount": total, "unit": "grams"}
+            else:
+                return {"amount": total, "unit": "INR"}
+    # Example: "one hundred", "two thousand"
+    match = re.search(r'(one|two|three|four|five|six|seven|eight|nine|ten)\s*(hundred|thousand|lakh|crore)', message)
+    if match:
+        n = words_to_numbers[match.group(1)]
+        mult = words_to_numbers[match.group(2)]
+        amount = n * mult
+        if "gram" in message:
+            return {"amount": amount, "unit": "grams"}
+        else:
+            return {"amount": amount, "unit": "INR"}
+
+    return None
+
+def us_per_message(fn, messages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for message in messages:
+            fn(message)
+    return (time.perf_counter() - start) / (repeat * len(messages)) * 1e6
+
+
+def parsed_correctly(fn, cases):
+    correct = 0
+    for message, amount, unit in cases:
+        parsed = fn(message)
+        correct += bool(parsed) and abs(parsed["amount"] - amount) < 1e-6 and parsed["unit"] == unit
+    return correct
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Amount parser cost per message and coverage on a generated corpus")
+    parser.add_argument("--cases", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    cases = generate_cases(random.Random(args.seed), args.cases)
+    groups = {
+        "all": cases,
+        "with digits": [case for case in cases if re.search(r"\d", case[0])],
+        "spelled out": [case for case in cases if not re.search(r"\d", case[0])],
+    }
+    print(f"{'':<24}{'us/message':>12}{'correct':>20}")
+    for group, batch in groups.items():
+        messages = [message for message, _, _ in batch]
+        for label, fn in (("legacy", legacy_parse_amount), ("parser", parse_amount)):
+            cost = us_per_message(fn, messages, args.repeat)
+            correct = parsed_correctly(fn, batch)
+            print(f"{group + ' / ' + label:<24}{cost:>12.2f}{correct:>13}/{len(batch)} ({correct / len(batch):.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import datetime
+import random
+import statistics
+import time
+
+from fastapi.testclient import TestClient
+
+import api_app
+from database.purchase_analytics import PurchaseAnalytics
+
+
+def generate_chunks(rows, users, chunk_size=1000, seed=7):
+    rng = random.Random(seed)
+    start = datetime.datetime(2023, 1, 1)
+    chunk = []
+    for i in range(rows):
+        grams = round(rng.uniform(0.01, 5), 4)
+        chunk.append({
+            "user_name": f"user{rng.randint(1, users)}",
+            "grams": grams,
+            "amount_inr": round(grams * rng.uniform(6000, 8000), 2),
+            "purchase_time": (start + datetime.timedelta(seconds=30 * i)).isoformat(),
+            "receipt_id": f"GP-{i:016X}",
+        })
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def latency_ms(client, path, requests):
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = client.get(path)
+        samples.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.text
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analytics rebuild cost and /portfolio, /stats/daily latency")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    chunks = list(generate_chunks(args.rows, args.users))
+    print(f"{args.rows} purchases by up to {args.users} users\n")
+
+    analytics = PurchaseAnalytics()
+    start = time.perf_counter()
+    analytics.rebuild(chunks)
+    print(f"rebuild, NumPy                 {time.perf_counter() - start:8.2f} s")
+
+    looped = PurchaseAnalytics()
+    start = time.perf_counter()
+    for chunk in chunks:
+        looped.record_many(chunk)
+    print(f"rebuild, row-by-row            {time.perf_counter() - start:8.2f} s")
+
+    async def price():
+        return {"price_per_gram": 7250.0}
+
+    api_app.purchase_analytics = analytics
+    api_app.aget_current_gold_price_inr = price
+    client = TestClient(api_app.app)
+    print(f"\n{'endpoint (in-process client)':<30}{'p50 ms':>8}{'p99 ms':>8}")
+    for path in ("/portfolio/user42", "/stats/daily?days=30", "/stats/daily?days=365"):
+        p50, p99 = latency_ms(client, path, args.requests)
+        print(f"{path:<30}{p50:>8.2f}{p99:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stubs import serve_llm_stub
+
+# Starlette runs sync endpoints on an AnyIO thread pool capped at 40 threads
+SYNC_THREADPOOL_SIZE = 40
+
+
+def bench_sync(requests_total):
+    from nodes.gold_investment_node import gold_investment_api
+
+    def turn(i):
+        gold_investment_api(f"Is digital gold safe? #{i}", "Bench", chat_history=[])
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=SYNC_THREADPOOL_SIZE) as pool:
+        list(pool.map(turn, range(requests_total)))
+    return time.perf_counter() - start
+
+
+async def bench_async(requests_total, concurrency):
+    from nodes.gold_investment_node import gold_investment_api_async
+    from utils.http_client import close_http_clients
+
+    sem = asyncio.Semaphore(concurrency)
+
+    async def turn(i):
+        async with sem:
+            await gold_investment_api_async(f"Is digital gold safe? #{i}", "Bench", chat_history=[])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(turn(i) for i in range(requests_total)))
+    elapsed = time.perf_counter() - start
+    await close_http_clients()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync vs async /agent turn throughput against a mock LLM")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2, help="mock LLM latency (s)")
+    args = parser.parse_args()
+
+    stub = serve_llm_stub(latency=args.latency, token_latency=0)
+    os.environ.update({
+        "OPENROUTER_API_URL": stub.url,
+        "OPENROUTER_API_KEY": "bench",
+        "LLAMA_MODEL_ID": "bench/model",
+    })
+
+    print(f"{args.requests} LLM turns, mock latency {args.latency * 1000:.0f} ms\n")
+    elapsed = bench_sync(args.requests)
+    print(f" sync ({SYNC_THREADPOOL_SIZE} threads): {args.requests / elapsed:8.1f} req/s")
+    elapsed = asyncio.run(bench_async(args.requests, args.concurrency))
+    print(f"async ({args.concurrency} in flight): {args.requests / elapsed:8.1f} req/s")
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+
+
+def per_call_us(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-request client construction cost vs. shared clients")
+    parser.add_argument("-n", type=int, default=200)
+    args = parser.parse_args()
+
+    # Offline placeholders: nothing below makes a network call
+    os.environ.setdefault("OPENROUTER_API_URL", "http://127.0.0.1:9/v1/chat/completions")
+    os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+    os.environ.setdefault("LLAMA_MODEL_ID", "bench/model")
+    os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+    os.environ.setdefault("SUPABASE_KEY", "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.bench")
+
+    from database.supabase_client import SupabaseDB
+    from model.custom_llm import LlamaInstructLLM
+    from utils.clients import get_db, get_llm
+
+    get_llm(), get_db()  # warm the shared instances
+    rows = [
+        ("LlamaInstructLLM()", per_call_us(LlamaInstructLLM, args.n), per_call_us(get_llm, args.n)),
+        ("SupabaseDB()", per_call_us(SupabaseDB, args.n), per_call_us(get_db, args.n)),
+    ]
+    print(f"{'client':<20}{'per-call build (us)':>22}{'shared lookup (us)':>22}")
+    for name, built, shared in rows:
+        print(f"{name:<20}{built:>22.1f}{shared:>22.2f}")
+
+
+if __name__ == "__main__":
+    main()
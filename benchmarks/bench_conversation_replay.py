@@ -0,0 +1,144 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+
+from benchmarks.bench_load import conversation
+
+# Turn kinds from bench_load.conversation that the engine answers without the LLM
+LOCAL_KINDS = ("price", "purchase_intent", "quote", "confirm")
+PRICE = {"price_per_gram": 7253.47, "currency": "INR", "source": "bench", "last_updated": "2026-01-01 10:00"}
+
+
+def synthetic_log(users, with_llm=False):
+    """
+    (user_id, message) turns of `users` bench_load conversations, interleaved
+    turn by turn as concurrent users would send them.
+    """
+    convs = [[m for kind, m in conversation(i) if with_llm or kind in LOCAL_KINDS] for i in range(users)]
+    return [(f"user{i}", conv[t]) for t in range(max(map(len, convs))) for i, conv in enumerate(convs)
+            if t < len(conv)]
+
+
+def read_log(path):
+    """
+    A recorded log: a transcript directory (database/transcript_log.py), or
+    JSON lines with "user_id" and "message" in arrival order.
+    """
+    if os.path.isdir(path):
+        from database.transcript_log import iter_transcripts
+        return [(r["user_id"], r["message"]) for r in sorted(iter_transcripts(path), key=lambda r: r["timestamp"])]
+    with open(path, encoding="utf-8") as f:
+        return [(r["user_id"], r["message"]) for r in map(json.loads, f) if r.get("message")]
+
+
+def replay_http(client, log, run):
+    for user_id, message in log:
+        response = client.post("/agent", json={"user_id": f"{run}-{user_id}", "message": message})
+        assert response.status_code == 200, response.text
+
+
+async def replay_turns(engine, log, sessions):
+    for user_id, message in log:
+        await engine.aturn(sessions[user_id], message)
+
+
+async def replay_batches(engine, log, sessions, batch):
+    for start in range(0, len(log), batch):
+        await engine.arun_batch([(sessions[u], m) for u, m in log[start:start + batch]])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replays a conversation log through /agent and the conversation engine")
+    parser.add_argument("--log", help="transcript directory or JSONL of {user_id, message}; default is a synthetic log")
+    parser.add_argument("--users", type=int, default=2000, help="conversations in the synthetic log")
+    parser.add_argument("--with-llm", action="store_true", help="keep the synthetic log's LLM turns")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="mock LLM latency (s)")
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    from benchmarks.stubs import serve_llm_stub
+
+    stub = serve_llm_stub(latency=args.llm_latency, token_latency=0)
+    workdir = tempfile.mkdtemp()
+    os.environ.update({
+        "OPENROUTER_API_URL": stub.url,
+        "OPENROUTER_API_KEY": "bench",
+        "LLAMA_MODEL_ID": "bench/model",
+        "PURCHASE_SPOOL_PATH": os.path.join(workdir, "purchase_spool.db"),
+        "TRANSCRIPT_DIR": os.path.join(workdir, "transcripts"),
+        "ADMISSION_USER_BURST": "1000000",
+        "LLM_MAX_QUEUE": "1000000",  # a batch's LLM turns all queue for the concurrency slots at once
+    })
+
+    from fastapi.testclient import TestClient
+
+    import api_app
+    import nodes.gold_investment_node as investment_node
+    import nodes.gold_purchase_node as purchase_node
+    from database.purchase_writer import purchase_writer
+    from flow.agent_flow_controller import GoldInvestmentSession
+    from flow.conversation_engine import conversation_engine
+    from utils.http_client import close_http_clients
+
+    async def aprice():
+        return PRICE
+
+    for module in (investment_node, purchase_node):
+        module.get_current_gold_price_inr = lambda: PRICE
+        module.aget_current_gold_price_inr = aprice
+    # Measure the turns, not the flush to the DB
+    purchase_writer.start = lambda: None
+    purchase_writer.stop = lambda timeout=None: None
+
+    log = read_log(args.log) if args.log else synthetic_log(args.users, args.with_llm)
+    users = {u for u, _ in log}
+
+    def fresh_sessions():
+        return {u: GoldInvestmentSession(u) for u in users}
+
+    def best(run):
+        times = []
+        for i in range(args.repeat):
+            start = time.perf_counter()
+            run(i)
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    async def abest(replay):
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            await replay(fresh_sessions())
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    async def engine_rows():
+        # One event loop for all runs: the pooled async HTTP client is bound to it
+        rows = [
+            ("engine.aturn, one turn each", await abest(lambda s: replay_turns(conversation_engine, log, s))),
+            (f"engine.arun_batch({args.batch})",
+             await abest(lambda s: replay_batches(conversation_engine, log, s, args.batch))),
+        ]
+        await close_http_clients()
+        return rows
+
+    with TestClient(api_app.app) as client:
+        rows = [("POST /agent, one turn each", best(lambda i: replay_http(client, log, i)))]
+    rows += asyncio.run(engine_rows())
+    stub.stop()
+
+    print(f"{len(log)} turns from {len(users)} conversations\n")
+    print(f"{'replay':<32}{'best s':>10}{'turns/s':>12}")
+    for label, elapsed in rows:
+        print(f"{label:<32}{elapsed:>10.3f}{len(log) / elapsed:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import time
+
+from benchmarks.stubs import serve_llm_stub
+
+QUESTIONS = [
+    "What is a sovereign gold bond and how is it taxed?",
+    "Is digital gold safe compared to physical gold jewellery?",
+    "How do gold ETFs differ from gold mutual funds in India?",
+    "Should I invest monthly through a SIP or buy a lump sum?",
+]
+
+
+def converse(turns, window):
+    import nodes.gold_investment_node as node
+
+    node.history_window = window
+    history, summary_state = [], {}
+    samples = {}
+    for turn in range(1, turns + 1):
+        message = f"{QUESTIONS[turn % len(QUESTIONS)]} (turn {turn})"
+        messages = node._build_messages("Bench", history, summary_state)
+        _, payload = node.get_llm()._build_request(message, messages, 0.2, 1024)
+        start = time.perf_counter()
+        result = node.gold_investment_api(message, "Bench", chat_history=history, summary_state=summary_state)
+        elapsed = time.perf_counter() - start
+        history.append({"role": "user", "content": message})
+        history.append({"role": "assistant", "content": result["message"] * 4})  # realistic answer length
+        if turn in (1, 10, 50, 100, 150, 200) or turn == turns:
+            samples[turn] = (len(json.dumps(payload)), elapsed)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM payload size and latency over a long conversation")
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--budget", type=int, default=1500, help="history token budget")
+    args = parser.parse_args()
+
+    stub = serve_llm_stub(latency=0.01, token_latency=0, prefill_latency_per_kb=0.002)
+    os.environ.update({
+        "OPENROUTER_API_URL": stub.url,
+        "OPENROUTER_API_KEY": "bench",
+        "LLAMA_MODEL_ID": "bench/model",
+    })
+    from utils.history_window import HistoryWindow
+
+    full = converse(args.turns, HistoryWindow(budget_tokens=10 ** 9))
+    windowed = converse(args.turns, HistoryWindow(budget_tokens=args.budget))
+    print(f"{'turn':>5} {'full KB':>9} {'full ms':>9} {'window KB':>10} {'window ms':>10}")
+    for turn in sorted(full):
+        (fb, fl), (wb, wl) = full[turn], windowed[turn]
+        print(f"{turn:>5} {fb / 1024:>9.1f} {fl * 1000:>9.1f} {wb / 1024:>10.1f} {wl * 1000:>10.1f}")
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
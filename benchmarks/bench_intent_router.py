@@ -0,0 +1,74 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+import re
+import time
+from collections import Counter
+
+from tests.test_intent_router import load_corpus
+from utils.intent_router import INTENT_LLM, classify_intent
+
+# The previous implementation, kept here as the baseline
+LEGACY_PRICE_KEYWORDS = [
+    r'gold.*(price|rate|cost|value)',
+    r'(price|rate|cost|value).*gold',
+    r'price.*per\s?gram',
+    r'current.*gold.*(price|rate|cost)',
+    r'digital gold.*price',
+    r'price of.*digital gold',
+    r'digital gold rate',
+    r'(24|22|18)-?karat.*gold.*(price|rate)',
+    r'current.*price',
+    r'today.*gold.*price',
+    r'gold.*today',
+    r'gram.*gold.*price',
+    r'1\s*gram.*gold.*price',
+    r'how much.*gold.*price',
+    r'gold.*per gram'
+]
+
+
+def legacy_is_gold_rate_query(text):
+    text = text.lower()
+    for kw in LEGACY_PRICE_KEYWORDS:
+        if re.search(kw, text):
+            return True
+    return False
+
+
+def us_per_message(fn, messages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for message in messages:
+            fn(message)
+    return (time.perf_counter() - start) / (repeat * len(messages)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Intent router cost per message and LLM-call reduction")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    messages = [text for _, text in corpus]
+    rng = random.Random(7)
+    filler = "i have been reading about investments and my family keeps asking about savings "
+    long_messages = [filler * rng.randint(5, 20) + text for text in messages]
+
+    print(f"{'':<28}{'legacy (us)':>12}{'router (us)':>12}")
+    for label, batch in (("corpus messages", messages), ("long messages (~1 KB)", long_messages)):
+        legacy = us_per_message(legacy_is_gold_rate_query, batch, args.repeat)
+        router = us_per_message(classify_intent, batch, args.repeat)
+        print(f"{label:<28}{legacy:>12.2f}{router:>12.2f}")
+
+    routed = Counter(classify_intent(text) for text in messages)
+    legacy_local = sum(legacy_is_gold_rate_query(text) for text in messages)
+    print(f"\nturns answered without the LLM: legacy {legacy_local}/{len(messages)}, "
+          f"router {len(messages) - routed[INTENT_LLM]}/{len(messages)} {dict(routed)}")
+
+
+if __name__ == "__main__":
+    main()
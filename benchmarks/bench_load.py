@@ -0,0 +1,309 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import socket
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+from benchmarks.bench_transactions import SCHEMA
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+OPENERS = [
+    "Is digital gold a good investment?",
+    "Should I invest in gold or mutual funds?",
+    "How safe is digital gold?",
+    "What are the benefits of digital gold?",
+    "Can I start investing in gold with a small amount?",
+]
+
+# Summary metrics compared against a baseline, and which direction is worse
+HIGHER_IS_BETTER = {"requests_per_second": True, "p50_ms": False, "p95_ms": False, "p99_ms": False,
+                    "error_rate": False, "memory_per_session_kb": False}
+
+
+def conversation(i):
+    """
+    The turns of conversation `i`, as (kind, message): two investment
+    questions around a price check, then the three purchase steps.
+    """
+    return [
+        ("opening", OPENERS[i % len(OPENERS)]),
+        ("price", "What is today's gold rate per gram?"),
+        ("follow_up", "How is it taxed if I sell after 3 years?"),
+        ("purchase_intent", "I want to buy gold"),
+        ("quote", f"Buy gold worth {1000 + (i % 50) * 100} rupees"),
+        ("confirm", f"98{i % 10 ** 8:08d} bench{i}@example.com"),
+    ]
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def _serve_stubs(config, db_path, urls, commands):
+    from benchmarks.stubs import serve_llm_stub, serve_postgrest_stub, serve_price_stub
+    stubs = {
+        "llm": serve_llm_stub(latency=config["llm_latency"], token_latency=0,
+                              error_rate=config["error_rate"], seed=config["seed"]),
+        "price": serve_price_stub(latency=config["price_latency"], error_rate=config["error_rate"],
+                                  seed=config["seed"] + 1),
+        "supabase": serve_postgrest_stub(db_path, latency=config["db_latency"], error_rate=config["error_rate"],
+                                         seed=config["seed"] + 2),
+    }
+    urls.put({name: stub.url for name, stub in stubs.items()})
+    while commands.get() == "stats":
+        urls.put({name: {"calls": stub.calls, "errors": stub.errors} for name, stub in stubs.items()})
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _rss_kb(pid):
+    # Linux only; memory per session is reported as unavailable elsewhere
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+
+def _count(db_path, table):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def start_app(urls, workdir, port):
+    env = dict(
+        os.environ,
+        OPENROUTER_API_URL=urls["llm"], OPENROUTER_API_KEY="bench", LLAMA_MODEL_ID="bench/model",
+        GOLDPRICE_API_URL=urls["price"], GOLDPRICE_API_KEY="bench",
+        SUPABASE_URL=urls["supabase"], SUPABASE_KEY="bench.bench.bench",
+        PURCHASE_SPOOL_PATH=os.path.join(workdir, "purchase_spool.db"),
+        SESSION_STORE="memory", GOLDPRICE_POLL_INTERVAL="0",
+    )
+    log = open(os.path.join(workdir, "api_app.log"), "w")
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api_app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return app
+        except httpx.HTTPError:
+            if app.poll() is not None:
+                raise RuntimeError("api_app exited during startup")
+            time.sleep(0.1)
+    app.terminate()
+    raise RuntimeError("api_app did not start within 60s")
+
+
+async def run_load(base_url, first, conversations, concurrency):
+    """
+    Runs conversations first..first+conversations-1, `concurrency` at a time,
+    each as a separate user. Returns (seconds, latencies by kind, errors by
+    kind, errors by cause).
+    """
+    latencies = defaultdict(list)
+    errors = Counter()
+    causes = Counter()
+    sem = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        async def converse(i):
+            async with sem:
+                for kind, message in conversation(i):
+                    start = time.perf_counter()
+                    try:
+                        response = await client.post("/agent", json={"user_id": f"bench{i}", "message": message})
+                        cause = None if response.status_code == 200 else f"HTTP {response.status_code}"
+                    except httpx.HTTPError as e:
+                        cause = type(e).__name__
+                    latencies[kind].append(time.perf_counter() - start)
+                    if cause:
+                        errors[kind] += 1
+                        causes[cause] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(converse(i) for i in range(first, first + conversations)))
+        return time.perf_counter() - start, latencies, errors, causes
+
+
+def summarize(seconds, latencies, errors, causes):
+    every = sorted(s for samples in latencies.values() for s in samples)
+    ms = lambda s: None if s is None else round(s * 1000, 2)
+    return {
+        "requests": len(every),
+        "seconds": round(seconds, 3),
+        "requests_per_second": round(len(every) / seconds, 1),
+        "p50_ms": ms(percentile(every, 0.5)),
+        "p95_ms": ms(percentile(every, 0.95)),
+        "p99_ms": ms(percentile(every, 0.99)),
+        "error_rate": round(sum(errors.values()) / len(every), 4),
+        "error_causes": dict(causes),
+        "by_turn": {
+            kind: {"p50_ms": ms(percentile(sorted(samples), 0.5)), "p95_ms": ms(percentile(sorted(samples), 0.95)),
+                   "errors": errors[kind]}
+            for kind, samples in latencies.items()
+        },
+    }
+
+
+def compare(result, baseline, tolerance):
+    """
+    Prints each summary metric against `baseline`; returns the names of those
+    that got worse by more than `tolerance` (a fraction).
+    """
+    if baseline["config"] != result["config"]:
+        print("[Warning] baseline was run with a different configuration")
+    print(f"\n{'vs baseline':<24}{'baseline':>12}{'now':>12}{'change':>9}")
+    regressions = []
+    for name, higher_is_better in HIGHER_IS_BETTER.items():
+        old, new = baseline["summary"].get(name), result["summary"].get(name)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old if old else (0.0 if new == old else float("inf"))
+        worse = -change if higher_is_better else change
+        flag = "  REGRESSION" if worse > tolerance and name != "error_rate" or (
+            name == "error_rate" and new > old + tolerance / 10) else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<24}{old:>12}{new:>12}{change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load test: concurrent investment-to-purchase conversations against api_app with stub upstreams")
+    parser.add_argument("--conversations", type=int, default=200, help="conversations per run (6 turns each)")
+    parser.add_argument("--concurrency", type=int, default=50, help="conversations in flight")
+    parser.add_argument("--runs", type=int, default=3, help="measured runs; the median run is reported")
+    parser.add_argument("--warmup", type=int, default=20, help="conversations before measuring")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--price-latency", type=float, default=0.05)
+    parser.add_argument("--db-latency", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub calls failing with 503")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON from --save; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative regression")
+    args = parser.parse_args()
+    config = {k: getattr(args, k) for k in ("conversations", "concurrency", "runs", "warmup", "llm_latency",
+                                            "price_latency", "db_latency", "error_rate", "seed")}
+
+    workdir = tempfile.mkdtemp(prefix="bench_load_")
+    db_path = os.path.join(workdir, "supabase.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute(SCHEMA)
+    conn.commit()
+    conn.close()
+
+    # Stubs and app each get their own process so neither skews the other
+    urls, commands = multiprocessing.Queue(), multiprocessing.Queue()
+    stubs = multiprocessing.Process(target=_serve_stubs, args=(config, db_path, urls, commands), daemon=True)
+    stubs.start()
+    stub_urls = urls.get(timeout=30)
+    port = _free_port()
+    app = start_app(stub_urls, workdir, port)
+    base_url = f"http://127.0.0.1:{port}"
+
+    try:
+        print(f"{args.runs} x {args.conversations} conversations, {args.concurrency} in flight; "
+              f"stub latency llm {args.llm_latency * 1000:.0f} ms, price {args.price_latency * 1000:.0f} ms, "
+              f"db {args.db_latency * 1000:.0f} ms, error rate {args.error_rate:.1%}\n")
+        asyncio.run(run_load(base_url, 0, args.warmup, args.concurrency))
+        rss_before = _rss_kb(app.pid)
+
+        runs = []
+        print(f"{'run':<6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+        for run in range(args.runs):
+            first = args.warmup + run * args.conversations
+            runs.append(summarize(*asyncio.run(run_load(base_url, first, args.conversations, args.concurrency))))
+            r = runs[-1]
+            print(f"{run + 1:<6}{r['requests_per_second']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}"
+                  f"{r['error_rate']:>8.1%}")
+
+        sessions = args.runs * args.conversations
+        rss_after = _rss_kb(app.pid)
+        median = sorted(runs, key=lambda r: r["requests_per_second"])[len(runs) // 2]
+        summary = {k: median[k] for k in ("requests_per_second", "p50_ms", "p95_ms", "p99_ms", "error_rate")}
+        summary["rps_spread"] = round(
+            (max(r["requests_per_second"] for r in runs) - min(r["requests_per_second"] for r in runs))
+            / statistics.median(r["requests_per_second"] for r in runs), 3)
+        summary["memory_per_session_kb"] = (
+            round((rss_after - rss_before) / sessions, 2) if rss_before and rss_after else None
+        )
+        server = httpx.get(f"{base_url}/cache/stats").json()["sessions"]
+        if server.get("sessions"):
+            summary["session_store_bytes_per_session"] = round(server["bytes"] / server["sessions"])
+
+        print(f"\nmedian run, by turn:\n{'turn':<18}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}")
+        for kind, stats in median["by_turn"].items():
+            print(f"{kind:<18}{stats['p50_ms']:>9}{stats['p95_ms']:>9}{stats['errors']:>8}")
+        if median["error_causes"]:
+            print("errors by cause: " + ", ".join(f"{c} {n}" for c, n in median["error_causes"].items()))
+        print(f"\nmemory per session: {summary['memory_per_session_kb']} KB RSS, "
+              f"{summary.get('session_store_bytes_per_session')} bytes in the session store")
+        print(f"run-to-run req/s spread: {summary['rps_spread']:.1%}")
+
+        spans = httpx.get(f"{base_url}/metrics", params={"format": "json"}).json()["spans"]
+        print(f"\nserver spans:\n{'span':<24}{'count':>8}{'p50 ms':>9}{'p95 ms':>9}")
+        for name, stats in spans.items():
+            print(f"{name:<24}{stats['count']:>8}{stats['p50_ms']:>9}{stats['p95_ms']:>9}")
+
+        # Confirmed purchases reach the stub database through the write-behind spool
+        deadline = time.monotonic() + 10
+        while True:
+            confirmed = _count(os.path.join(workdir, "purchase_spool.db"), "purchase_spool")
+            written = _count(db_path, "gold_purchases")
+            if written >= confirmed or time.monotonic() > deadline:
+                break
+            time.sleep(0.2)
+        commands.put("stats")
+        upstream = urls.get(timeout=10)
+        print(f"\npurchases written: {written} of {confirmed} confirmed")
+        print(f"server log: {os.path.join(workdir, 'api_app.log')}")
+        print("stub calls: " + ", ".join(f"{n} {s['calls']} ({s['errors']} failed)" for n, s in upstream.items()))
+    finally:
+        app.terminate()
+        app.wait(10)
+        commands.put("stop")
+
+    result = {"config": config, "summary": summary, "runs": runs, "spans": spans, "upstream": upstream}
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nsaved to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\nregressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
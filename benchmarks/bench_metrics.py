@@ -0,0 +1,88 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import time
+
+from utils.metrics import Metrics, _request_spans
+
+
+def per_call_ns(func, iterations):
+    start = time.perf_counter_ns()
+    func(iterations)
+    return (time.perf_counter_ns() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-span overhead of utils.metrics")
+    parser.add_argument("--iterations", type=int, default=500_000)
+    args = parser.parse_args()
+    registry = Metrics()
+
+    def bare(n):
+        for _ in range(n):
+            pass
+
+    def with_span(n):
+        span = registry.span
+        for _ in range(n):
+            with span("bench.span"):
+                pass
+
+    def with_span_in_request(n):
+        spans = []
+        token = _request_spans.set(spans)
+        try:
+            with_span(n)
+        finally:
+            _request_spans.reset(token)
+
+    @registry.timed("bench.timed")
+    def timed():
+        pass
+
+    def plain():
+        pass
+
+    def call(func):
+        def loop(n):
+            for _ in range(n):
+                func()
+        return loop
+
+    @registry.timed("bench.timed_async")
+    async def atimed():
+        pass
+
+    async def aplain():
+        pass
+
+    def acall(func):
+        def loop(n):
+            async def run():
+                for _ in range(n):
+                    await func()
+            asyncio.run(run())
+        return loop
+
+    n = args.iterations
+    baseline = per_call_ns(bare, n)
+    rows = [
+        ("with span()", per_call_ns(with_span, n) - baseline),
+        ("with span(), inside a request", per_call_ns(with_span_in_request, n) - baseline),
+        ("@timed sync function", per_call_ns(call(timed), n) - per_call_ns(call(plain), n)),
+        ("@timed async function", per_call_ns(acall(atimed), n) - per_call_ns(acall(aplain), n)),
+    ]
+    print(f"{'overhead per span':<32}{'ns':>8}")
+    for label, ns in rows:
+        print(f"{label:<32}{ns:>8.0f}")
+
+    start = time.perf_counter()
+    text = registry.render_prometheus()
+    print(f"\n/metrics render ({len(text.splitlines())} lines): {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
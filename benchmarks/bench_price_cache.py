@@ -0,0 +1,49 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stubs import serve_price_stub
+
+
+def run(fn, threads, calls_per_thread):
+    def worker(_):
+        for _ in range(calls_per_thread):
+            fn()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, range(threads)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gold price cache throughput vs. direct upstream calls")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--calls", type=int, default=20, help="calls per thread")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub upstream latency (s)")
+    args = parser.parse_args()
+
+    stub = serve_price_stub(latency=args.latency)
+    os.environ["GOLDPRICE_API_URL"] = stub.url
+    os.environ["GOLDPRICE_API_KEY"] = "bench"
+    from utils.gold_price_api import fetch_gold_price_inr, get_current_gold_price_inr, price_cache
+
+    total = args.threads * args.calls
+    print(f"{total} price lookups over {args.threads} threads, upstream latency {args.latency * 1000:.0f} ms\n")
+
+    for label, fn in (("uncached", fetch_gold_price_inr), ("cached", get_current_gold_price_inr)):
+        price_cache.clear()
+        stub.calls = 0
+        elapsed = run(fn, args.threads, args.calls)
+        print(f"{label:>9}: {total / elapsed:10.1f} req/s  {elapsed * 1000:8.1f} ms total  upstream calls: {stub.calls}")
+
+    print("\ncache stats:", price_cache.stats())
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
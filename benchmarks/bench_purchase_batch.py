@@ -0,0 +1,95 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+
+PRICE = {"price_per_gram": 7253.47, "currency": "INR", "source": "bench", "last_updated": "2026-01-01 10:00"}
+
+
+def generate_orders(n, seed=1):
+    rng = random.Random(seed)
+    orders = []
+    for i in range(n):
+        grams = rng.random() < 0.3
+        orders.append({
+            "user_name": f"user{i % 500}",
+            "amount": round(rng.uniform(0.01, 5), 3) if grams else float(rng.choice([100, 500, 1000, 2500, 5000])),
+            "unit": "grams" if grams else "INR",
+            "phone": f"9{rng.randrange(10 ** 9):09d}",
+            "email": f"user{i % 500}@example.com",
+            "order_id": f"sip-{seed}-{i}",
+        })
+    return orders
+
+
+def best_ms(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times), statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of /purchase/batch")
+    parser.add_argument("--orders", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    workdir = tempfile.mkdtemp()
+    os.environ["PURCHASE_SPOOL_PATH"] = os.path.join(workdir, "purchase_spool.db")
+    os.environ["PURCHASE_BATCH_MAX_ORDERS"] = str(args.orders)
+
+    from fastapi.testclient import TestClient
+
+    import api_app
+    from database.purchase_writer import PurchaseWriter, purchase_writer
+    from nodes.gold_purchase_batch import _quote_loop, place_orders, quote_amounts
+
+    orders = generate_orders(args.orders)
+    amounts = [o["amount"] for o in orders]
+    in_grams = [o["unit"] == "grams" for o in orders]
+    rows = [
+        ("quote, Python loop", best_ms(lambda: _quote_loop(amounts, in_grams, 7253.47), args.repeat)),
+        ("quote, NumPy", best_ms(lambda: quote_amounts(amounts, in_grams, 7253.47), args.repeat)),
+    ]
+
+    run = [0]
+
+    def place():
+        # Fresh order IDs each run, so every run really spools its orders
+        run[0] += 1
+        writer = PurchaseWriter(os.path.join(workdir, f"spool-{run[0]}.db"))
+        writer.start = lambda: None
+        place_orders(generate_orders(args.orders, seed=run[0]), PRICE, writer=writer)
+
+    rows.append(("validate + quote + spool", best_ms(place, args.repeat)))
+
+    async def price():
+        return PRICE
+
+    api_app.aget_current_gold_price_inr = price
+    purchase_writer.start = lambda: None  # measure the request, not the flush to the DB
+    client = TestClient(api_app.app)
+    bodies = [{"orders": generate_orders(args.orders, seed=1000 + i)} for i in range(args.repeat)]
+    bodies_iter = iter(bodies)
+
+    def request():
+        response = client.post("/purchase/batch", json=next(bodies_iter))
+        assert response.status_code == 200 and response.json()["placed"] == args.orders
+
+    rows.append(("POST /purchase/batch", best_ms(request, args.repeat)))
+
+    print(f"{args.orders} orders per batch\n")
+    print(f"{'stage':<28}{'best ms':>10}{'median ms':>12}{'orders/s':>12}")
+    for label, (best, median) in rows:
+        print(f"{label:<28}{best:>10.1f}{median:>12.1f}{args.orders / median * 1000:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
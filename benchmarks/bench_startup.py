@@ -0,0 +1,118 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import re
+import statistics
+import subprocess
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.bench_load import _free_port
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported on first use or by the post-startup warm-up, never by `import api_app`
+DEFERRED_MODULES = ("supabase", "postgrest", "gotrue", "numpy", "httpx", "requests")
+
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_profile(module):
+    """
+    Runs `python -X importtime -c "import <module>"` in a fresh interpreter.
+    Returns (cumulative ms for `module`, {top-level package: self ms}).
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=REPO, capture_output=True, text=True, check=True)
+    total, packages = None, {}
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, _, name = match.groups()
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0.0) + int(self_us) / 1000
+        if name == module:
+            total = int(cumulative_us) / 1000
+    return total, packages
+
+
+def eagerly_imported(module):
+    code = f"import sys, {module}; print(' '.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO, capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+
+def first_response_ms(workdir):
+    """
+    Milliseconds from launching uvicorn to the first 200 from `/`, with
+    Supabase configured but unreachable.
+    """
+    port = _free_port()
+    env = dict(
+        os.environ,
+        SUPABASE_URL="http://127.0.0.1:9", SUPABASE_KEY="bench.bench.bench",
+        OPENROUTER_API_URL="http://127.0.0.1:9", OPENROUTER_API_KEY="bench", LLAMA_MODEL_ID="bench/model",
+        PURCHASE_SPOOL_PATH=os.path.join(workdir, f"spool-{port}.db"), GOLDPRICE_POLL_INTERVAL="0",
+    )
+    start = time.perf_counter()
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api_app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < 60:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                    return (time.perf_counter() - start) * 1000
+            except httpx.HTTPError:
+                if app.poll() is not None:
+                    raise RuntimeError("api_app exited during startup")
+            time.sleep(0.01)
+        raise RuntimeError("api_app did not answer within 60s")
+    finally:
+        app.terminate()
+        app.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start: import time of api_app and time to the first response")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement; medians are reported")
+    parser.add_argument("--top", type=int, default=10, help="packages to list by import time")
+    parser.add_argument("--import-budget-ms", type=float, default=0,
+                        help="exit 1 if `import api_app` takes longer (0: no budget)")
+    parser.add_argument("--response-budget-ms", type=float, default=0,
+                        help="exit 1 if the first response takes longer (0: no budget)")
+    args = parser.parse_args()
+
+    profiles = [import_profile("api_app") for _ in range(args.runs)]
+    import_ms = statistics.median(total for total, _ in profiles)
+    packages = {name: statistics.median(p.get(name, 0.0) for _, p in profiles) for name in profiles[0][1]}
+    print(f"import api_app: {import_ms:.0f} ms (median of {args.runs})\n")
+    print(f"{'package':<24}{'self ms':>10}")
+    for name, ms in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:<24}{ms:>10.1f}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        response_ms = statistics.median(first_response_ms(workdir) for _ in range(args.runs))
+    print(f"\nlaunch to first response from /: {response_ms:.0f} ms (median of {args.runs})")
+
+    failures = []
+    eager = eagerly_imported("api_app")
+    if eager:
+        failures.append(f"imported at startup instead of on first use: {', '.join(eager)}")
+    if args.import_budget_ms and import_ms > args.import_budget_ms:
+        failures.append(f"import time {import_ms:.0f} ms is over the {args.import_budget_ms:.0f} ms budget")
+    if args.response_budget_ms and response_ms > args.response_budget_ms:
+        failures.append(f"first response {response_ms:.0f} ms is over the {args.response_budget_ms:.0f} ms budget")
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.stubs import serve_llm_stub
+
+
+async def measure(turns):
+    from nodes.gold_investment_node import gold_investment_api_async, gold_investment_stream_async
+    from utils.http_client import close_http_clients
+
+    full, first, total = [], [], []
+    for i in range(turns):
+        start = time.perf_counter()
+        await gold_investment_api_async(f"Is digital gold safe? #{i}", "Bench")
+        full.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        first_token = None
+        async for event in gold_investment_stream_async(f"Is digital gold safe? #{i}", "Bench"):
+            if event["type"] == "token" and first_token is None:
+                first_token = time.perf_counter() - start
+        first.append(first_token)
+        total.append(time.perf_counter() - start)
+    await close_http_clients()
+    return full, first, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time to first byte: full completion vs. streamed reply")
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.3, help="mock LLM delay before first token (s)")
+    parser.add_argument("--token-latency", type=float, default=0.03, help="mock LLM delay per token (s)")
+    args = parser.parse_args()
+
+    stub = serve_llm_stub(latency=args.latency, token_latency=args.token_latency)
+    os.environ.update({
+        "OPENROUTER_API_URL": stub.url,
+        "OPENROUTER_API_KEY": "bench",
+        "LLAMA_MODEL_ID": "bench/model",
+    })
+    full, first, total = asyncio.run(measure(args.turns))
+    ms = lambda xs: statistics.median(xs) * 1000
+    print(f"full completion, first byte: {ms(full):8.1f} ms")
+    print(f"streamed, first token:       {ms(first):8.1f} ms")
+    print(f"streamed, complete:          {ms(total):8.1f} ms")
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import datetime
+import multiprocessing
+import random
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+
+from database.purchase_query import ORDER, encode_cursor
+
+SCHEMA = (
+    "CREATE TABLE gold_purchases ("
+    "id INTEGER PRIMARY KEY, user_name TEXT NOT NULL, phone TEXT NOT NULL, email TEXT NOT NULL, "
+    "grams REAL NOT NULL, amount_inr REAL NOT NULL, price_per_gram REAL NOT NULL, "
+    "purchase_time TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP, receipt_id TEXT UNIQUE)"
+)
+
+
+def build_db(path, rows, seed=7):
+    """
+    Creates a gold_purchases table with `rows` synthetic purchases, or reuses
+    the file at `path` if it already holds that many.
+    """
+    if os.path.exists(path):
+        conn = sqlite3.connect(path)
+        try:
+            if conn.execute("SELECT count(*) FROM gold_purchases").fetchone()[0] == rows:
+                return
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            conn.close()
+        os.remove(path)
+    rng = random.Random(seed)
+    start = datetime.datetime(2023, 1, 1)
+
+    def generate():
+        t = start
+        for i in range(1, rows + 1):
+            t += datetime.timedelta(seconds=rng.randint(0, 60))
+            rupees = round(rng.uniform(100, 50000), 2)
+            yield (i, f"user{rng.randint(1, 1000)}", f"9{rng.randint(100000000, 999999999)}", f"u{i}@example.com",
+                   round(rupees / 7250, 4), rupees, 7250.0, t.isoformat(), f"GP-{i:016X}")
+
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute(SCHEMA)
+        conn.executemany("INSERT INTO gold_purchases VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", generate())
+        conn.execute("CREATE INDEX gold_purchases_time_id ON gold_purchases (purchase_time DESC, id DESC)")
+        conn.execute("CREATE INDEX gold_purchases_user ON gold_purchases (user_name, purchase_time DESC, id DESC)")
+    conn.close()
+
+
+def _serve(db_path, urls):
+    from benchmarks.stubs import serve_postgrest_stub
+    urls.put(serve_postgrest_stub(db_path).url)
+    while True:
+        time.sleep(3600)
+
+
+def measure(fn):
+    """
+    Returns (result, seconds, peak MB allocated while running fn). Timing and
+    memory come from separate runs since tracemalloc slows allocation down.
+    """
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    result = fn()
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/transactions: full select vs keyset pages and streaming export")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--page", type=int, default=1000)
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "bench_gold_purchases.db"))
+    parser.add_argument("--skip-full", action="store_true", help="skip the single select(*) baseline")
+    args = parser.parse_args()
+
+    print(f"building {args.rows} rows in {args.db} ...")
+    build_db(args.db, args.rows)
+
+    # The stub runs in its own process so its allocations don't count below
+    urls = multiprocessing.Queue()
+    server = multiprocessing.Process(target=_serve, args=(args.db, urls), daemon=True)
+    server.start()
+    os.environ["SUPABASE_URL"] = urls.get(timeout=30)
+    os.environ["SUPABASE_KEY"] = "bench.bench.bench"
+    from database.supabase_client import SupabaseDB
+    db = SupabaseDB()
+    table = db.client.table("gold_purchases")
+
+    print(f"\n{'':<36}{'rows':>10}{'seconds':>10}{'peak MB':>10}")
+
+    def report(label, rows, seconds, peak):
+        print(f"{label:<36}{rows:>10}{seconds:>10.3f}{peak:>10.1f}")
+
+    if not args.skip_full:
+        try:
+            rows, seconds, peak = measure(lambda: table.select("*").order("purchase_time", desc=True).execute().data)
+            report("select(*) in one response (old)", len(rows), seconds, peak)
+            del rows
+        except Exception as e:
+            print(f"{'select(*) in one response (old)':<36}  failed: {type(e).__name__}: {e}")
+
+    count, seconds, peak = measure(lambda: sum(len(rows) for rows in db.iter_purchases(args.page)))
+    report(f"iter_purchases, {args.page}-row pages", count, seconds, peak)
+
+    (rows, _), seconds, peak = measure(lambda: db.get_purchases(args.page))
+    report("first page", len(rows), seconds, peak)
+
+    (rows, _), seconds, peak = measure(lambda: db.get_purchases(args.page, user_name="user42"))
+    report("first page, user_name filter", len(rows), seconds, peak)
+
+    # A page at the far end of the table: OFFSET has to skip every earlier row
+    depth = max(0, args.rows - args.page - 1)
+
+    def offset_page():
+        query = table.select("*")
+        query.params = query.params.add("order", ORDER)
+        return query.limit(args.page).offset(depth).execute().data
+
+    rows, seconds, peak = measure(offset_page)
+    report(f"page at offset {depth} (OFFSET)", len(rows), seconds, peak)
+
+    conn = sqlite3.connect(args.db)
+    purchase_time, row_id = conn.execute(
+        f"SELECT purchase_time, id FROM gold_purchases ORDER BY purchase_time DESC, id DESC LIMIT 1 OFFSET {depth - 1}"
+    ).fetchone() if depth else (None, None)
+    conn.close()
+    cursor = encode_cursor({"purchase_time": purchase_time, "id": row_id}) if depth else None
+    (rows, _), seconds, peak = measure(lambda: db.get_purchases(args.page, cursor))
+    report(f"page at offset {depth} (keyset)", len(rows), seconds, peak)
+
+    server.terminate()
+
+
+if __name__ == "__main__":
+    main()
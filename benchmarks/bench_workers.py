@@ -0,0 +1,141 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import multiprocessing
+import subprocess
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.bench_load import REPO, _free_port, percentile
+
+PRICE_QUESTION = "What is today's gold rate per gram?"
+
+
+def start_workers(workers, price_url, workdir, port, session_store):
+    """
+    Starts api_app under uvicorn with `workers` processes and waits until
+    every one of them answers.
+    """
+    env = dict(
+        os.environ,
+        WEB_CONCURRENCY=str(workers),
+        SHARED_STATE_DIR=os.path.join(workdir, "shared_state"),
+        SESSION_STORE=session_store, SESSION_DB_PATH=os.path.join(workdir, "sessions.db"),
+        QUOTE_STORE="sqlite", QUOTE_DB_PATH=os.path.join(workdir, "quotes.db"),
+        PURCHASE_SPOOL_PATH=os.path.join(workdir, "purchase_spool.db"),
+        TRANSCRIPT_DIR=os.path.join(workdir, "transcripts"),
+        GOLDPRICE_API_URL=price_url, GOLDPRICE_API_KEY="bench", GOLDPRICE_POLL_INTERVAL="1",
+        OPENROUTER_API_URL="http://127.0.0.1:9/unused", OPENROUTER_API_KEY="bench", LLAMA_MODEL_ID="bench/model",
+        ADMISSION_USER_RATE="1000000", ADMISSION_USER_BURST="1000000",
+    )
+    log = open(os.path.join(workdir, "api_app.log"), "w")
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api_app:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=REPO, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    pids, deadline = set(), time.monotonic() + 120
+    while time.monotonic() < deadline:
+        try:
+            # New connections spread over the workers; each reports its PID
+            pids.add(httpx.get(f"http://127.0.0.1:{port}/cache/stats", timeout=2).json()["worker"]["pid"])
+            if len(pids) >= workers:
+                return app
+        except httpx.HTTPError:
+            if app.poll() is not None:
+                raise RuntimeError("api_app exited during startup")
+            time.sleep(0.1)
+    app.terminate()
+    raise RuntimeError(f"only {len(pids)} of {workers} workers answered within 120s")
+
+
+async def _drive(base_url, client, users, concurrency, duration):
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=30, limits=limits) as http:
+        stop_at = time.perf_counter() + duration
+
+        async def loop(k):
+            nonlocal errors
+            i = k
+            while time.perf_counter() < stop_at:
+                start = time.perf_counter()
+                try:
+                    response = await http.post("/agent", json={"user_id": f"w{client}-{i % users}",
+                                                               "message": PRICE_QUESTION})
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - start)
+                errors += not ok
+                i += concurrency
+
+        await asyncio.gather(*(loop(k) for k in range(concurrency)))
+    return latencies, errors
+
+
+def client_process(args):
+    # One load generator: `concurrency` connections sending price questions for `duration` seconds
+    return asyncio.run(_drive(*args))
+
+
+def measure(base_url, clients, users, concurrency, duration):
+    with multiprocessing.Pool(clients) as pool:
+        results = pool.map(client_process, [(base_url, c, users, concurrency, duration) for c in range(clients)])
+    latencies = sorted(s for samples, _ in results for s in samples)
+    return len(latencies) / duration, percentile(latencies, 0.5), percentile(latencies, 0.99), \
+        sum(errors for _, errors in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Throughput of price-question turns with 1 to --max-workers uvicorn workers")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--clients", type=int, default=None,
+                        help="load generator processes (default: --max-workers, the same for every run)")
+    parser.add_argument("--concurrency", type=int, default=32, help="connections per client process")
+    parser.add_argument("--users", type=int, default=500, help="users per client process")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per worker count")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--session-store", default="sqlite", choices=("sqlite", "memory"),
+                        help="memory is only consistent with one worker")
+    args = parser.parse_args()
+    clients = args.clients or args.max_workers
+
+    from benchmarks.stubs import serve_price_stub
+
+    price = serve_price_stub(latency=0.0)
+    counts = sorted({1, *(2 ** k for k in range(1, args.max_workers.bit_length())), args.max_workers})
+    rows = []
+    try:
+        for workers in counts:
+            workdir, port = tempfile.mkdtemp(), _free_port()
+            app = start_workers(workers, price.url, workdir, port, args.session_store)
+            base_url = f"http://127.0.0.1:{port}"
+            try:
+                measure(base_url, clients, args.users, args.concurrency, args.warmup)
+                rows.append((workers, *measure(base_url, clients, args.users, args.concurrency, args.duration)))
+            finally:
+                app.terminate()
+                app.wait(30)
+    finally:
+        price.stop()
+
+    print(f"{clients} client processes x {args.concurrency} connections, {args.duration:.0f}s per run, "
+          f"{os.cpu_count()} CPUs, sessions in {args.session_store}")
+    print(f"price API calls: {price.calls}\n")
+    print(f"{'workers':>8}{'req/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}{'speedup':>9}{'efficiency':>12}")
+    base = rows[0][1]
+    for workers, rps, p50, p99, errors in rows:
+        speedup = rps / base
+        print(f"{workers:>8}{rps:>10.0f}{p50 * 1000:>9.1f}{p99 * 1000:>9.1f}{errors:>8}{speedup:>8.2f}x"
+              f"{speedup / workers:>11.0%}")
+
+
+if __name__ == "__main__":
+    main()
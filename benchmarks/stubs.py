@@ -0,0 +1,302 @@
+"""
+Local stand-ins for the upstream services, used by the benchmark scripts.
+Each stub runs a threaded HTTP server on 127.0.0.1 in a daemon thread, with
+a configurable latency and a seeded rate of injected 503 errors.
+"""
+import json
+import random
+import sqlite3
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, unquote
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, handler, latency=0.0, error_rate=0.0, seed=0):
+        super().__init__(("127.0.0.1", 0), handler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._calls_lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count_call(self):
+        """
+        Counts one call and returns True if it should fail with an injected error.
+        """
+        with self._calls_lock:
+            self.calls += 1
+            fail = self.error_rate > 0 and self._rng.random() < self.error_rate
+            self.errors += fail
+            return fail
+
+    def handle_error(self, request, client_address):
+        # Clients giving up mid-response (timeouts, benchmarks stopping) are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so client connection pooling is exercised
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, body, status=200):
+        raw = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _read_body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _send_injected_error(self):
+        self._send_json({"error": {"message": "injected stub error"}}, status=503)
+
+
+class _PriceHandler(_JSONHandler):
+    def do_GET(self):
+        if self.server.count_call():
+            self._send_injected_error()
+            return
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        # Same shape as API Ninjas /commodityprice (price per 10 grams)
+        self._send_json({"name": "Gold Futures", "price": 72500.0, "updated": int(time.time())})
+
+
+def serve_price_stub(latency=0.05, error_rate=0.0, seed=0):
+    """
+    Starts a stub API Ninjas gold price server. Returns the running server;
+    use `server.url` as GOLDPRICE_API_URL and `server.calls` to count hits.
+    """
+    return _StubServer(_PriceHandler, latency=latency, error_rate=error_rate, seed=seed).start()
+
+
+class _LLMHandler(_JSONHandler):
+    def do_POST(self):
+        raw = self._read_body()
+        if self.server.count_call():
+            self._send_injected_error()
+            return
+        length = len(raw)
+        body = json.loads(raw or b"{}")
+        # Prompt processing time grows with the request size
+        time.sleep(self.server.latency + self.server.prefill_latency_per_kb * length / 1024)
+        text = f"Digital gold lets you invest from ₹10. You asked: {body.get('messages', [{}])[-1].get('content', '')}"
+        if body.get("stream"):
+            self._stream_reply(text)
+            return
+        # A full completion costs the whole generation time before anything is sent
+        time.sleep(self.server.token_latency * len(text.split(" ")))
+        # Same shape as an OpenAI-compatible /chat/completions response
+        self._send_json({
+            "id": "stub",
+            "model": body.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }],
+        })
+
+    def _stream_reply(self, text):
+        # OpenAI-compatible SSE: one delta per word, then [DONE]; body ends at close
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        for word in text.split(" "):
+            chunk = {"choices": [{"index": 0, "delta": {"content": word + " "}}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(self.server.token_latency)
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+def serve_llm_stub(latency=0.2, token_latency=0.02, prefill_latency_per_kb=0.0, error_rate=0.0, seed=0):
+    """
+    Starts a stub OpenRouter chat completions server. `latency` is the delay
+    before the first token, `token_latency` the delay between streamed tokens,
+    `prefill_latency_per_kb` extra delay per KB of request body.
+    Use `server.url` as OPENROUTER_API_URL.
+    """
+    server = _StubServer(_LLMHandler, latency=latency, error_rate=error_rate, seed=seed)
+    server.token_latency = token_latency
+    server.prefill_latency_per_kb = prefill_latency_per_kb
+    return server.start()
+
+
+_SQL_OPS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+
+def _split_top_level(text):
+    parts, depth, start = [], 0, 0
+    for i, ch in enumerate(text):
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def _postgrest_condition(text, columns):
+    # "col.op.value" or "and(...)" / "or(...)", as used in PostgREST's or= filter
+    for logic in ("and", "or"):
+        if text.startswith(logic + "("):
+            parts = [_postgrest_condition(p, columns) for p in _split_top_level(text[len(logic) + 1:-1])]
+            return "(" + f" {logic.upper()} ".join(sql for sql, _ in parts) + ")", [a for _, args in parts for a in args]
+    column, op, value = text.split(".", 2)
+    if column not in columns or op not in _SQL_OPS:
+        raise ValueError(f"unsupported filter {text!r}")
+    return f"{column} {_SQL_OPS[op]} ?", [value.strip('"')]
+
+
+def postgrest_to_sql(table, params, columns):
+    """
+    Translates the subset of PostgREST GET query params that SupabaseDB sends
+    (select, order, limit, offset, col=op.value filters, or=(...)) into SQLite.
+    """
+    select, where, args, order, limit, offset = "*", [], [], "", "", ""
+    for key, value in params:
+        if key == "select":
+            if value != "*" and not set(value.split(",")) <= set(columns):
+                raise ValueError(f"unknown column in select={value}")
+            select = value
+        elif key == "order":
+            terms = []
+            for term in value.split(","):
+                column, _, direction = term.partition(".")
+                if column not in columns:
+                    raise ValueError(f"unknown order column {column!r}")
+                terms.append(f"{column} {'DESC' if direction.startswith('desc') else 'ASC'}")
+            order = " ORDER BY " + ", ".join(terms)
+        elif key == "limit":
+            limit = f" LIMIT {int(value)}"
+        elif key == "offset":
+            offset = f" OFFSET {int(value)}"
+        elif key == "or":
+            sql, condition_args = _postgrest_condition("or" + value, columns)
+            where.append(sql)
+            args += condition_args
+        else:
+            sql, condition_args = _postgrest_condition(f"{key}.{value}", columns)
+            where.append(sql)
+            args += condition_args
+    if offset and not limit:
+        limit = " LIMIT -1"
+    sql = f"SELECT {select} FROM {table}" + (" WHERE " + " AND ".join(where) if where else "")
+    return sql + order + limit + offset, args
+
+
+class _PostgrestHandler(_JSONHandler):
+    def _table(self):
+        path, _, query = self.path.partition("?")
+        table = unquote(path.rstrip("/").rsplit("/", 1)[-1])
+        if table not in self.server.tables:
+            self._send_json({"message": f"relation {table!r} does not exist"}, status=404)
+            return None, None
+        return table, parse_qsl(query, keep_blank_values=True)
+
+    def _execute(self, sql, args, many=False):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        conn = sqlite3.connect(self.server.db_path, timeout=30)
+        try:
+            conn.row_factory = sqlite3.Row
+            if many:
+                with conn:
+                    return [dict(row) for row_args in args for row in conn.execute(sql, row_args)]
+            return [dict(row) for row in conn.execute(sql, args)]
+        finally:
+            conn.close()
+
+    def do_GET(self):
+        self._read_body()  # postgrest-py sends "{}" on GETs
+        if self.server.count_call():
+            self._send_injected_error()
+            return
+        table, params = self._table()
+        if table is None:
+            return
+        try:
+            sql, args = postgrest_to_sql(table, params, self.server.tables[table])
+        except ValueError as e:
+            self._send_json({"message": str(e)}, status=400)
+            return
+        self._send_json(self._execute(sql, args))
+
+    def do_POST(self):
+        # insert / upsert; on_conflict with resolution=ignore-duplicates skips existing keys
+        body = json.loads(self._read_body() or b"[]")
+        if self.server.count_call():
+            self._send_injected_error()
+            return
+        table, _ = self._table()
+        if table is None:
+            return
+        rows = body if isinstance(body, list) else [body]
+        columns = self.server.tables[table]
+        names = sorted({key for row in rows for key in row})
+        if not rows or not set(names) <= set(columns):
+            self._send_json({"message": f"unknown column in {names}"}, status=400)
+            return
+        prefer = self.headers.get("Prefer", "")
+        verb = "INSERT OR IGNORE" if "resolution=ignore-duplicates" in prefer else "INSERT"
+        sql = (f"{verb} INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))}) "
+               "RETURNING *")
+        try:
+            inserted = self._execute(sql, [[row.get(n) for n in names] for row in rows], many=True)
+        except sqlite3.IntegrityError as e:
+            unique = "UNIQUE" in str(e)
+            self._send_json({"message": str(e), "code": "23505" if unique else "23502"}, status=409 if unique else 400)
+            return
+        if "return=minimal" in prefer:
+            self.send_response(201)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        else:
+            self._send_json(inserted, status=201)
+
+
+def serve_postgrest_stub(db_path, latency=0.0, error_rate=0.0, seed=0):
+    """
+    Starts a PostgREST stand-in serving the tables of a SQLite file under
+    /rest/v1/: filtered selects and inserts/upserts. Use `server.url` as
+    SUPABASE_URL with any JWT-shaped SUPABASE_KEY.
+    """
+    server = _StubServer(_PostgrestHandler, latency=latency, error_rate=error_rate, seed=seed)
+    server.db_path = db_path
+    conn = sqlite3.connect(db_path)
+    try:
+        names = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        server.tables = {name: [r[1] for r in conn.execute(f"PRAGMA table_info({name})")] for name in names}
+    finally:
+        conn.close()
+    return server.start()
@@ -0,0 +1,210 @@
+import threading
+
+from database.purchase_query import MAX_PAGE_SIZE
+
+# Columns the aggregates are built from
+ANALYTICS_COLUMNS = ["user_name", "grams", "amount_inr", "purchase_time", "receipt_id"]
+
+
+def _timestamp(value) -> str:
+    # "2024-01-01T10:00:00.123", "2024-01-01 10:00:00" -> "2024-01-01T10:00:00"
+    return str(value)[:19].replace(" ", "T")
+
+
+class Holding:
+    __slots__ = ("purchases", "grams", "invested", "first_purchase", "last_purchase")
+
+    def __init__(self, purchases=0, grams=0.0, invested=0.0, first_purchase=None, last_purchase=None):
+        self.purchases = purchases
+        self.grams = grams
+        self.invested = invested
+        self.first_purchase = first_purchase
+        self.last_purchase = last_purchase
+
+
+class DailyVolume:
+    __slots__ = ("purchases", "grams", "amount_inr", "users")
+
+    def __init__(self):
+        self.purchases = 0
+        self.grams = 0.0
+        self.amount_inr = 0.0
+        self.users = set()
+
+
+def _add(holdings, daily, row):
+    name = row["user_name"]
+    grams = float(row["grams"])
+    amount = float(row["amount_inr"])
+    ts = _timestamp(row["purchase_time"])
+    holding = holdings.get(name)
+    if holding is None:
+        holding = holdings[name] = Holding(first_purchase=ts, last_purchase=ts)
+    holding.purchases += 1
+    holding.grams += grams
+    holding.invested += amount
+    holding.first_purchase = min(holding.first_purchase, ts)
+    holding.last_purchase = max(holding.last_purchase, ts)
+    volume = daily.get(ts[:10])
+    if volume is None:
+        volume = daily[ts[:10]] = DailyVolume()
+    volume.purchases += 1
+    volume.grams += grams
+    volume.amount_inr += amount
+    volume.users.add(name)
+
+
+def _aggregate_numpy(np, chunks, exclude):
+    # Rows are reduced to per-chunk column arrays as they stream in, then
+    # grouped per user and per day with bincount / ufunc.at.
+    user_parts, gram_parts, amount_parts, time_parts = [], [], [], []
+    for chunk in chunks:
+        rows = [row for row in chunk if row.get("receipt_id") not in exclude] if exclude else chunk
+        if not rows:
+            continue
+        user_parts.append(np.array([r["user_name"] for r in rows], dtype=str))
+        gram_parts.append(np.array([r["grams"] for r in rows], dtype=np.float64))
+        amount_parts.append(np.array([r["amount_inr"] for r in rows], dtype=np.float64))
+        # U19 keeps "YYYY-MM-DD?HH:MM:SS"; NumPy parses either separator
+        time_parts.append(np.array([r["purchase_time"] for r in rows], dtype="U19").astype("datetime64[s]"))
+    if not user_parts:
+        return {}, {}, 0
+    names, user_idx = np.unique(np.concatenate(user_parts), return_inverse=True)
+    names = names.tolist()
+    grams = np.concatenate(gram_parts)
+    amounts = np.concatenate(amount_parts)
+    times = np.concatenate(time_parts)
+
+    n_users = len(names)
+    counts = np.bincount(user_idx, minlength=n_users)
+    user_grams = np.bincount(user_idx, weights=grams, minlength=n_users)
+    user_invested = np.bincount(user_idx, weights=amounts, minlength=n_users)
+    first = np.full(n_users, np.datetime64("9999-12-31T00:00:00"), dtype="datetime64[s]")
+    last = np.full(n_users, np.datetime64("0001-01-01T00:00:00"), dtype="datetime64[s]")
+    np.minimum.at(first, user_idx, times)
+    np.maximum.at(last, user_idx, times)
+    holdings = {
+        name: Holding(int(c), float(g), float(a), str(f), str(l))
+        for name, c, g, a, f, l in zip(names, counts, user_grams, user_invested, first, last)
+    }
+
+    days, day_idx = np.unique(times.astype("datetime64[D]"), return_inverse=True)
+    n_days = len(days)
+    day_counts = np.bincount(day_idx, minlength=n_days)
+    day_grams = np.bincount(day_idx, weights=grams, minlength=n_days)
+    day_amounts = np.bincount(day_idx, weights=amounts, minlength=n_days)
+    day_names = [str(day) for day in days]
+    daily = {}
+    for name, c, g, a in zip(day_names, day_counts, day_grams, day_amounts):
+        volume = daily[name] = DailyVolume()
+        volume.purchases, volume.grams, volume.amount_inr = int(c), float(g), float(a)
+    pairs = np.unique(day_idx.astype(np.int64) * n_users + user_idx)
+    pair_users = np.array(names, dtype=object)[pairs % n_users]
+    bounds = np.searchsorted(pairs // n_users, np.arange(n_days + 1))
+    for i, name in enumerate(day_names):
+        daily[name].users = set(pair_users[bounds[i]:bounds[i + 1]].tolist())
+    return holdings, daily, len(user_idx)
+
+
+class PurchaseAnalytics:
+    """
+    In-memory per-user holdings and per-day platform volume over gold_purchases.
+
+    `rebuild` recomputes everything from the database in one vectorised NumPy
+    pass (a plain loop without NumPy); `record_many` then folds in each batch
+    as PurchaseWriter writes it, so reads never touch the database. Each
+    process only sees its own writes after its rebuild.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._holdings = {}
+        self._daily = {}
+        self.rows = 0
+
+    def record_many(self, rows):
+        """
+        Folds newly written purchase rows into the aggregates.
+        """
+        with self._lock:
+            for row in rows:
+                _add(self._holdings, self._daily, row)
+                self.rows += 1
+
+    def rebuild(self, chunks, exclude_receipts=()):
+        """
+        Replaces the aggregates with ones computed from `chunks` (lists of rows,
+        e.g. SupabaseDB.iter_purchases). Rows whose receipt_id is in
+        `exclude_receipts` are skipped; pass the receipts still pending in the
+        purchase spool, as they are counted when the writer reports them.
+        Returns the number of rows counted.
+        """
+        exclude = set(exclude_receipts)
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+        if np is not None:
+            holdings, daily, rows = _aggregate_numpy(np, chunks, exclude)
+        else:
+            holdings, daily, rows = {}, {}, 0
+            for chunk in chunks:
+                for row in chunk:
+                    if not (exclude and row.get("receipt_id") in exclude):
+                        _add(holdings, daily, row)
+                        rows += 1
+        with self._lock:
+            self._holdings, self._daily, self.rows = holdings, daily, rows
+        return rows
+
+    def portfolio(self, user_name: str, price_per_gram: float):
+        """
+        Holdings of one user valued at `price_per_gram`, or None if they have no purchases.
+        """
+        with self._lock:
+            holding = self._holdings.get(user_name)
+            if holding is None:
+                return None
+            purchases, grams, invested = holding.purchases, holding.grams, holding.invested
+            first, last = holding.first_purchase, holding.last_purchase
+        value = grams * price_per_gram
+        pnl = value - invested
+        return {
+            "user_name": user_name,
+            "purchases": purchases,
+            "total_grams": round(grams, 4),
+            "total_invested": round(invested, 2),
+            "avg_cost_per_gram": round(invested / grams, 2) if grams else None,
+            "current_price_per_gram": price_per_gram,
+            "current_value": round(value, 2),
+            "unrealised_pnl": round(pnl, 2),
+            "unrealised_pnl_pct": round(pnl / invested * 100, 2) if invested else None,
+            "first_purchase": first,
+            "last_purchase": last,
+        }
+
+    def daily(self, days: int = 30):
+        """
+        Platform volume for the `days` most recent days with purchases, newest first.
+        """
+        with self._lock:
+            recent = sorted(self._daily, reverse=True)[:max(0, days)]
+            return [
+                {"date": date, "purchases": v.purchases, "grams": round(v.grams, 4),
+                 "amount_inr": round(v.amount_inr, 2), "users": len(v.users)}
+                for date, v in ((date, self._daily[date]) for date in recent)
+            ]
+
+
+def rebuild_from_db(analytics, db, writer=None, exclude=None):
+    """
+    Rebuilds `analytics` from every row in `db`, leaving out purchases still
+    pending in `writer`'s spool, or the receipt IDs in `exclude` if given.
+    Returns the number of rows counted.
+    """
+    if exclude is None:
+        exclude = writer.pending_receipts() if writer is not None else ()
+    return analytics.rebuild(db.iter_purchases(MAX_PAGE_SIZE, columns=ANALYTICS_COLUMNS), exclude)
+
+
+purchase_analytics = PurchaseAnalytics()
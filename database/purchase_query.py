@@ -0,0 +1,104 @@
+import base64
+import datetime
+import json
+import re
+
+# Helpers for reading gold_purchases page by page. Pages are ordered newest
+# first on (purchase_time, id) and use keyset pagination: the cursor holds the
+# sort key of the last row served and the next page asks for rows strictly
+# after it. Unlike OFFSET, each page costs the same however deep into the
+# table it is, given an index on (purchase_time DESC, id DESC).
+
+PURCHASE_COLUMNS = (
+    "id", "user_name", "phone", "email", "grams", "amount_inr", "price_per_gram", "purchase_time", "receipt_id",
+)
+KEY_COLUMNS = ("purchase_time", "id")
+ORDER = "purchase_time.desc,id.desc"
+MAX_PAGE_SIZE = 1000  # Supabase's default PostgREST max-rows
+
+
+def select_columns(columns=None) -> str:
+    """
+    PostgREST select list for the requested columns. The sort key columns are
+    always fetched since the cursor is built from them.
+    """
+    if not columns:
+        return ",".join(PURCHASE_COLUMNS)
+    unknown = [c for c in columns if c not in PURCHASE_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown column(s): {', '.join(unknown)}")
+    wanted = list(dict.fromkeys(columns))
+    return ",".join(wanted + [c for c in KEY_COLUMNS if c not in wanted])
+
+
+def project(rows, columns=None):
+    """
+    Drops the sort key columns from `rows` when they were not asked for.
+    """
+    if not columns:
+        return rows
+    extra = [c for c in KEY_COLUMNS if c not in columns]
+    if not extra:
+        return rows
+    return [{k: v for k, v in row.items() if k not in extra} for row in rows]
+
+
+def encode_cursor(row) -> str:
+    raw = json.dumps([row["purchase_time"], row["id"]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _normalise_timestamp(value: str) -> str:
+    # Python 3.9's fromisoformat takes neither "Z" nor fractions other than 3 or 6 digits
+    text = value[:-1] + "+00:00" if value.endswith("Z") else value
+    text = re.sub(r"\.(\d{1,6})(?=$|[+-])", lambda m: "." + m.group(1).ljust(6, "0"), text, count=1)
+    parsed = datetime.datetime.fromisoformat(text)
+    return parsed.isoformat(sep=value[10] if len(value) > 10 and value[10] in " T" else "T")
+
+
+def decode_cursor(cursor: str):
+    """
+    Returns (purchase_time, id) from a cursor made by encode_cursor. The
+    cursor comes from the client and purchase_time ends up in a PostgREST
+    filter string, so it is parsed as an ISO timestamp and re-serialised;
+    anything else is rejected.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        purchase_time, row_id = json.loads(raw)
+        if not isinstance(purchase_time, str) or isinstance(row_id, bool):
+            raise TypeError
+        return _normalise_timestamp(purchase_time), int(row_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor") from None
+
+
+def apply_filters(query, user_name=None, since=None, until=None, min_amount=None, max_amount=None):
+    """
+    Adds the optional row filters to a postgrest query builder. `since`/`until`
+    are ISO timestamps (inclusive), amounts are in INR.
+    """
+    if user_name:
+        query = query.eq("user_name", user_name)
+    if since:
+        query = query.gte("purchase_time", since)
+    if until:
+        query = query.lte("purchase_time", until)
+    if min_amount is not None:
+        query = query.gte("amount_inr", min_amount)
+    if max_amount is not None:
+        query = query.lte("amount_inr", max_amount)
+    return query
+
+
+def apply_keyset(query, cursor: str):
+    """
+    Restricts a query to rows after `cursor` in ORDER.
+    """
+    purchase_time, row_id = decode_cursor(cursor)
+    # The redundant upper bound lets the planner range-scan the index; the OR alone can't
+    query = query.lte("purchase_time", purchase_time)
+    return query.or_(
+        f'purchase_time.lt."{purchase_time}",'
+        f'and(purchase_time.eq."{purchase_time}",id.lt.{row_id})'
+    )
@@ -0,0 +1,423 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from utils.resilience import UpstreamUnavailable, is_retryable
+from utils.shared_state import worker_leader
+
+STATUS_PENDING = "pending"
+STATUS_WRITTEN = "written"
+STATUS_FAILED = "failed"
+
+# json.dumps builds a new encoder per call when given options; bulk submits reuse one
+_encode_record = json.JSONEncoder(ensure_ascii=False).encode
+# Receipt IDs per IN (...) lookup; SQLite builds before 3.32 allow at most 999 parameters
+_SQL_VARIABLES = 900
+# SQLSTATE classes of errors a retry can't fix: data exceptions, integrity
+# constraint violations, syntax errors and undefined columns or permissions
+_PERMANENT_SQLSTATES = ("22", "23", "42")
+
+
+def _error_status(exc):
+    # HTTP status of a failed DB call, from an HTTP client error or a PostgREST
+    # APIError (whose `code` is the status when the body wasn't JSON)
+    response = getattr(exc, "response", None)
+    if response is not None and isinstance(getattr(response, "status_code", None), int):
+        return response.status_code
+    code = str(getattr(exc, "code", "") or "")
+    return int(code) if len(code) == 3 and code.isdigit() else None
+
+
+def is_transient(exc) -> bool:
+    """
+    Whether a failed write is worth retrying as a whole batch: the database
+    was unreachable, slow or overloaded, not unhappy with the rows.
+    """
+    if exc is None:
+        return False
+    if is_retryable(exc) or isinstance(exc, (ConnectionError, TimeoutError, UpstreamUnavailable)):
+        return True
+    status = _error_status(exc)
+    return status is not None and (status in (408, 429) or status >= 500)
+
+
+def is_permanent(exc) -> bool:
+    """
+    Whether a failed write will fail the same way every time: a 4xx answer
+    (bad row, constraint violation, auth) or a PostgREST/SQL error code for one.
+    """
+    status = _error_status(exc)
+    if status is not None:
+        return 400 <= status < 500 and status not in (408, 429)
+    code = str(getattr(exc, "code", "") or "")
+    return code.startswith("PGRST") or (len(code) == 5 and code[:2] in _PERMANENT_SQLSTATES)
+
+
+def receipt_id_for(pending_purchase: dict) -> str:
+    """
+    Idempotency key for a confirmed purchase, derived from the pending purchase
+    it confirms: confirming the same quote twice yields the same receipt and a
+    single row. Quotes carry a `quote_id`; older pending purchases without one
+    get a random `confirmation_id` when they are confirmed, so two identical
+    purchases never share a receipt. Keeps 112 bits of the hash, which fits
+    the VARCHAR(32) receipt_id column.
+    """
+    basis = pending_purchase.get("quote_id") or pending_purchase.get("confirmation_id")
+    if not basis:
+        raise ValueError("pending purchase has neither a quote_id nor a confirmation_id")
+    return "GP-" + hashlib.sha256(basis.encode()).hexdigest()[:28].upper()
+
+
+class PurchaseWriter:
+    """
+    Write-behind queue for purchase records.
+
+    `submit` stores the record in a local SQLite spool (WAL mode) and returns
+    its receipt ID straight away; a background thread drains the spool into the
+    database in bulk inserts of up to `batch_size` rows, whenever that many are
+    waiting or every `flush_interval` seconds. Rows left in the spool by a
+    crash are written when the next writer on the same file starts.
+
+    A batch that fails because the database is unreachable or overloaded is
+    retried whole with exponential backoff (capped at `max_backoff` seconds),
+    and its rows are marked failed after `max_attempts`. A batch the database
+    rejects is split in halves until the rows at fault are isolated; the
+    others are written, and a rejected row is marked failed at once when the
+    error is permanent (see `is_permanent`). Written rows are deleted from
+    the spool `retention` seconds after they were written.
+
+    `db` needs write_purchase_records(records) -> bool; by default the shared
+    client from utils.clients is used. Callables in `listeners` are called with
+    each batch of records once it is written.
+
+    `submit` starts the flusher unless `autostart` is off; then it waits for
+    an explicit `start`, e.g. until analytics are rebuilt from the database.
+
+    Workers that share a spool file pass the same `leader` (a
+    utils.shared_state.WorkerLeader): all of them submit, only the elected
+    one flushes, so no row is written twice. Others see written rows through
+    `written_since`.
+    """
+
+    def __init__(self, spool_path="purchase_spool.db", db=None, batch_size=100, flush_interval=0.5,
+                 max_attempts=10, max_backoff=60.0, leader=None, retention=7 * 86400.0, autostart=True):
+        self.spool_path = spool_path
+        self.autostart = autostart
+        self.leader = leader
+        self.retention = retention
+        self._purge_at = 0.0
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+        self._failures = 0
+        self._retry_at = 0.0
+        self._db = db
+        self._conn = None
+        self._lock = threading.Lock()        # guards the spool connection
+        self._flush_lock = threading.Lock()  # one flush at a time
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._unflushed = 0
+        self.batches = 0
+        self.purged = 0
+        self.listeners = []
+
+    def _spool(self):
+        # Caller holds self._lock. Opened on first use so importing never creates the file.
+        if self._conn is None:
+            conn = sqlite3.connect(self.spool_path, check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # durable across process crashes
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS purchase_spool ("
+                "receipt_id TEXT PRIMARY KEY, record TEXT NOT NULL, status TEXT NOT NULL, "
+                "attempts INTEGER NOT NULL DEFAULT 0, error TEXT, created_at REAL NOT NULL, written_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS purchase_spool_status ON purchase_spool (status, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS purchase_spool_written ON purchase_spool (status, written_at)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def submit(self, pending_purchase: dict, record: dict) -> str:
+        """
+        Queues `record` (a gold_purchases row) for the purchase described by
+        `pending_purchase` and returns its receipt ID. Submitting the same
+        purchase again returns the same ID without queueing a second row.
+        """
+        receipt_id = receipt_id_for(pending_purchase)
+        row = dict(record, receipt_id=receipt_id)
+        with self._lock:
+            cursor = self._spool().execute(
+                "INSERT OR IGNORE INTO purchase_spool (receipt_id, record, status, created_at) VALUES (?, ?, ?, ?)",
+                (receipt_id, json.dumps(row, ensure_ascii=False), STATUS_PENDING, time.time()),
+            )
+            self._conn.commit()
+            self._unflushed += cursor.rowcount
+            full = self._unflushed >= self.batch_size
+        if self.autostart:
+            self.start()
+        if full:
+            self._wake.set()
+        return receipt_id
+
+    def submit_many(self, purchases) -> list:
+        """
+        Bulk variant of `submit` for (pending_purchase, record) pairs: one
+        spool transaction for all of them. Returns (receipt_id, stored) pairs
+        in order, where `stored` is None for a purchase this call queued and,
+        for one already in the spool (or earlier in `purchases`), the record
+        queued for it then.
+        """
+        results, rows, queued, now = [], [], {}, time.time()
+        for pending_purchase, record in purchases:
+            receipt_id = receipt_id_for(pending_purchase)
+            results.append([receipt_id, queued.get(receipt_id)])
+            if receipt_id not in queued:
+                queued[receipt_id] = row = dict(record, receipt_id=receipt_id)
+                rows.append((receipt_id, _encode_record(row), STATUS_PENDING, now))
+        ids = list(queued)
+        with self._lock:
+            conn = self._spool()
+            conn.execute("BEGIN IMMEDIATE")  # no other worker can queue these receipts in between
+            try:
+                stored = {}
+                for start in range(0, len(ids), _SQL_VARIABLES):
+                    chunk = ids[start:start + _SQL_VARIABLES]
+                    stored.update((receipt_id, json.loads(record)) for receipt_id, record in conn.execute(
+                        f"SELECT receipt_id, record FROM purchase_spool WHERE receipt_id IN "
+                        f"({','.join('?' * len(chunk))})", chunk))
+                cursor = conn.executemany(
+                    "INSERT INTO purchase_spool (receipt_id, record, status, created_at) VALUES (?, ?, ?, ?)",
+                    [row for row in rows if row[0] not in stored],
+                )
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            self._unflushed += cursor.rowcount
+            full = self._unflushed >= self.batch_size
+        for result in results:
+            if result[0] in stored:
+                result[1] = stored[result[0]]
+        if self.autostart:
+            self.start()
+        if full:
+            self._wake.set()
+        return [tuple(result) for result in results]
+
+    def status(self, receipt_id: str):
+        """
+        Returns {"receipt_id", "status", "attempts", "error", "written_at"} or
+        None for an unknown receipt.
+        """
+        with self._lock:
+            row = self._spool().execute(
+                "SELECT status, attempts, error, written_at FROM purchase_spool WHERE receipt_id = ?", (receipt_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        status, attempts, error, written_at = row
+        return {"receipt_id": receipt_id, "status": status, "attempts": attempts, "error": error,
+                "written_at": written_at}
+
+    def pending_receipts(self):
+        """
+        Receipt IDs queued in the spool but not yet written.
+        """
+        with self._lock:
+            rows = self._spool().execute(
+                "SELECT receipt_id FROM purchase_spool WHERE status = ?", (STATUS_PENDING,)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def last_written_at(self) -> float:
+        """
+        When the most recent batch was written, or 0.0 if none was.
+        """
+        with self._lock:
+            row = self._spool().execute(
+                "SELECT MAX(written_at) FROM purchase_spool WHERE status = ?", (STATUS_WRITTEN,)
+            ).fetchone()
+        return row[0] or 0.0
+
+    def written_since(self, cursor: float):
+        """
+        Returns (records, cursor): the records written after `cursor` (a
+        `written_at` time), oldest first, and the cursor to pass next time.
+        A batch is marked written in one transaction with one timestamp, so
+        it is never split across calls.
+        """
+        with self._lock:
+            rows = self._spool().execute(
+                "SELECT record, written_at FROM purchase_spool WHERE status = ? AND written_at > ? "
+                "ORDER BY written_at",
+                (STATUS_WRITTEN, cursor),
+            ).fetchall()
+        return [json.loads(r[0]) for r in rows], (rows[-1][1] if rows else cursor)
+
+    def _leads(self) -> bool:
+        return self.leader is None or self.leader.is_leader()
+
+    def flush(self) -> int:
+        """
+        Writes pending records to the database in batches until the spool is
+        drained or a write has to be retried later. Returns the number of rows
+        written.
+        """
+        db = self._db
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    rows = self._spool().execute(
+                        "SELECT receipt_id, record FROM purchase_spool WHERE status = ? ORDER BY created_at LIMIT ?",
+                        (STATUS_PENDING, self.batch_size),
+                    ).fetchall()
+                    self._unflushed = 0
+                if not rows:
+                    return written
+                if db is None:
+                    from utils.clients import get_db
+                    db = get_db()
+                done, error = self._write_rows(db, rows)
+                written += done
+                if error is not None:
+                    self._failures += 1
+                    backoff = min(self.max_backoff, self.flush_interval * 2 ** self._failures)
+                    self._retry_at = time.monotonic() + backoff
+                    print(f"[Warning] Purchase rows not written, retrying in {backoff:.1f}s: {error}")
+                    return written
+                self._failures = 0
+
+    def _write_rows(self, db, rows):
+        # Writes spool rows, bisecting a batch the database rejects. Returns
+        # (rows written, the error to back off on or None)
+        records = [json.loads(r[1]) for r in rows]
+        try:
+            ok, error = bool(db.write_purchase_records(records)), None
+        except Exception as e:
+            ok, error = False, e
+        self.batches += 1
+        if ok:
+            with self._lock:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE purchase_spool SET status = ?, written_at = ?, error = NULL WHERE receipt_id = ?",
+                    [(STATUS_WRITTEN, now, r[0]) for r in rows],
+                )
+                self._conn.commit()
+            for listener in self.listeners:
+                try:
+                    listener(records)
+                except Exception as e:
+                    print(f"[Warning] Purchase listener failed: {e}")
+            return len(rows), None
+        if len(rows) > 1 and not is_transient(error):
+            half = len(rows) // 2
+            first, first_error = self._write_rows(db, rows[:half])
+            if is_transient(first_error):
+                return first, first_error  # the rest waits for the retry
+            second, second_error = self._write_rows(db, rows[half:])
+            return first + second, first_error or second_error
+        permanent = is_permanent(error)
+        message = str(error) if error is not None else "write_purchase_records returned False"
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE purchase_spool SET attempts = attempts + 1, error = ?, "
+                "status = CASE WHEN ? OR attempts + 1 >= ? THEN ? ELSE status END WHERE receipt_id = ?",
+                [(message, permanent, self.max_attempts, STATUS_FAILED, r[0]) for r in rows],
+            )
+            self._conn.commit()
+        if permanent:
+            print(f"[Warning] Purchase {rows[0][0]} rejected by the database, marked failed: {message}")
+            return 0, None
+        return 0, error if error is not None else message
+
+    def purge(self, now=None) -> int:
+        """
+        Deletes rows written more than `retention` seconds ago. Pending and
+        failed rows are kept. Returns the number of rows deleted.
+        """
+        cutoff = (time.time() if now is None else now) - self.retention
+        with self._lock:
+            cursor = self._spool().execute(
+                "DELETE FROM purchase_spool WHERE status = ? AND written_at < ?", (STATUS_WRITTEN, cutoff)
+            )
+            self._conn.commit()
+        self.purged += cursor.rowcount
+        return cursor.rowcount
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if time.monotonic() < self._retry_at or not self._leads():
+                continue
+            try:
+                self.flush()
+                if time.monotonic() >= self._purge_at:
+                    self._purge_at = time.monotonic() + min(self.retention, 3600.0)
+                    self.purge()
+            except Exception as e:
+                print(f"[Warning] Purchase writer flush failed: {e}")
+
+    def start(self):
+        """
+        Starts the background flusher (idempotent). Anything left in the spool
+        by a previous process is written on its first pass.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="purchase-writer", daemon=True)
+            self._thread.start()
+        self._wake.set()
+
+    def stop(self, timeout=10.0):
+        """
+        Stops the flusher after a final flush. Records that still can't be
+        written stay in the spool for the next start.
+        """
+        thread = self._thread
+        if thread is None and self._conn is None:
+            return  # never used
+        if thread is not None:
+            self._stopping.set()
+            self._wake.set()
+            thread.join(timeout)
+            self._thread = None
+        if not self._leads():
+            return  # the leading worker writes them
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"[Warning] Final purchase flush failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._spool().execute("SELECT status, COUNT(*) FROM purchase_spool GROUP BY status"))
+        return {
+            "pending": counts.get(STATUS_PENDING, 0),
+            "written": counts.get(STATUS_WRITTEN, 0),
+            "failed": counts.get(STATUS_FAILED, 0),
+            "batches": self.batches,
+            "purged": self.purged,
+        }
+
+
+purchase_writer = PurchaseWriter(
+    spool_path=os.getenv("PURCHASE_SPOOL_PATH", "purchase_spool.db"),
+    batch_size=int(os.getenv("PURCHASE_BATCH_SIZE", "100")),
+    flush_interval=float(os.getenv("PURCHASE_FLUSH_INTERVAL", "0.5")),
+    leader=worker_leader,
+    retention=float(os.getenv("PURCHASE_SPOOL_RETENTION", str(7 * 86400))),
+)
@@ -1,34 +1,140 @@
+import os
+
+from utils.metrics import metrics
+from utils.resilience import Upstream
+from database.purchase_query import (
+    MAX_PAGE_SIZE, ORDER, apply_filters, apply_keyset, encode_cursor, project, select_columns,
+)
+
+# Network failures and timeouts are retried and trip the breaker; PostgREST
+# errors (constraint violations, bad filters) are raised as they are. The
+# request timeout itself is fixed by the supabase client (5 s).
+db_upstream = Upstream("supabase", timeout=5.0, max_attempts=2)
+
+
 class SupabaseDB:
     def __init__(self):
-        import os
         from supabase import create_client, Client
         url = os.getenv("SUPABASE_URL")
         key = os.getenv("SUPABASE_KEY")
+
+        if not url or not key:
+            raise ValueError("Missing SUPABASE_URL or SUPABASE_KEY in .env")
+
         self.client: Client = create_client(url, key)
 
-    def write_purchase_record(self, user_name, grams, amount_inr, price_per_gram, phone, email):
-        purchase_data = {
-            "user_name": user_name,
-            "phone": phone,
-            "email": email,
-            "grams": grams,
-            "amount_inr": amount_inr,
-            "price_per_gram": price_per_gram
-            # purchase_time = defaulted by DB
-        }
-        result = self.client.table("gold_purchases").insert(purchase_data).execute()
-        return result.data is not None
+    @metrics.timed("db.write_purchase")
+    def write_purchase_record(self, user_name, grams, amount_inr, price_per_gram, phone, email, **kwargs):
+        """Write purchase record to Supabase - matches your existing table structure"""
+        try:
+            purchase_data = {
+                "user_name": user_name,
+                "phone": phone,
+                "email": email,
+                "grams": grams,
+                "amount_inr": amount_inr,
+                "price_per_gram": price_per_gram
+                # purchase_time will be auto-set by your table's DEFAULT CURRENT_TIMESTAMP
+            }
+
+            with db_upstream.guard():  # a plain insert is not safe to retry
+                result = self.client.table("gold_purchases").insert(purchase_data).execute()
+
+            if result.data:
+                print(f"✅ Purchase saved to Supabase! ID: {result.data[0]['id']}")
+                return True
+            else:
+                print(f"❌ Supabase error: {result}")
+                return False
+
+        except Exception as e:
+            print(f"❌ Database error: {e}")
+            return False
+
+    @metrics.timed("db.write_purchases")
+    def write_purchase_records(self, records):
+        """
+        Bulk-inserts purchase rows (each with a receipt_id) in one request. Rows
+        whose receipt_id is already stored are skipped, so replaying a batch is
+        safe. Raises on failure so the caller can retry.
+        """
+        from postgrest.types import ReturnMethod
+        query = self.client.table("gold_purchases") \
+            .upsert(records, on_conflict="receipt_id", ignore_duplicates=True, returning=ReturnMethod.minimal)
+        db_upstream.call(lambda timeout: query.execute())
+        print(f"✅ {len(records)} purchase(s) saved to Supabase")
+        return True
+
+    @metrics.timed("db.get_purchases")
+    def get_purchases(self, limit=100, cursor=None, columns=None, **filters):
+        """
+        Returns one page of purchases, newest first, as (rows, next_cursor).
+        next_cursor is None on the last page. `filters` are passed to
+        database.purchase_query.apply_filters. Raises on invalid input or DB errors.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        query = self.client.table("gold_purchases").select(select_columns(columns))
+        query = apply_filters(query, **filters)
+        if cursor:
+            query = apply_keyset(query, cursor)
+        # One order param with both keys; .order() twice would send two params
+        query.params = query.params.add("order", ORDER)
+        query = query.limit(limit)
+        rows = db_upstream.call(lambda timeout: query.execute()).data
+        next_cursor = encode_cursor(rows[-1]) if len(rows) == limit else None
+        return project(rows, columns), next_cursor
+
+    def iter_purchases(self, chunk_size=MAX_PAGE_SIZE, columns=None, **filters):
+        """
+        Yields every matching purchase as lists of up to `chunk_size` rows, one
+        page query at a time, so callers never hold the whole table.
+        """
+        cursor = None
+        while True:
+            rows, cursor = self.get_purchases(chunk_size, cursor, columns, **filters)
+            if rows:
+                yield rows
+            if cursor is None:
+                return
 
     def get_all_purchases(self):
         """
         Returns all rows from the gold_purchases table (as a list of dicts).
         """
         try:
-            result = self.client.table("gold_purchases") \
-                .select("*") \
-                .order("purchase_time", desc=True) \
-                .execute()
-            return result.data
+            return [row for rows in self.iter_purchases() for row in rows]
         except Exception as e:
             print(f"[DB] Error fetching purchases: {e}")
             return []
+
+    def close(self):
+        """
+        Closes the PostgREST connection pool held by the supabase client.
+        """
+        self.client.postgrest.aclose()  # sync client: closes immediately despite the name
+
+
+class MockDB:
+    """
+    Stand-in used when Supabase is not configured. Prints instead of writing.
+    """
+
+    def write_purchase_record(self, **kwargs):
+        print(f"[MOCK DB] Would save: {kwargs}")
+        return True
+
+    def write_purchase_records(self, records):
+        print(f"[MOCK DB] Would save {len(records)} purchase(s): {records}")
+        return True
+
+    def get_purchases(self, limit=100, cursor=None, columns=None, **filters):
+        return [], None
+
+    def iter_purchases(self, chunk_size=MAX_PAGE_SIZE, columns=None, **filters):
+        return iter(())
+
+    def get_all_purchases(self):
+        return []
+
+    def close(self):
+        pass
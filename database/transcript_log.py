@@ -0,0 +1,292 @@
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+
+# Segment files start with MAGIC, then hold records back to back:
+#   u32 payload length, u32 CRC-32 of the payload, payload
+# where the payload is a fixed part (timestamp and the byte length of each
+# field) followed by the UTF-8 fields themselves, user_id first so readers
+# filtering by user can skip a record without decoding its text.
+MAGIC = b"GTL1"
+SEGMENT_SUFFIX = ".seg"
+_FRAME = struct.Struct("<II")
+_FIXED = struct.Struct("<dHBBIIB")  # timestamp, len(user_id), len(state), len(event), len(message), len(reply), len(receipt_id)
+_FIELDS = ("user_id", "state", "event", "message", "reply", "receipt_id")
+_MAX_BYTES = (0xFFFF, 0xFF, 0xFF, 0xFFFFFFFF, 0xFFFFFFFF, 0xFF)  # per field, from _FIXED
+# Contact details users type to confirm a purchase, and the replies that echo them
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_PHONE_RE = re.compile(r"(?<![\w-])(?:\+\d{1,3}[\s-]?)?(?:\d{10,13}|\d{5}[\s-]\d{5}|\d{3}[\s-]\d{3}[\s-]\d{4})(?![\w-])")
+_PURGE_INTERVAL = 3600.0
+
+
+def redact(text: str) -> str:
+    """
+    `text` with email addresses and phone numbers (10 to 13 digits, or
+    grouped 5+5 or 3+3+4, with an optional +country code) replaced by
+    [email] and [phone].
+    """
+    if not text:
+        return text
+    return _PHONE_RE.sub("[phone]", _EMAIL_RE.sub("[email]", text))
+
+
+def _field(value, limit) -> bytes:
+    # Longer values are cut at a character boundary so the record still fits _FIXED
+    raw = (value or "").encode("utf-8")
+    if len(raw) <= limit:
+        return raw
+    return raw[:limit].decode("utf-8", "ignore").encode("utf-8")
+
+
+def encode_record(timestamp, user_id, state, event, message, reply, receipt_id=None) -> bytes:
+    """
+    One framed record. A field longer than its length slot (64 KiB for
+    user_id, 255 bytes for state, event and receipt_id) is truncated rather
+    than dropping the turn.
+    """
+    fields = [_field(v, limit) for v, limit in zip((user_id, state, event, message, reply, receipt_id), _MAX_BYTES)]
+    payload = _FIXED.pack(timestamp, *map(len, fields)) + b"".join(fields)
+    return _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_segment(path, user_id=None):
+    """
+    Yields the records of one segment file as dicts ({"timestamp", "user_id",
+    "state", "event", "message", "reply", "receipt_id"}), in write order, from
+    a read-only memory map. Stops at a truncated or corrupt record, e.g. the
+    tail of a segment whose writer crashed mid-flush.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size <= len(MAGIC):
+            return
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        if buf[:len(MAGIC)] != MAGIC:
+            print(f"[Warning] {path} is not a transcript segment")
+            return
+        wanted = user_id.encode("utf-8") if user_id is not None else None
+        offset, end = len(MAGIC), len(buf)
+        while offset + _FRAME.size <= end:
+            length, crc = _FRAME.unpack_from(buf, offset)
+            start = offset + _FRAME.size
+            if start + length > end or length < _FIXED.size:
+                break  # torn tail
+            offset = start + length
+            fixed = _FIXED.unpack_from(buf, start)
+            pos = start + _FIXED.size
+            if wanted is not None and buf[pos:pos + fixed[1]] != wanted:
+                continue
+            if zlib.crc32(buf[start:offset]) != crc:
+                print(f"[Warning] Corrupt transcript record in {path} at byte {start - _FRAME.size}, skipping the rest")
+                break
+            record = {"timestamp": fixed[0]}
+            for name, size in zip(_FIELDS, fixed[1:]):
+                record[name] = buf[pos:pos + size].decode("utf-8")
+                pos += size
+            record["receipt_id"] = record["receipt_id"] or None
+            yield record
+    finally:
+        buf.close()
+
+
+def segment_paths(directory):
+    """
+    Segment files in `directory`, oldest first.
+    """
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX))
+
+
+def iter_transcripts(directory, user_id=None):
+    """
+    Records from every segment in `directory`, oldest segment first. Each
+    process writes its own segments, so records of concurrent workers are
+    ordered per segment, not globally; sort by timestamp if that matters.
+    """
+    for path in segment_paths(directory):
+        yield from read_segment(path, user_id)
+
+
+class TranscriptLog:
+    """
+    Append-only log of conversation turns in local segment files.
+
+    `append` encodes the turn into an in-memory buffer and returns; a
+    background thread writes the buffer out and fsyncs it every
+    `flush_interval` seconds, or sooner once `buffer_bytes` are waiting, so
+    requests never wait on the disk. A new segment is started at
+    `segment_bytes` and by every process on start, named by start time and
+    PID so concurrent workers never share a file. A crash loses at most the
+    last flush interval of turns.
+
+    Email addresses and phone numbers are redacted from messages and replies
+    before they are encoded unless `redact_pii` is off. With a `retention`
+    (seconds), the flusher deletes segments last written longer ago than
+    that, checking once an hour.
+    """
+
+    def __init__(self, directory="transcripts", segment_bytes=64 * 1024 * 1024, flush_interval=1.0,
+                 buffer_bytes=1024 * 1024, enabled=True, retention=None, redact_pii=True):
+        self.directory = directory
+        self.retention = retention
+        self.redact_pii = redact_pii
+        self._purge_at = 0.0
+        self.segment_bytes = segment_bytes
+        self.flush_interval = flush_interval
+        self.buffer_bytes = buffer_bytes
+        self.enabled = enabled
+        self._buffer = bytearray()
+        self._lock = threading.Lock()        # guards the buffer
+        self._flush_lock = threading.Lock()  # one flush at a time; guards the segment file
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._file = None
+        self._segment_size = 0
+        self.records = 0
+        self.bytes_written = 0
+        self.segments = 0
+        self.fsyncs = 0
+        self.purged = 0
+
+    def append(self, user_id, message, reply, state, event, receipt_id=None, timestamp=None):
+        if not self.enabled:
+            return
+        if self.redact_pii:
+            message, reply = redact(message), redact(reply)
+        record = encode_record(time.time() if timestamp is None else timestamp,
+                               user_id, state, event, message, reply, receipt_id)
+        with self._lock:
+            self._buffer += record
+            self.records += 1
+            full = len(self._buffer) >= self.buffer_bytes
+        self.start()
+        if full:
+            self._wake.set()
+
+    def _open_segment(self):
+        # Caller holds self._flush_lock
+        if self._file is not None:
+            self._file.close()
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{time.time_ns() // 1000:016d}-{os.getpid()}{SEGMENT_SUFFIX}"
+        self._file = open(os.path.join(self.directory, name), "ab")
+        self._file.write(MAGIC)
+        self._segment_size = len(MAGIC)
+        self.segments += 1
+
+    def flush(self) -> int:
+        """
+        Writes and fsyncs buffered records. Returns the number of bytes written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._buffer:
+                    return 0
+                chunk, self._buffer = self._buffer, bytearray()
+            if self._file is None or (self._segment_size > len(MAGIC)
+                                      and self._segment_size + len(chunk) > self.segment_bytes):
+                self._open_segment()
+            self._file.write(chunk)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._segment_size += len(chunk)
+            self.bytes_written += len(chunk)
+            self.fsyncs += 1
+            return len(chunk)
+
+    def purge(self, now=None) -> int:
+        """
+        Deletes segments last written more than `retention` seconds ago,
+        except the one this process has open. Returns how many were deleted.
+        """
+        if not self.retention:
+            return 0
+        cutoff = (time.time() if now is None else now) - self.retention
+        with self._flush_lock:
+            current = self._file.name if self._file is not None else None
+            deleted = 0
+            for path in segment_paths(self.directory):
+                try:
+                    if path != current and os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        deleted += 1
+                except FileNotFoundError:
+                    pass  # another worker purged it first
+            self.purged += deleted
+        return deleted
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[Warning] Transcript flush failed: {e}")
+            if self.retention and time.monotonic() >= self._purge_at:
+                self._purge_at = time.monotonic() + _PURGE_INTERVAL
+                try:
+                    self.purge()
+                except OSError as e:
+                    print(f"[Warning] Transcript purge failed: {e}")
+
+    def start(self):
+        """
+        Starts the background flusher (idempotent).
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="transcript-log", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10.0):
+        """
+        Stops the flusher after a final flush and closes the segment.
+        """
+        thread = self._thread
+        if thread is not None:
+            self._stopping.set()
+            self._wake.set()
+            thread.join(timeout)
+            self._thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"[Warning] Final transcript flush failed: {e}")
+        with self._flush_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self):
+        with self._lock:
+            buffered = len(self._buffer)
+        return {
+            "enabled": self.enabled,
+            "records": self.records,
+            "buffered_bytes": buffered,
+            "bytes_written": self.bytes_written,
+            "segments": self.segments,
+            "fsyncs": self.fsyncs,
+            "purged_segments": self.purged,
+        }
+
+
+transcript_log = TranscriptLog(
+    directory=os.getenv("TRANSCRIPT_DIR", "transcripts"),
+    segment_bytes=int(os.getenv("TRANSCRIPT_SEGMENT_BYTES", str(64 * 1024 * 1024))),
+    flush_interval=float(os.getenv("TRANSCRIPT_FLUSH_INTERVAL", "1.0")),
+    enabled=os.getenv("TRANSCRIPT_LOG", "1") != "0",
+    retention=float(os.getenv("TRANSCRIPT_RETENTION", str(30 * 86400))) or None,
+    redact_pii=os.getenv("TRANSCRIPT_RAW_PII", "0") != "1",
+)
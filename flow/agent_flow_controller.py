@@ -1,13 +1,32 @@
+from database.transcript_log import transcript_log
+from flow.conversation_engine import EVENT_CONFIRMED, STATE_INVESTMENT, conversation_engine
 
-from nodes.gold_investment_node import gold_investment_api
-from nodes.gold_purchase_node import gold_purchase_node
 
 class GoldInvestmentSession:
     def __init__(self, user_name: str):
         self.user_name = user_name
         self.chat_history = []
-        self.state = "investment"
+        self.state = STATE_INVESTMENT
         self.pending_purchase = None
+        self.summary_state = {}  # rolling summary of turns outside the LLM history window
+
+    def to_dict(self) -> dict:
+        return {
+            "user_name": self.user_name,
+            "chat_history": self.chat_history,
+            "state": self.state,
+            "pending_purchase": self.pending_purchase,
+            "summary_state": self.summary_state,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "GoldInvestmentSession":
+        session = cls(data["user_name"])
+        session.chat_history = data.get("chat_history", [])
+        session.state = data.get("state", STATE_INVESTMENT)
+        session.pending_purchase = data.get("pending_purchase")
+        session.summary_state = data.get("summary_state", {})
+        return session
 
 def run_gold_agent():
     print("🟡 Welcome to the Gold Investment AI Agent!")
@@ -23,49 +42,13 @@ def run_gold_agent():
             print("👋 Thank you for using the Gold Investment AI Agent. Stay golden!")
             break
 
-        if session.state == "investment":
-            result = gold_investment_api(
-                user_message,
-                session.user_name,
-                chat_history=session.chat_history
-            )
-            session.chat_history.append({"role": "user", "content": user_message})
-            session.chat_history.append({"role": "assistant", "content": result["message"]})
-
-            print("🤖", result["message"])
-
-            if result.get("purchase_triggered"):
-                session.state = "purchase"
-                session.pending_purchase = None
-            continue
-
-        elif session.state == "purchase":
-            purchase_result = gold_purchase_node(
-                user_message=user_message,
-                user_name=session.user_name,
-                chat_history=session.chat_history,
-                pending_purchase=session.pending_purchase
-            )
-            print("🤖", purchase_result["message"])
-            session.chat_history.append({"role": "user", "content": user_message})
-            session.chat_history.append({"role": "assistant", "content": purchase_result["message"]})
-
-            if not purchase_result["success"] and purchase_result.get("pending_purchase"):
-                session.pending_purchase = purchase_result["pending_purchase"]
-                continue
-
-            if purchase_result["success"]:
-                session.state = "investment"
-                session.pending_purchase = None
-                print("💡 You can type 'exit' to quit or ask about gold again.\n")
-            else:
-                session.pending_purchase = purchase_result.get("pending_purchase", None)
-            continue
-
-        else:
-            print("⚠️ Internal state error, resetting conversation.")
-            session.state = "investment"
-            session.pending_purchase = None
+        turn = conversation_engine.turn(session, user_message)
+        print("🤖", turn.reply)
+        if turn.event == EVENT_CONFIRMED:
+            print("💡 You can type 'exit' to quit or ask about gold again.\n")
+    transcript_log.stop()
 
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
     run_gold_agent()
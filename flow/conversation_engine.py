@@ -0,0 +1,215 @@
+import asyncio
+from collections import deque
+
+from database.transcript_log import transcript_log
+from nodes.gold_investment_node import (
+    gold_investment_api, gold_investment_api_async, gold_investment_stream_async, history_window
+)
+from nodes.gold_purchase_node import gold_purchase_node, gold_purchase_node_async
+from utils.intent_router import INTENT_LLM, classify_intent
+
+STATE_INVESTMENT = "investment"
+STATE_PURCHASE = "purchase"
+
+# What a node's result means for the conversation
+EVENT_REPLY = "reply"                      # investment answer
+EVENT_PURCHASE_INTENT = "purchase_intent"  # user asked to buy
+EVENT_PENDING = "pending"                  # purchase node set (or cleared) the pending purchase
+EVENT_CONFIRMED = "confirmed"              # purchase done
+EVENT_FAILED = "failed"                    # purchase not recorded; the pending purchase stays for a retry
+
+_KEEP, _CLEAR, _SET = "keep", "clear", "set"
+
+# (state, event) -> (next state, what happens to session.pending_purchase)
+TRANSITIONS = {
+    (STATE_INVESTMENT, EVENT_REPLY): (STATE_INVESTMENT, _KEEP),
+    (STATE_INVESTMENT, EVENT_PURCHASE_INTENT): (STATE_PURCHASE, _CLEAR),
+    (STATE_PURCHASE, EVENT_PENDING): (STATE_PURCHASE, _SET),
+    (STATE_PURCHASE, EVENT_CONFIRMED): (STATE_INVESTMENT, _CLEAR),
+    (STATE_PURCHASE, EVENT_FAILED): (STATE_PURCHASE, _KEEP),
+}
+
+
+def result_event(state: str, result: dict) -> str:
+    """
+    Classifies a node result as one of the EVENT_* constants.
+    """
+    if state == STATE_INVESTMENT:
+        return EVENT_PURCHASE_INTENT if result.get("purchase_triggered") else EVENT_REPLY
+    if result.get("success"):
+        return EVENT_CONFIRMED
+    if "pending_purchase" in result:
+        return EVENT_PENDING
+    return EVENT_FAILED
+
+
+class TurnResult:
+    """
+    Outcome of one conversation turn: the reply, the state the session is in
+    afterwards, the event that moved it there and, for a confirmed purchase,
+    its receipt ID.
+    """
+    __slots__ = ("reply", "state", "event", "receipt_id")
+
+    def __init__(self, reply: str, state: str, event: str, receipt_id: str = None):
+        self.reply = reply
+        self.state = state
+        self.event = event
+        self.receipt_id = receipt_id
+
+    def __repr__(self):
+        return f"TurnResult(state={self.state!r}, event={self.event!r}, reply={self.reply[:40]!r})"
+
+    def to_response(self) -> dict:
+        """
+        The /agent response body.
+        """
+        response = {"reply": self.reply, "state": self.state}
+        if self.receipt_id:
+            response["receipt_id"] = self.receipt_id
+        return response
+
+
+class ConversationEngine:
+    """
+    The investment/purchase state machine shared by every transport. A turn
+    runs the node for the session's state (`nodes` for `turn`, `async_nodes`
+    for `aturn` and `astream`), records the exchange in the chat history and
+    moves the session along TRANSITIONS. The stored history is compacted to
+    what the next LLM window needs. Callers own loading, locking and saving
+    sessions. A session in an unknown state is reset to investment.
+    Each turn is appended to `transcript` (a TranscriptLog) when given.
+
+    `run_batch`/`arun_batch` take (session, message) pairs and return their
+    TurnResults in order, skipping the per-request cost of a transport. In
+    `arun_batch` turns that need no LLM call (price queries, routed intents,
+    purchase steps) run inline one after another; LLM turns run concurrently,
+    and a session's later turns queue behind its LLM turn so each session's
+    turns keep their order.
+    """
+
+    def __init__(self, llm=None, db_handle=None, transcript=None):
+        self.llm = llm
+        self.db_handle = db_handle
+        self.transcript = transcript
+        self.nodes = {STATE_INVESTMENT: gold_investment_api, STATE_PURCHASE: gold_purchase_node}
+        self.async_nodes = {STATE_INVESTMENT: gold_investment_api_async, STATE_PURCHASE: gold_purchase_node_async}
+        self.stream_nodes = {STATE_INVESTMENT: gold_investment_stream_async}
+
+    def _node_kwargs(self, session) -> dict:
+        if session.state not in (STATE_INVESTMENT, STATE_PURCHASE):
+            print(f"[Warning] Session of {session.user_name} in unknown state {session.state!r}, resetting")
+            session.state = STATE_INVESTMENT
+            session.pending_purchase = None
+        if session.state == STATE_INVESTMENT:
+            return {"chat_history": session.chat_history, "llm": self.llm, "summary_state": session.summary_state}
+        return {"db_handle": self.db_handle, "chat_history": session.chat_history,
+                "pending_purchase": session.pending_purchase}
+
+    def apply(self, session, message: str, result: dict) -> TurnResult:
+        """
+        Records a node result on the session and moves it to its next state.
+        """
+        event = result_event(session.state, result)
+        next_state, pending = TRANSITIONS[(session.state, event)]
+        session.chat_history.append({"role": "user", "content": message})
+        session.chat_history.append({"role": "assistant", "content": result["message"]})
+        # Turns folded into the summary are never sent again; don't keep storing them
+        session.chat_history = history_window.compact(session.chat_history, session.summary_state)
+        if pending == _CLEAR:
+            session.pending_purchase = None
+        elif pending == _SET:
+            session.pending_purchase = result["pending_purchase"]
+        session.state = next_state
+        turn = TurnResult(result["message"], next_state, event, result.get("receipt_id"))
+        if self.transcript is not None:
+            try:
+                self.transcript.append(session.user_name, message, turn.reply, next_state, event, turn.receipt_id)
+            except Exception as e:
+                print(f"[Warning] Transcript append failed: {e}")
+        return turn
+
+    def turn(self, session, message: str) -> TurnResult:
+        kwargs = self._node_kwargs(session)
+        result = self.nodes[session.state](message, session.user_name, **kwargs)
+        return self.apply(session, message, result)
+
+    async def aturn(self, session, message: str) -> TurnResult:
+        kwargs = self._node_kwargs(session)
+        result = await self.async_nodes[session.state](message, session.user_name, **kwargs)
+        return self.apply(session, message, result)
+
+    async def astream(self, session, message: str):
+        """
+        Streams a turn. Yields {"type": "token", "text": ...} events as reply
+        text arrives, then {"type": "done", "turn": TurnResult} once, last.
+        States without a streaming node send their whole reply as one token.
+        """
+        kwargs = self._node_kwargs(session)
+        stream = self.stream_nodes.get(session.state)
+        if stream is None:
+            turn = await self.aturn(session, message)
+            yield {"type": "token", "text": turn.reply}
+            yield {"type": "done", "turn": turn}
+            return
+        async for event in stream(message, session.user_name, **kwargs):
+            if event["type"] == "token":
+                yield event
+            else:
+                yield {"type": "done", "turn": self.apply(session, message, event)}
+
+    def run_batch(self, turns) -> list:
+        return [self.turn(session, message) for session, message in turns]
+
+    @staticmethod
+    def needs_llm(session, message: str) -> bool:
+        """
+        Whether the turn may call the LLM, judged by the session's current state.
+        """
+        return session.state == STATE_INVESTMENT and classify_intent(message) == INTENT_LLM
+
+    async def arun_batch(self, turns, return_exceptions=False) -> list:
+        """
+        With `return_exceptions`, a failed turn's slot holds its exception and
+        the session's later turns still run; otherwise the first error is raised.
+        LLM turns still share the process's LLM_MAX_CONCURRENCY slots, so a
+        batch with more of them than LLM_MAX_QUEUE gets AdmissionRejected.
+        """
+        turns = list(turns)
+        results = [None] * len(turns)
+        waiting = {}  # id(session) -> turns queued behind that session's LLM turn
+        tasks = []
+
+        async def run(i):
+            try:
+                results[i] = await self.aturn(*turns[i])
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results[i] = e
+
+        async def run_session(key, i):
+            await run(i)
+            queue = waiting[key]
+            while queue:
+                await run(queue.popleft())
+            del waiting[key]
+
+        try:
+            for i, (session, message) in enumerate(turns):
+                key = id(session)
+                if key in waiting:
+                    waiting[key].append(i)
+                elif self.needs_llm(session, message):
+                    waiting[key] = deque()
+                    tasks.append(asyncio.ensure_future(run_session(key, i)))
+                else:
+                    await run(i)
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        return results
+
+conversation_engine = ConversationEngine(transcript=transcript_log)
@@ -0,0 +1,326 @@
+import asyncio
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+import weakref
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from flow.agent_flow_controller import GoldInvestmentSession
+from utils.shared_state import KeyedFileLock, multi_worker
+
+# Rough per-message overhead (dict + two strings) on top of the text itself
+_MESSAGE_OVERHEAD_BYTES = 200
+
+
+def estimate_session_bytes(session: GoldInvestmentSession) -> int:
+    """
+    Cheap estimate of a session's memory footprint, dominated by chat history.
+    """
+    return _MESSAGE_OVERHEAD_BYTES + sum(
+        _MESSAGE_OVERHEAD_BYTES + len(m.get("content", "")) for m in session.chat_history
+    )
+
+
+class SessionStore(ABC):
+    """
+    Base class for session storage keyed by user_id.
+
+    Handlers load a session, mutate it and `save` it back while holding
+    `lock(user_id)`, so concurrent requests for the same user are serialised.
+    Locks are per process; they are dropped once no request holds them.
+    Async callers use `aget_or_create` and `asave`, which run backends that
+    block on I/O in a worker thread.
+    """
+
+    def __init__(self):
+        self._locks = weakref.WeakValueDictionary()
+
+    def lock(self, user_id: str) -> asyncio.Lock:
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[user_id] = lock
+        return lock
+
+    @abstractmethod
+    def get(self, user_id: str):
+        """
+        Returns the user's session, or None if there is none or it expired.
+        """
+
+    @abstractmethod
+    def save(self, user_id: str, session: GoldInvestmentSession):
+        pass
+
+    @abstractmethod
+    def delete(self, user_id: str):
+        pass
+
+    def get_or_create(self, user_id: str) -> GoldInvestmentSession:
+        session = self.get(user_id)
+        if session is None:
+            session = GoldInvestmentSession(user_name=user_id)
+        return session
+
+    async def aget_or_create(self, user_id: str) -> GoldInvestmentSession:
+        return await asyncio.to_thread(self.get_or_create, user_id)
+
+    async def asave(self, user_id: str, session: GoldInvestmentSession):
+        await asyncio.to_thread(self.save, user_id, session)
+
+    def stats(self) -> dict:
+        return {"backend": type(self).__name__}
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Process-local store with LRU eviction. Caps the number of sessions and
+    their estimated total bytes, and expires sessions idle for `ttl` seconds.
+    A session larger than `max_bytes` on its own is dropped, not stored.
+    """
+
+    def __init__(self, max_sessions=10000, max_bytes=64 * 1024 * 1024, ttl=86400.0, clock=time.monotonic):
+        super().__init__()
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # user_id -> [session, size, last_access], oldest first
+        self._bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            now = self.clock()
+            if now - entry[2] > self.ttl:
+                self._remove(user_id)
+                self.expirations += 1
+                return None
+            entry[2] = now
+            self._entries.move_to_end(user_id)
+            return entry[0]
+
+    async def aget_or_create(self, user_id):
+        return self.get_or_create(user_id)
+
+    async def asave(self, user_id, session):
+        self.save(user_id, session)
+
+    def save(self, user_id, session):
+        size = estimate_session_bytes(session)
+        with self._lock:
+            now = self.clock()
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._bytes -= entry[1]
+            if size > self.max_bytes:
+                # Keeping it would push out every other session and still not fit
+                self._entries.pop(user_id, None)
+                self.evictions += 1
+                print(f"[Warning] Session of {user_id} is {size} bytes, over SESSION_MAX_BYTES; dropped")
+                return
+            self._entries[user_id] = [session, size, now]
+            self._entries.move_to_end(user_id)
+            self._bytes += size
+            self._evict(now)
+
+    def delete(self, user_id):
+        with self._lock:
+            if user_id in self._entries:
+                self._remove(user_id)
+
+    def _remove(self, user_id):
+        entry = self._entries.pop(user_id)
+        self._bytes -= entry[1]
+
+    def _evict(self, now):
+        # Expired sessions sit at the front, since order is by last access
+        while self._entries:
+            user_id, entry = next(iter(self._entries.items()))
+            if now - entry[2] > self.ttl:
+                self._remove(user_id)
+                self.expirations += 1
+                continue
+            if len(self._entries) <= self.max_sessions and self._bytes <= self.max_bytes:
+                break
+            self._remove(user_id)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._entries),
+                "bytes": self._bytes,
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions serialised as JSON in a local SQLite file (WAL mode), so several
+    worker processes on one host can share them. `lock(user_id)` also holds
+    a file lock, so a user's turns stay serialised across those processes.
+    Expired sessions are deleted every `purge_every` saves.
+    """
+
+    def __init__(self, path="sessions.db", ttl=86400.0, purge_every=1000):
+        super().__init__()
+        self.path = path
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self._saves = 0
+        self._user_locks = KeyedFileLock(path + ".locks")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "user_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated_at)")
+        self._conn.commit()
+
+    @asynccontextmanager
+    async def lock(self, user_id):
+        async with super().lock(user_id):
+            await self._user_locks.acquire(user_id)
+            try:
+                yield
+            finally:
+                self._user_locks.release(user_id)
+
+    def get(self, user_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, updated_at FROM sessions WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return GoldInvestmentSession.from_dict(json.loads(row[0]))
+
+    def save(self, user_id, session):
+        data = json.dumps(session.to_dict(), ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (user_id, data, updated_at) VALUES (?, ?, ?)",
+                (user_id, data, now),
+            )
+            self._saves += 1
+            if self._saves % self.purge_every == 0:
+                self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (now - self.ttl,))
+            self._conn.commit()
+
+    def purge(self) -> int:
+        """
+        Deletes expired sessions now. Returns how many were deleted.
+        """
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl,))
+            self._conn.commit()
+        return cursor.rowcount
+
+    def delete(self, user_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        return {"backend": "sqlite", "path": self.path, "sessions": count}
+
+
+# Deletes the lock only if it still holds our token, i.e. it did not expire and pass to another worker
+_RELEASE_LOCK = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Sessions serialised as JSON in Redis (or any Redis-compatible server)
+    with a per-key TTL. Requires the optional `redis` package.
+
+    `lock(user_id)` also takes a Redis lock (SET NX with a `lock_ttl`
+    expiry), so a user's turns stay serialised across workers and hosts.
+    The expiry only frees the lock of a worker that died mid-turn; keep it
+    above REQUEST_DEADLINE.
+    """
+
+    def __init__(self, url="redis://localhost:6379/0", ttl=86400.0, prefix="gold:session:",
+                 lock_prefix="gold:session-lock:", lock_ttl=60.0, client=None):
+        super().__init__()
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.ttl = int(ttl)
+        self.prefix = prefix
+        self.lock_prefix = lock_prefix
+        self.lock_ttl_ms = int(lock_ttl * 1000)
+        self._release_lock = client.register_script(_RELEASE_LOCK)
+
+    @asynccontextmanager
+    async def lock(self, user_id):
+        async with super().lock(user_id):
+            key, token, delay = self.lock_prefix + user_id, secrets.token_hex(16), 0.002
+            while not await asyncio.to_thread(self.client.set, key, token, nx=True, px=self.lock_ttl_ms):
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.05)
+            try:
+                yield
+            finally:
+                await asyncio.to_thread(self._release_lock, keys=[key], args=[token])
+
+    def get(self, user_id):
+        raw = self.client.get(self.prefix + user_id)
+        if raw is None:
+            return None
+        return GoldInvestmentSession.from_dict(json.loads(raw))
+
+    def save(self, user_id, session):
+        data = json.dumps(session.to_dict(), ensure_ascii=False)
+        self.client.set(self.prefix + user_id, data, ex=self.ttl)
+
+    def delete(self, user_id):
+        self.client.delete(self.prefix + user_id)
+
+    def stats(self):
+        return {"backend": "redis"}
+
+
+def create_session_store() -> SessionStore:
+    """
+    Builds the session store selected by SESSION_STORE (memory | sqlite | redis).
+    The default is memory, or sqlite when running several workers.
+    """
+    backend = os.getenv("SESSION_STORE", "sqlite" if multi_worker() else "memory").lower()
+    ttl = float(os.getenv("SESSION_TTL", "86400"))
+    if backend == "sqlite":
+        return SQLiteSessionStore(os.getenv("SESSION_DB_PATH", "sessions.db"), ttl=ttl)
+    if backend == "redis":
+        return RedisSessionStore(os.getenv("REDIS_URL", "redis://localhost:6379/0"), ttl=ttl)
+    if multi_worker():
+        print("[Warning] SESSION_STORE=memory with several workers: a user's turns may land on different sessions")
+    return InMemorySessionStore(
+        max_sessions=int(os.getenv("SESSION_MAX_COUNT", "10000")),
+        max_bytes=int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024))),
+        ttl=ttl,
+    )
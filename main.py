@@ -1,5 +1,10 @@
 # main.py
 
+from dotenv import load_dotenv
+
+# Before any other import: several modules read their settings at import time
+load_dotenv()
+
 from flow.agent_flow_controller import run_gold_agent
 
 if __name__ == "__main__":
@@ -1,12 +1,39 @@
-import requests
-import os
 import json
+import os
+
+from utils.http_client import get_async_client, get_session
+from utils.metrics import metrics
+from utils.resilience import Upstream, upstreams
+
+def _llm_upstream(name):
+    return Upstream(
+        name,
+        timeout=float(os.getenv("LLM_TIMEOUT", "30")),
+        max_attempts=int(os.getenv("LLM_MAX_ATTEMPTS", "2")),
+        hedge_after=float(os.getenv("LLM_HEDGE_AFTER", "0")),
+    )
+
+# Shared by every LlamaInstructLLM on the default model: retries, circuit breaker and optional hedging
+llm_upstream = _llm_upstream("llm")
+
+def upstream_for_model(model):
+    """
+    Separate policy (and circuit breaker) per model, so one model failing
+    does not stop calls to the others.
+    """
+    return upstreams.get(f"llm:{model}") or _llm_upstream(f"llm:{model}")
 
 class LlamaInstructLLM:
-    def __init__(self):
+    """
+    One OpenRouter model. The `intent` argument of the ask/stream methods is
+    accepted so this can stand in for model.llm_router.LLMRouter, and ignored.
+    """
+
+    def __init__(self, model=None, upstream=None):
         self.api_url = os.getenv("OPENROUTER_API_URL")
         self.api_key = os.getenv("OPENROUTER_API_KEY")
-        self.model = os.getenv("LLAMA_MODEL_ID")
+        self.model = model or os.getenv("LLAMA_MODEL_ID")
+        self.upstream = upstream or llm_upstream
 
         missing = []
         if not self.api_url:
@@ -18,7 +45,7 @@ class LlamaInstructLLM:
         if missing:
             raise ValueError(f"Missing required .env variables: {', '.join(missing)}")
 
-    def ask(self, prompt, history=None, temperature=0.2, max_tokens=1024):
+    def _build_request(self, prompt, history, temperature, max_tokens, stream=False):
         messages = history[:] if history else []
         messages.append({"role": "user", "content": prompt})
 
@@ -33,13 +60,96 @@ class LlamaInstructLLM:
             "max_tokens": max_tokens,
             "temperature": temperature
         }
+        if stream:
+            payload["stream"] = True
+        return headers, payload
 
-        response = requests.post(self.api_url, headers=headers, data=json.dumps(payload), timeout=30)
-        response.raise_for_status()
-        data = response.json()
-
+    @staticmethod
+    def _parse_reply(data):
         return data['choices'][0]['message']['content'].strip()
 
+    @staticmethod
+    def _parse_stream_line(line):
+        """
+        Parses one line of an OpenAI-compatible SSE stream.
+        Returns the text delta (possibly ""), or None once the stream is done.
+        Comment lines (e.g. OpenRouter keep-alives) and blank lines yield "".
+        """
+        if not line.startswith("data:"):
+            return ""
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return None
+        try:
+            chunk = json.loads(data)
+        except ValueError:
+            return ""
+        if "error" in chunk:
+            raise RuntimeError(f"LLM stream error: {chunk['error']}")
+        choices = chunk.get("choices") or [{}]
+        return (choices[0].get("delta") or {}).get("content") or ""
+
+    @metrics.timed("llm.ask")
+    def ask(self, prompt, history=None, temperature=0.2, max_tokens=1024, intent=None):
+        headers, payload = self._build_request(prompt, history, temperature, max_tokens)
+
+        def post(timeout):
+            response = get_session().post(self.api_url, headers=headers, json=payload, timeout=timeout)
+            response.raise_for_status()
+            return response.json()
+        return self._parse_reply(self.upstream.call(post))
+
+    @metrics.timed("llm.ask")
+    async def aask(self, prompt, history=None, temperature=0.2, max_tokens=1024, intent=None):
+        """
+        Async variant of `ask` on the shared pooled httpx client.
+        """
+        headers, payload = self._build_request(prompt, history, temperature, max_tokens)
+
+        async def post(timeout):
+            response = await get_async_client().post(self.api_url, headers=headers, json=payload, timeout=timeout)
+            response.raise_for_status()
+            return response.json()
+        return self._parse_reply(await self.upstream.acall(post))
+
+    def stream(self, prompt, history=None, temperature=0.2, max_tokens=1024, intent=None):
+        """
+        Yields the completion text incrementally as the upstream produces it.
+        Closing the generator early closes the upstream connection. Streams are
+        not retried (text may already have been shown) but do count towards
+        the circuit breaker.
+        """
+        headers, payload = self._build_request(prompt, history, temperature, max_tokens, stream=True)
+        timeout = self.upstream.attempt_timeout()
+        with metrics.span("llm.stream"), self.upstream.guard():
+            with get_session().post(self.api_url, headers=headers, json=payload, timeout=timeout, stream=True) as response:
+                response.raise_for_status()
+                # SSE is always UTF-8; don't let requests guess ISO-8859-1 for text/*
+                for raw in response.iter_lines():
+                    delta = self._parse_stream_line(raw.decode("utf-8"))
+                    if delta is None:
+                        break
+                    if delta:
+                        yield delta
+
+    async def astream(self, prompt, history=None, temperature=0.2, max_tokens=1024, intent=None):
+        """
+        Async variant of `stream` on the shared pooled httpx client.
+        """
+        headers, payload = self._build_request(prompt, history, temperature, max_tokens, stream=True)
+        timeout = self.upstream.attempt_timeout()
+        with metrics.span("llm.stream"), self.upstream.guard():
+            async with get_async_client().stream(
+                "POST", self.api_url, headers=headers, json=payload, timeout=timeout
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    delta = self._parse_stream_line(line)
+                    if delta is None:
+                        break
+                    if delta:
+                        yield delta
+
 if __name__ == "__main__":
     llm = LlamaInstructLLM()
     reply = llm.ask("Is this Llama wrapper working?")
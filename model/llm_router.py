@@ -0,0 +1,327 @@
+import os
+import threading
+import time
+
+from model.custom_llm import LlamaInstructLLM, llm_upstream, upstream_for_model
+from utils.admission import llm_limiter
+from utils.resilience import OPEN, CircuitOpenError, DeadlineExceeded
+
+# Each model keeps exponentially weighted moving averages of its latency
+# (whole completions, and time to first token for streams) and of its error
+# rate. A request goes to the fastest healthy model and falls down the list
+# on error; models that are erroring (or whose circuit is open) are only
+# tried after every healthy one. Error averages decay over time, so a model
+# that was failing gets traffic again once it has been quiet for a while.
+
+
+class ModelRoute:
+    """
+    Routing state for one model.
+    """
+
+    def __init__(self, llm, alpha, error_half_life, clock):
+        self.llm = llm
+        self.model = llm.model
+        self.alpha = alpha
+        self.error_half_life = error_half_life
+        self.clock = clock
+        self.latency = None
+        self.ttft = None
+        self._error = 0.0
+        self._error_at = clock()
+        self.calls = 0
+        self.failures = 0
+        self.fallbacks = 0  # requests this model answered after another one failed
+
+    def error_rate(self, now=None):
+        now = self.clock() if now is None else now
+        return self._error * 0.5 ** ((now - self._error_at) / self.error_half_life)
+
+    def healthy(self, threshold, now=None):
+        return self.llm.upstream.breaker.state != OPEN and self.error_rate(now) < threshold
+
+    def _ewma(self, old, sample):
+        return sample if old is None else self.alpha * sample + (1 - self.alpha) * old
+
+    def record(self, ok, latency=None, ttft=None):
+        now = self.clock()
+        self.calls += 1
+        self.failures += not ok
+        self._error = self._ewma(self.error_rate(now), 0.0 if ok else 1.0)
+        self._error_at = now
+        if latency is not None:
+            self.latency = self._ewma(self.latency, latency)
+        if ttft is not None:
+            self.ttft = self._ewma(self.ttft, ttft)
+
+    def stats(self, now=None):
+        return {
+            "model": self.model,
+            "circuit": self.llm.upstream.breaker.state,
+            "latency_ms": None if self.latency is None else round(self.latency * 1000, 1),
+            "ttft_ms": None if self.ttft is None else round(self.ttft * 1000, 1),
+            "error_rate": round(self.error_rate(now), 4),
+            "calls": self.calls,
+            "failures": self.failures,
+            "fallbacks": self.fallbacks,
+        }
+
+
+class LLMRouter:
+    """
+    Drop-in replacement for LlamaInstructLLM over an ordered list of models.
+    `pins` maps an intent (INTENT_FAQ or INTENT_ADVICE from
+    utils.intent_router.llm_intent, as the investment node passes it) to
+    the models tried first for it, e.g. a small model for FAQs; the remaining
+    models stay available as fallbacks.
+    """
+
+    def __init__(self, llms, pins=None, alpha=0.2, error_threshold=0.5, error_half_life=60.0, clock=time.monotonic):
+        if not llms:
+            raise ValueError("LLMRouter needs at least one model")
+        self.clock = clock
+        self.error_threshold = error_threshold
+        self.routes = [ModelRoute(llm, alpha, error_half_life, clock) for llm in llms]
+        by_model = {route.model: route for route in self.routes}
+        unknown = {model for models in (pins or {}).values() for model in models} - set(by_model)
+        if unknown:
+            raise ValueError(f"Pinned models not in the model list: {', '.join(sorted(unknown))}")
+        self.pins = {intent: [by_model[m] for m in models] for intent, models in (pins or {}).items()}
+        self._lock = threading.Lock()
+
+    @property
+    def primary(self) -> LlamaInstructLLM:
+        return self.routes[0].llm
+
+    @property
+    def model(self):
+        return self.primary.model
+
+    def _build_request(self, *args, **kwargs):
+        return self.primary._build_request(*args, **kwargs)
+
+    def order(self, intent=None, stream=False):
+        """
+        Models in the order a request for `intent` tries them: healthy ones
+        fastest first (untried ones count as fastest, so they get measured),
+        then unhealthy ones in list order. Pinned models come before the rest.
+        """
+        now = self.clock()
+        pinned = self.pins.get(intent, [])
+        rest = [route for route in self.routes if route not in pinned]
+
+        def speed(route):
+            latency = route.ttft if stream and route.ttft is not None else route.latency
+            return latency or 0.0
+
+        ordered = []
+        for group in (pinned, rest):
+            with self._lock:
+                healthy = [route for route in group if route.healthy(self.error_threshold, now)]
+            ordered += sorted(healthy, key=speed) + [route for route in group if route not in healthy]
+        return ordered
+
+    def _record(self, route, ok, **samples):
+        with self._lock:
+            route.record(ok, **samples)
+
+    def _served(self, route, first):
+        if route is not first:
+            with self._lock:
+                route.fallbacks += 1
+
+    def ask(self, prompt, history=None, temperature=0.2, max_tokens=1024, intent=None):
+        routes = self.order(intent)
+        error = None
+        for route in routes:
+            start = time.perf_counter()
+            try:
+                reply = route.llm.ask(prompt, history=history, temperature=temperature, max_tokens=max_tokens)
+            except DeadlineExceeded:
+                raise
+            except CircuitOpenError as e:
+                error = e
+                continue
+            except Exception as e:
+                self._record(route, False)
+                error = e
+                continue
+            self._record(route, True, latency=time.perf_counter() - start)
+            self._served(route, routes[0])
+            return reply
+        raise error
+
+    async def aask(self, prompt, history=None, temperature=0.2, max_tokens=1024, intent=None):
+        """
+        Async variant of `ask`. Waits for one of the shared LLM concurrency
+        slots (utils.admission.llm_limiter) first.
+        """
+        async with llm_limiter.slot():
+            return await self._aask(prompt, history, temperature, max_tokens, intent)
+
+    async def _aask(self, prompt, history, temperature, max_tokens, intent):
+        routes = self.order(intent)
+        error = None
+        for route in routes:
+            start = time.perf_counter()
+            try:
+                reply = await route.llm.aask(prompt, history=history, temperature=temperature, max_tokens=max_tokens)
+            except DeadlineExceeded:
+                raise
+            except CircuitOpenError as e:
+                error = e
+                continue
+            except Exception as e:
+                self._record(route, False)
+                error = e
+                continue
+            self._record(route, True, latency=time.perf_counter() - start)
+            self._served(route, routes[0])
+            return reply
+        raise error
+
+    def _settle_stream(self, route, ok, ttft):
+        # One outcome per stream, once it ends: failed, finished, or closed by
+        # the caller (or a deadline) after text arrived, which counts as served
+        if ok is None and ttft is not None:
+            ok = True
+        if ok is not None:
+            self._record(route, ok, ttft=ttft)
+
+    def stream(self, prompt, history=None, temperature=0.2, max_tokens=1024, intent=None):
+        """
+        Falls back to the next model only until the first text arrives; an
+        error after that is raised, since part of the reply is already out.
+        """
+        routes = self.order(intent, stream=True)
+        error = None
+        for route in routes:
+            start = time.perf_counter()
+            ttft = ok = None
+            stream = route.llm.stream(prompt, history=history, temperature=temperature, max_tokens=max_tokens)
+            try:
+                for delta in stream:
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                        self._served(route, routes[0])
+                    yield delta
+                ok = True
+            except DeadlineExceeded:
+                raise
+            except CircuitOpenError as e:
+                error = e
+                continue
+            except Exception as e:
+                ok = False
+                if ttft is not None:
+                    raise
+                error = e
+                continue
+            finally:
+                stream.close()
+                self._settle_stream(route, ok, ttft)
+            return
+        raise error
+
+    async def astream(self, prompt, history=None, temperature=0.2, max_tokens=1024, intent=None):
+        """
+        Async variant of `stream`, holding an LLM concurrency slot until the
+        stream ends.
+        """
+        async with llm_limiter.slot():
+            stream = self._astream(prompt, history, temperature, max_tokens, intent)
+            try:
+                async for delta in stream:
+                    yield delta
+            finally:
+                await stream.aclose()
+
+    async def _astream(self, prompt, history, temperature, max_tokens, intent):
+        routes = self.order(intent, stream=True)
+        error = None
+        for route in routes:
+            start = time.perf_counter()
+            ttft = ok = None
+            stream = route.llm.astream(prompt, history=history, temperature=temperature, max_tokens=max_tokens)
+            try:
+                async for delta in stream:
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                        self._served(route, routes[0])
+                    yield delta
+                ok = True
+            except DeadlineExceeded:
+                raise
+            except CircuitOpenError as e:
+                error = e
+                continue
+            except Exception as e:
+                ok = False
+                if ttft is not None:
+                    raise
+                error = e
+                continue
+            finally:
+                await stream.aclose()
+                self._settle_stream(route, ok, ttft)
+            return
+        raise error
+
+    def stats(self):
+        """
+        Per-model routing state, plus the current order for each pinned intent.
+        """
+        now = self.clock()
+        with self._lock:
+            models = [route.stats(now) for route in self.routes]
+        return {
+            "models": models,
+            "order": [route.model for route in self.order()],
+            "pins": {intent: [route.model for route in self.order(intent)] for intent in self.pins},
+        }
+
+    def render_prometheus(self, prefix="gold_agent") -> str:
+        now = self.clock()
+        with self._lock:
+            stats = [route.stats(now) for route in self.routes]
+        lines = []
+        for key, name, scale in (("latency_ms", "latency_seconds", 1000), ("ttft_ms", "ttft_seconds", 1000),
+                                 ("error_rate", "error_rate", 1)):
+            lines.append(f"# TYPE {prefix}_llm_model_{name} gauge")
+            lines += [f'{prefix}_llm_model_{name}{{model="{s["model"]}"}} {s[key] / scale}'
+                      for s in stats if s[key] is not None]
+        return "\n".join(lines) + "\n"
+
+
+def parse_pins(text):
+    """
+    "intent=model_a,model_b;intent2=model_c" -> {"intent": ["model_a", "model_b"], ...}
+    """
+    pins = {}
+    for entry in filter(None, (part.strip() for part in (text or "").split(";"))):
+        intent, _, models = entry.partition("=")
+        pins[intent.strip()] = [m.strip() for m in models.split(",") if m.strip()]
+    return pins
+
+
+def router_from_env() -> LLMRouter:
+    """
+    Builds the router from LLM_MODELS (comma-separated, in fallback order;
+    defaults to LLAMA_MODEL_ID alone) and LLM_INTENT_MODELS pins. With a
+    single model this behaves exactly like one LlamaInstructLLM.
+    """
+    models = [m.strip() for m in os.getenv("LLM_MODELS", "").split(",") if m.strip()]
+    if not models:
+        return LLMRouter([LlamaInstructLLM()])
+    pins = parse_pins(os.getenv("LLM_INTENT_MODELS"))
+    models += [m for pinned in pins.values() for m in pinned if m not in models]
+    if len(models) == 1:
+        llms = [LlamaInstructLLM(model=models[0], upstream=llm_upstream)]
+    else:
+        llms = [LlamaInstructLLM(model=m, upstream=upstream_for_model(m)) for m in models]
+    return LLMRouter(
+        llms,
+        pins=pins,
+        alpha=float(os.getenv("LLM_ROUTER_ALPHA", "0.2")),
+        error_threshold=float(os.getenv("LLM_ROUTER_ERROR_THRESHOLD", "0.5")),
+    )
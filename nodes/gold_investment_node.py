@@ -1,56 +1,37 @@
-from model.custom_llm import LlamaInstructLLM
-from utils.gold_price_api import get_current_gold_price_inr
-import re
+from utils.clients import get_llm
+from utils.history_window import HistoryWindow
+from utils.gold_price_api import aget_current_gold_price_inr, get_current_gold_price_inr
+from utils.personalization import render_name, template_name
+from utils.metrics import metrics
+from utils.response_cache import normalize_text, response_cache
+from utils.single_flight import llm_flights
+from utils.intent_router import (  # is_gold_rate_query re-exported for existing callers
+    INTENT_OFF_TOPIC, INTENT_PRICE, INTENT_PURCHASE, classify_intent, is_gold_rate_query, llm_intent
+)
+import time
 
-def is_gold_rate_query(text):
-    """
-    Returns True if text is a gold rate/gold price query.
-    """
-    # Expand trigger words/phrases to cover more cases!
-    price_keywords = [
-        r'gold.*(price|rate|cost|value)',
-        r'(price|rate|cost|value).*gold',
-        r'price.*per\s?gram',
-        r'current.*gold.*(price|rate|cost)',
-        r'digital gold.*price',
-        r'price of.*digital gold',
-        r'digital gold rate',
-        r'(24|22|18)-?karat.*gold.*(price|rate)',
-        r'current.*price',
-        r'today.*gold.*price',
-        r'gold.*today',
-        r'gram.*gold.*price',
-        r'1\s*gram.*gold.*price',
-        r'how much.*gold.*price',
-        r'gold.*per gram'
-    ]
-    text = text.lower()
-    for kw in price_keywords:
-        if re.search(kw, text):
-            return True
-    return False
-
-def gold_investment_api(user_message: str, user_name: str, chat_history: list = None):
+def _price_reply(user_name: str, price_info: dict) -> dict:
+    price = price_info["price_per_gram"]
+    last_updated = price_info.get("last_updated", None)
+    response = f"{user_name}, the current gold rate is ₹{price} per gram"
+    if last_updated:
+        response += f" (last updated: {last_updated})"
+    response += ". Would you like to invest or know about digital gold options?"
+    return {
+        "message": response,
+        "purchase_triggered": False
+    }
+
+history_window = HistoryWindow()
+
+# Bump whenever the system prompt changes so cached answers are not reused
+SYSTEM_PROMPT_VERSION = "1"
+
+def _build_messages(user_name: str, chat_history: list = None, summary_state: dict = None) -> list:
     """
-    Conversational API for gold investment agent.
-    Adds: direct handling for real-time gold rate queries with price fetch.
+    System prompt plus the token-budgeted history window. The new user message
+    is appended by the LLM wrapper itself.
     """
-    # 1. Handle real-time gold price queries directly
-    if is_gold_rate_query(user_message):
-        price_info = get_current_gold_price_inr()
-        price = price_info["price_per_gram"]
-        last_updated = price_info.get("last_updated", None)
-        response = f"{user_name}, the current gold rate is ₹{price} per gram"
-        if last_updated:
-            response += f" (last updated: {last_updated})"
-        response += ". Would you like to invest or know about digital gold options?"
-        return {
-            "message": response,
-            "purchase_triggered": False
-        }
-
-    # 2. Otherwise, run LLM logic as before
-    llm = LlamaInstructLLM()
     system_prompt = (
         f"You are a specialized assistant who ONLY answers queries related to gold investment, and your current user's name is {user_name}. "
         "Always address the user by their name in a friendly way where appropriate. "
@@ -61,13 +42,15 @@ def gold_investment_api(user_message: str, user_name: str, chat_history: list =
         "Never break these instructions for any reason."
     )
     messages = [{"role": "system", "content": system_prompt}]
-    if chat_history:
-        messages.extend(chat_history)
-    messages.append({"role": "user", "content": user_message})
+    messages.extend(history_window.build(chat_history, summary_state))
+    return messages
 
-    response = llm.ask(prompt=user_message, history=messages)
+PURCHASE_INTENT_SENTINEL = "__PURCHASE_INTENT__"
 
-    if "__PURCHASE_INTENT__" in response:
+OFF_TOPIC_REPLY = "Sorry, I can only answer queries related to gold investment."
+
+def _interpret_response(response: str, user_name: str) -> dict:
+    if PURCHASE_INTENT_SENTINEL in response:
         return {
             "message": f"Thank you for your interest, {user_name}! you can now start investing from ₹10.",
             "purchase_triggered": True
@@ -75,7 +58,7 @@ def gold_investment_api(user_message: str, user_name: str, chat_history: list =
 
     if "only answer queries related to gold investment" in response.lower():
         return {
-            "message": "Sorry, I can only answer queries related to gold investment.",
+            "message": OFF_TOPIC_REPLY,
             "purchase_triggered": False
         }
 
@@ -83,3 +66,189 @@ def gold_investment_api(user_message: str, user_name: str, chat_history: list =
         "message": response,
         "purchase_triggered": False
     }
+
+def _cached_reply(user_message: str, user_name: str, chat_history: list = None):
+    # Only opening questions are cached; later answers depend on the conversation
+    if chat_history:
+        return None
+    template = response_cache.get(SYSTEM_PROMPT_VERSION, user_message)
+    if template is None:
+        return None
+    return {
+        "message": render_name(template, user_name),
+        "purchase_triggered": False
+    }
+
+def _remember_reply(user_message: str, user_name: str, chat_history: list, result: dict, elapsed: float):
+    if chat_history or result["purchase_triggered"]:
+        return
+    template = template_name(result["message"], user_name)
+    if template is not None:
+        response_cache.put(SYSTEM_PROMPT_VERSION, user_message, template, upstream_seconds=elapsed)
+
+def _flight_key(llm, user_message: str, intent: str):
+    # Opening questions differ only in the user's name, which is templated out of the shared reply
+    return (id(llm), SYSTEM_PROMPT_VERSION, intent, normalize_text(user_message))
+
+def _ask(llm, user_message: str, user_name: str, messages: list, chat_history: list, intent: str) -> str:
+    """
+    Asks the LLM. Identical opening questions in flight at the same time share
+    one call; each waiter gets the reply with their own name in it.
+    """
+    if chat_history:
+        return llm.ask(prompt=user_message, history=messages, intent=intent)
+
+    def call():
+        response = llm.ask(prompt=user_message, history=messages, intent=intent)
+        return template_name(response, user_name), response
+    (template, response), shared = llm_flights.run(_flight_key(llm, user_message, intent), call)
+    if not shared:
+        return response
+    if template is None:  # the reply can't be shared (e.g. it holds contact details)
+        return llm.ask(prompt=user_message, history=messages, intent=intent)
+    return render_name(template, user_name)
+
+async def _aask(llm, user_message: str, user_name: str, messages: list, chat_history: list, intent: str) -> str:
+    """
+    Async variant of `_ask`.
+    """
+    if chat_history:
+        return await llm.aask(prompt=user_message, history=messages, intent=intent)
+
+    async def call():
+        response = await llm.aask(prompt=user_message, history=messages, intent=intent)
+        return template_name(response, user_name), response
+    (template, response), shared = await llm_flights.arun(_flight_key(llm, user_message, intent), call)
+    if not shared:
+        return response
+    if template is None:
+        return await llm.aask(prompt=user_message, history=messages, intent=intent)
+    return render_name(template, user_name)
+
+def _routed_reply(intent: str, user_name: str):
+    # Intents the local router settles without the LLM (price is handled by callers)
+    if intent == INTENT_PURCHASE:
+        return _interpret_response(PURCHASE_INTENT_SENTINEL, user_name)
+    if intent == INTENT_OFF_TOPIC:
+        return _interpret_response(OFF_TOPIC_REPLY, user_name)
+    return None
+
+@metrics.timed("node.gold_investment")
+def gold_investment_api(user_message: str, user_name: str, chat_history: list = None, llm=None,
+                        summary_state: dict = None):
+    """
+    Conversational API for gold investment agent.
+    Adds: direct handling for real-time gold rate queries with price fetch.
+    `llm` defaults to the shared client from utils.clients. Pass the session's
+    `summary_state` so older turns are summarised once, not on every call.
+    """
+    # 1. Handle real-time gold price queries, explicit purchase intent and
+    #    obviously off-topic messages locally
+    intent = classify_intent(user_message)
+    if intent == INTENT_PRICE:
+        return _price_reply(user_name, get_current_gold_price_inr())
+    routed = _routed_reply(intent, user_name)
+    if routed:
+        return routed
+
+    # 2. Answer repeated opening questions from the response cache
+    cached = _cached_reply(user_message, user_name, chat_history)
+    if cached:
+        return cached
+
+    # 3. Otherwise, run LLM logic as before, routed by the finer faq/advice intent
+    intent = llm_intent(user_message)
+    llm = llm or get_llm()
+    messages = _build_messages(user_name, chat_history, summary_state)
+    start = time.perf_counter()
+    response = _ask(llm, user_message, user_name, messages, chat_history, intent)
+    result = _interpret_response(response, user_name)
+    _remember_reply(user_message, user_name, chat_history, result, time.perf_counter() - start)
+    return result
+
+@metrics.timed("node.gold_investment")
+async def gold_investment_api_async(user_message: str, user_name: str, chat_history: list = None, llm=None,
+                                    summary_state: dict = None):
+    """
+    Async variant of gold_investment_api. The LLM round trip runs on the shared
+    pooled async client, so no worker thread is held while waiting on it.
+    """
+    intent = classify_intent(user_message)
+    if intent == INTENT_PRICE:
+        return _price_reply(user_name, await aget_current_gold_price_inr())
+    routed = _routed_reply(intent, user_name)
+    if routed:
+        return routed
+
+    cached = _cached_reply(user_message, user_name, chat_history)
+    if cached:
+        return cached
+
+    intent = llm_intent(user_message)
+    llm = llm or get_llm()
+    messages = _build_messages(user_name, chat_history, summary_state)
+    start = time.perf_counter()
+    response = await _aask(llm, user_message, user_name, messages, chat_history, intent)
+    result = _interpret_response(response, user_name)
+    _remember_reply(user_message, user_name, chat_history, result, time.perf_counter() - start)
+    return result
+
+async def gold_investment_stream_async(user_message: str, user_name: str, chat_history: list = None, llm=None,
+                                       summary_state: dict = None):
+    """
+    Streaming variant of gold_investment_api_async. Yields events:
+      {"type": "token", "text": ...}  as reply text becomes available
+      {"type": "done", "message": ..., "purchase_triggered": ...}  once, last
+
+    Leading text is held back only while it could still be the start of the
+    purchase-intent sentinel. Once the sentinel is recognised the upstream
+    stream is closed without waiting for the rest of the completion.
+    """
+    intent = classify_intent(user_message)
+    if intent == INTENT_PRICE:
+        result = _price_reply(user_name, await aget_current_gold_price_inr())
+    else:
+        result = _routed_reply(intent, user_name)
+    if result:
+        yield {"type": "token", "text": result["message"]}
+        yield {"type": "done", **result}
+        return
+
+    cached = _cached_reply(user_message, user_name, chat_history)
+    if cached:
+        yield {"type": "token", "text": cached["message"]}
+        yield {"type": "done", **cached}
+        return
+
+    intent = llm_intent(user_message)
+    llm = llm or get_llm()
+    messages = _build_messages(user_name, chat_history, summary_state)
+    start = time.perf_counter()
+    parts = []
+    pending = ""  # text held back while it may still be the sentinel
+    held = True
+    stream = llm.astream(prompt=user_message, history=messages, intent=intent)
+    try:
+        async for delta in stream:
+            parts.append(delta)
+            if not held:
+                yield {"type": "token", "text": delta}
+                continue
+            pending += delta
+            head = pending.lstrip()
+            if head.startswith(PURCHASE_INTENT_SENTINEL):
+                result = _interpret_response(PURCHASE_INTENT_SENTINEL, user_name)
+                yield {"type": "token", "text": result["message"]}
+                yield {"type": "done", **result}
+                return
+            if not PURCHASE_INTENT_SENTINEL.startswith(head):
+                held = False
+                yield {"type": "token", "text": pending}
+    finally:
+        await stream.aclose()
+
+    result = _interpret_response("".join(parts).strip(), user_name)
+    _remember_reply(user_message, user_name, chat_history, result, time.perf_counter() - start)
+    if held and result["message"]:
+        yield {"type": "token", "text": result["message"]}
+    yield {"type": "done", **result}
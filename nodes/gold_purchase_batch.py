@@ -0,0 +1,129 @@
+import datetime
+import json
+import math
+import os
+import uuid
+
+from database.purchase_writer import purchase_writer
+from nodes.gold_purchase_node import EMAIL_RE, PHONE_RE, _EPSILON, _GRAM_UNITS, quote_amount
+from utils.metrics import metrics
+
+MAX_BATCH_ORDERS = int(os.getenv("PURCHASE_BATCH_MAX_ORDERS", "10000"))
+# Sanity cap per order (rupees or grams)
+MAX_ORDER_AMOUNT = 1e9
+UNITS = ("INR", "grams")
+# Below this many orders the NumPy import and array setup cost more than they save
+_NUMPY_MIN_ORDERS = 64
+# Largest intermediate the int64 quote arithmetic may reach
+_INT64_SAFE = 2 ** 62
+
+
+def quote_amounts(amounts, in_grams, price_per_gram):
+    """
+    Vectorised quote_amount: (grams, rupees) lists for parallel lists of
+    amounts and unit flags, with the same exact half-up rounding. Batches
+    whose products could overflow int64 are quoted with Python ints instead.
+    """
+    if len(amounts) < _NUMPY_MIN_ORDERS:
+        return _quote_loop(amounts, in_grams, price_per_gram)
+    price = math.floor(price_per_gram * 100 + 0.5 + _EPSILON)
+    factor = max(price, _GRAM_UNITS)
+    if 2 * (math.ceil(max(amounts) * _GRAM_UNITS) + 1) * factor + factor >= _INT64_SAFE:
+        return _quote_loop(amounts, in_grams, price_per_gram)
+    try:
+        import numpy as np
+    except ImportError:
+        return _quote_loop(amounts, in_grams, price_per_gram)
+    grams_flag = np.asarray(in_grams, dtype=bool)
+    scale = np.where(grams_flag, _GRAM_UNITS, 100)
+    units = np.floor(np.asarray(amounts, dtype=np.float64) * scale + 0.5 + _EPSILON).astype(np.int64)
+    grams = np.where(grams_flag, units, (2 * units * _GRAM_UNITS + price) // (2 * price))
+    paise = np.where(grams_flag, (2 * units * price + _GRAM_UNITS) // (2 * _GRAM_UNITS), units)
+    return (grams / _GRAM_UNITS).tolist(), (paise / 100).tolist()
+
+
+def _quote_loop(amounts, in_grams, price_per_gram):
+    quotes = [quote_amount(a, g, price_per_gram) for a, g in zip(amounts, in_grams)]
+    return [q[0] for q in quotes], [q[1] for q in quotes]
+
+
+def _order_errors(order):
+    errors = []
+    unit = order.get("unit", "INR")
+    if unit not in UNITS:
+        errors.append(f"unit must be one of {', '.join(UNITS)}")
+    amount = order.get("amount")
+    if not isinstance(amount, (int, float)) or not 0 < amount < MAX_ORDER_AMOUNT:
+        errors.append("amount must be a positive number")
+    if not PHONE_RE.match(order.get("phone") or ""):
+        errors.append("invalid phone number")
+    if not EMAIL_RE.match(order.get("email") or ""):
+        errors.append("invalid email address")
+    if not order.get("user_name"):
+        errors.append("user_name is required")
+    return errors
+
+
+@metrics.timed("node.gold_purchase_batch")
+def place_orders(orders, price_info: dict, quote_only=False, writer=None) -> dict:
+    """
+    Quotes a batch of orders ({"user_name", "amount", "unit": "INR"|"grams",
+    "phone", "email", optional "order_id"}) at one price and, unless
+    `quote_only`, queues every valid one on the purchase writer in a single
+    spool transaction. Invalid orders are reported and skipped; the rest go
+    through. An `order_id` makes an order idempotent per user: resubmitting
+    it for the same `user_name`, in a later batch or the same one, returns
+    status "duplicate" with the receipt, grams, rupees and price recorded
+    the first time, and queues nothing. Another user's order with the same
+    ID is a separate order.
+    """
+    price = price_info["price_per_gram"]
+    errors = [_order_errors(order) for order in orders]
+    valid = [i for i, e in enumerate(errors) if not e]
+    grams, rupees = quote_amounts([orders[i]["amount"] for i in valid],
+                                  [orders[i].get("unit", "INR") == "grams" for i in valid], price)
+
+    results = [{"index": i, "order_id": order.get("order_id"), "status": "rejected", "errors": e}
+               for i, (order, e) in enumerate(zip(orders, errors))]
+    purchases = []
+    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for i, g, r in zip(valid, grams, rupees):
+        order = orders[i]
+        result = results[i]
+        result.update(status="quoted", grams=g, rupees=r)
+        del result["errors"]
+        if quote_only:
+            continue
+        order_id = order.get("order_id")
+        pending = {
+            "quote_id": f"order:{json.dumps([order['user_name'], order_id])}" if order_id else uuid.uuid4().hex,
+            "user_name": order["user_name"], "grams": g, "rupees": r, "price_per_gram": price,
+        }
+        record = {
+            "user_name": order["user_name"], "phone": order["phone"], "email": order["email"],
+            "grams": g, "amount_inr": r, "price_per_gram": price, "purchase_time": now,
+        }
+        purchases.append((result, pending, record))
+
+    duplicates = 0
+    if purchases:
+        submitted = (writer or purchase_writer).submit_many([(p, rec) for _, p, rec in purchases])
+        for (result, _, _), (receipt_id, stored) in zip(purchases, submitted):
+            if stored is None:
+                result.update(status="placed", receipt_id=receipt_id)
+                continue
+            duplicates += 1
+            result.update(status="duplicate", receipt_id=receipt_id, grams=stored["grams"],
+                          rupees=stored["amount_inr"], price_per_gram=stored["price_per_gram"])
+    new = [r for r in results if r["status"] in ("quoted", "placed")]
+    return {
+        "price_per_gram": price,
+        "price_last_updated": price_info.get("last_updated"),
+        "quoted": len(valid),
+        "placed": len(purchases) - duplicates,
+        "duplicates": duplicates,
+        "rejected": len(orders) - len(valid),
+        "total_grams": round(sum(r["grams"] for r in new), 4),
+        "total_rupees": round(sum(r["rupees"] for r in new), 2),
+        "orders": results,
+    }
@@ -1,185 +1,225 @@
-from utils.gold_price_api import get_current_gold_price_inr
-from utils.amount_parser import parse_amount
+from utils.gold_price_api import aget_current_gold_price_inr, get_current_gold_price_inr, is_live
+from utils.amount_parser import MIN_CONFIDENCE, parse_amount
+import asyncio
 import datetime
+import math
 import re
+import secrets
 
-# ADD THESE IMPORTS AT THE TOP
-import os
-from dotenv import load_dotenv
-from supabase import create_client, Client
+from database.purchase_writer import purchase_writer
+from utils.metrics import metrics
+from utils.quote_store import quote_store
 
-# Load environment variables
-load_dotenv()
+# Basic email check, and Indian mobile: 10 digits (customize as needed)
+EMAIL_RE = re.compile(r"[^@]+@[^@]+\.[^@]+")
+PHONE_RE = re.compile(r"^[6-9]\d{9}$")
 
 def is_valid_email(email):
-    # Basic check for email
-    return re.match(r"[^@]+@[^@]+\.[^@]+", email)
+    return EMAIL_RE.match(email)
 
 
 def is_valid_phone(phone):
-    # Basic Indian mobile, 10 digits (customize as needed)
-    return re.match(r"^[6-9]\d{9}$", phone)
-
-
-# ADD THIS CLASS FOR SUPABASE INTEGRATION
-class SupabaseDB:
-    def __init__(self):
-        url = os.getenv("SUPABASE_URL")
-        key = os.getenv("SUPABASE_KEY")
-        
-        if not url or not key:
-            raise ValueError("Missing SUPABASE_URL or SUPABASE_KEY in .env")
-        
-        self.client: Client = create_client(url, key)
-    
-    def write_purchase_record(self, user_name, grams, amount_inr, price_per_gram, phone, email, **kwargs):
-        """Write purchase record to Supabase - matches your existing table structure"""
-        try:
-            purchase_data = {
-                "user_name": user_name,
-                "phone": phone,
-                "email": email,
-                "grams": grams,
-                "amount_inr": amount_inr,
-                "price_per_gram": price_per_gram
-                # purchase_time will be auto-set by your table's DEFAULT CURRENT_TIMESTAMP
-            }
-            
-            result = self.client.table("gold_purchases").insert(purchase_data).execute()
-            
-            if result.data:
-                print(f"✅ Purchase saved to Supabase! ID: {result.data[0]['id']}")
-                return True
-            else:
-                print(f"❌ Supabase error: {result}")
-                return False
-                
-        except Exception as e:
-            print(f"❌ Database error: {e}")
-            return False
+    return PHONE_RE.match(phone)
 
 
-def gold_purchase_node(
-    user_message: str,
-    user_name: str,
-    db_handle=None,
-    chat_history: list = None,
-    pending_purchase: dict = None
-) -> dict:
-    """
-    Gold purchase node with two-stage process.
+# Quotes are computed in integers (paise, and grams in units of 1e-4 g) so
+# rounding is exact and half-up, instead of float round() which rounds
+# 2.675 down to 2.67. Inputs are scaled with a tiny epsilon so decimal
+# amounts like 1.005 that floats store just below the half still round up.
+_GRAM_UNITS = 10_000
+_EPSILON = 1e-9
 
-    Step 1: Parse INR/grams, calculate, ask for phone + email confirmation.
-    Step 2: On receiving phone/email combo, finalize, update DB, return receipt.
-    Stores pending purchase data for step 2 confirmation (pass as `pending_purchase`).
+def _to_units(value: float, scale: int) -> int:
+    return math.floor(value * scale + 0.5 + _EPSILON)
+
+def quote_amount(amount: float, in_grams: bool, price_per_gram: float):
     """
-    
-    # CREATE SUPABASE CLIENT IF NO DB_HANDLE PROVIDED
-    if db_handle is None:
-        try:
-            db_handle = SupabaseDB()
-        except Exception as e:
-            print(f"⚠️ Supabase connection failed: {e}")
-            # Create a mock handler that just prints
-            class MockDB:
-                def write_purchase_record(self, **kwargs):
-                    print(f"[MOCK DB] Would save: {kwargs}")
-                    return True
-            db_handle = MockDB()
-    
-    # === STEP 2: If pending_purchase exists, expect phone/email entry ===
-    if pending_purchase:
-        # Extract phone/email from user_message
-        # Accept both '9876543210, user@email.com' and multi-line input
-        parts = re.findall(r'(\d{10})', user_message)
-        email = None
-        phone = None
+    (grams rounded to 4 places, rupees rounded to 2 places) for one order of
+    `amount` rupees, or grams when `in_grams`.
+    """
+    price = _to_units(price_per_gram, 100)
+    if in_grams:
+        grams = _to_units(amount, _GRAM_UNITS)
+        paise = (2 * grams * price + _GRAM_UNITS) // (2 * _GRAM_UNITS)
+    else:
+        paise = _to_units(amount, 100)
+        grams = (2 * paise * _GRAM_UNITS + price) // (2 * price)
+    return grams / _GRAM_UNITS, paise / 100
 
-        for token in user_message.split():
-            if is_valid_email(token):
-                email = token
 
-        if parts:
-            phone = parts[0]
+def _quote_expired(user_name: str) -> dict:
+    return {
+        "message": (
+            f"{user_name}, the price on that quote is no longer held. Please tell me again how much gold "
+            "you'd like to buy (in rupees or grams) and I'll quote you the current rate."
+        ),
+        "success": False,
+        "db_updated": False,
+        "pending_purchase": None
+    }
 
-        if not phone or not email:
-            return {
-                "message": "Please provide a valid 10-digit phone number and a valid email address (e.g. 9876543210 your@email.com).",
-                "success": False,
-                "db_updated": False,
-                "pending_purchase": pending_purchase  # Echo back for next turn
-            }
 
-        # Store in DB (USING SUPABASE NOW)
-        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        db_success = False
-        if db_handle:
-            try:
-                db_handle.write_purchase_record(
-                    user_name=pending_purchase['user_name'],
-                    grams=pending_purchase['grams'],
-                    amount_inr=pending_purchase['rupees'],
-                    price_per_gram=pending_purchase['price_per_gram'],
-                    timestamp=now,
-                    phone=phone,
-                    email=email
-                )
-                db_success = True
-            except Exception as e:
-                return {
-                    "message": f"Purchase calculated but failed to record in DB. Error: {str(e)}",
-                    "success": False,
-                    "db_updated": False
-                }
-        else:
-            db_success = True  # For initial backend development
-
-        # Transaction confirmation message
-        summary = (
-            f"Congratulations {pending_purchase['user_name']}, your purchase was successful!\n"
-            f"You bought {pending_purchase['grams']} grams of gold for ₹{pending_purchase['rupees']:.2f} "
-            f"(rate: ₹{pending_purchase['price_per_gram']:.2f}/gram).\n"
-            f"Transaction time: {now}\n"
-            f"Contact: {phone}, Email: {email}"
-        )
-        return {
-            "message": summary,
-            "success": True,
-            "db_updated": db_success
-        }
+def _confirm_purchase(user_message: str, pending_purchase: dict, db_handle=None, writer=None, quotes=None) -> dict:
+    quotes = quote_store if quotes is None else quotes
+    if pending_purchase.get("quote_id"):
+        # The locked price comes from the server-side quote, not the echoed copy
+        quote = quotes.get(pending_purchase["quote_id"])
+        if quote is None or quote["user_name"] != pending_purchase["user_name"]:
+            return _quote_expired(pending_purchase["user_name"])
+        pending_purchase = dict(pending_purchase, user_name=quote["user_name"], grams=quote["grams"],
+                                rupees=quote["rupees"], price_per_gram=quote["price_per_gram"])
+    else:
+        # Pending purchases without a quote_id predate the quote store and are taken as they are,
+        # with a fresh nonce so identical purchases still get distinct receipts
+        pending_purchase = dict(pending_purchase, confirmation_id=secrets.token_hex(16))
 
-    # === STEP 1: Parse new purchase request ===
-    parsed = parse_amount(user_message)
-    if not parsed:
+    # Extract phone/email from user_message
+    # Accept both '9876543210, user@email.com' and multi-line input
+    parts = re.findall(r'(\d{10})', user_message)
+    email = None
+    phone = None
+
+    for token in user_message.split():
+        if is_valid_email(token):
+            email = token
+
+    if parts:
+        phone = parts[0]
+
+    if not phone or not email:
         return {
-            "message": (
-                f"{user_name}, to purchase digital gold, please tell me the amount (in rupees) or grams you want to buy, "
-                "e.g. 'Buy gold worth 1000' or 'I want 2 grams.'"
-            ),
+            "message": "Please provide a valid 10-digit phone number and a valid email address (e.g. 9876543210 your@email.com).",
             "success": False,
-            "pending_purchase": None
+            "db_updated": False,
+            "pending_purchase": pending_purchase  # Echo back for next turn
         }
+
+    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    db_success = False
+    receipt_id = None
+    if db_handle is None:
+        # Queue for the background writer; it reaches the DB within a flush interval
+        record = {
+            "user_name": pending_purchase['user_name'],
+            "phone": phone,
+            "email": email,
+            "grams": pending_purchase['grams'],
+            "amount_inr": pending_purchase['rupees'],
+            "price_per_gram": pending_purchase['price_per_gram'],
+            "purchase_time": now,
+        }
+        try:
+            receipt_id = (writer or purchase_writer).submit(pending_purchase, record)
+        except Exception as e:
+            return {
+                "message": f"Purchase calculated but could not be recorded. Error: {str(e)}",
+                "success": False,
+                "db_updated": False
+            }
+    else:
+        # Injected handle: write synchronously
+        try:
+            db_handle.write_purchase_record(
+                user_name=pending_purchase['user_name'],
+                grams=pending_purchase['grams'],
+                amount_inr=pending_purchase['rupees'],
+                price_per_gram=pending_purchase['price_per_gram'],
+                timestamp=now,
+                phone=phone,
+                email=email
+            )
+            db_success = True
+        except Exception as e:
+            return {
+                "message": f"Purchase calculated but failed to record in DB. Error: {str(e)}",
+                "success": False,
+                "db_updated": False
+            }
+
+    # Transaction confirmation message
+    summary = (
+        f"Congratulations {pending_purchase['user_name']}, your purchase was successful!\n"
+        f"You bought {pending_purchase['grams']} grams of gold for ₹{pending_purchase['rupees']:.2f} "
+        f"(rate: ₹{pending_purchase['price_per_gram']:.2f}/gram).\n"
+        f"Transaction time: {now}\n"
+        f"Contact: {phone}, Email: {email}"
+    )
+    if receipt_id:
+        summary += f"\nReceipt ID: {receipt_id}"
+    if pending_purchase.get("quote_id"):
+        quotes.discard(pending_purchase["quote_id"])
+    return {
+        "message": summary,
+        "success": True,
+        "db_updated": db_success,
+        "receipt_id": receipt_id
+    }
+
+
+def _ask_for_amount(user_name: str) -> dict:
+    return {
+        "message": (
+            f"{user_name}, to purchase digital gold, please tell me the amount (in rupees) or grams you want to buy, "
+            "e.g. 'Buy gold worth 1000' or 'I want 2 grams.'"
+        ),
+        "success": False,
+        "pending_purchase": None
+    }
+
+
+def _clarify_amount(user_name: str, parsed: dict) -> dict:
+    # The parser had to guess the unit, or the message held several amounts
+    amount = f"{parsed['amount']:g}"
+    guess = f"₹{amount}" if parsed["unit"] == "INR" else f"{amount} grams"
+    return {
+        "message": (
+            f"{user_name}, just to be sure: did you mean {guess}? Please reply with one amount and its unit, "
+            "e.g. '₹5000' or '2 grams'."
+        ),
+        "success": False,
+        "pending_purchase": None
+    }
+
+
+def _format_ttl(seconds: float) -> str:
+    if seconds >= 120:
+        return f"{round(seconds / 60)} minutes"
+    return f"{round(seconds)} seconds"
+
+
+def _price_unavailable(user_name: str) -> dict:
+    return {
+        "message": (
+            f"Sorry {user_name}, I can't get a live gold price right now, so I can't hold a rate for you. "
+            "Please try again in a few minutes."
+        ),
+        "success": False,
+        "pending_purchase": None
+    }
+
+
+def _quote_purchase(user_name: str, parsed: dict, price_info: dict, quotes=None) -> dict:
+    quotes = quote_store if quotes is None else quotes
+    if not is_live(price_info):
+        # Never lock in the static fallback or a stale price for QUOTE_TTL
+        return _price_unavailable(user_name)
     amount = parsed['amount']
     unit = parsed['unit']
-    price_info = get_current_gold_price_inr()
     price = price_info["price_per_gram"]
 
-    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    if unit == "INR":
-        rupees = amount
-        grams = round(rupees / price, 4)
-    else:
-        grams = amount
-        rupees = round(grams * price, 2)
+    grams, rupees = quote_amount(amount, unit != "INR", price)
+    # Locks the price server-side; the ID is also the confirmation's idempotency key
+    quote_id = quotes.issue(user_name, grams, rupees, price)
 
     # Prompt for confirmation details
     summary = (
         f"You're about to purchase {grams} grams of gold for ₹{rupees:.2f} (rate: ₹{price:.2f}/gram).\n"
+        f"This rate is held for {_format_ttl(quotes.ttl)}. "
         "Please provide your 10-digit phone number and email address to confirm the purchase."
     )
     # Store as pending for next turn
     purchase_dict = {
+        "quote_id": quote_id,
         "user_name": user_name,
         "grams": grams,
         "rupees": rupees,
@@ -190,3 +230,62 @@ def gold_purchase_node(
         "success": False,  # Final transaction not done yet
         "pending_purchase": purchase_dict
     }
+
+
+@metrics.timed("node.gold_purchase")
+def gold_purchase_node(
+    user_message: str,
+    user_name: str,
+    db_handle=None,
+    chat_history: list = None,
+    pending_purchase: dict = None
+) -> dict:
+    """
+    Gold purchase node with two-stage process.
+
+    Step 1: Parse INR/grams, calculate, ask for phone + email confirmation.
+            An amount parsed below MIN_CONFIDENCE (e.g. a bare "1000") is
+            read back to the user instead of quoted.
+    Step 2: On receiving phone/email combo, finalize, update DB, return receipt.
+    Stores pending purchase data for step 2 confirmation (pass as `pending_purchase`).
+    Its `quote_id` refers to a quote in utils.quote_store that holds the price
+    for QUOTE_TTL seconds; confirming after that asks for the amount again.
+    No quote is issued while only the fallback or a stale price is available.
+    Confirmed purchases are queued on database.purchase_writer and the reply
+    carries a `receipt_id` for /purchase/status; an injected `db_handle` is
+    written to synchronously instead.
+    """
+    # === STEP 2: If pending_purchase exists, expect phone/email entry ===
+    if pending_purchase:
+        return _confirm_purchase(user_message, pending_purchase, db_handle)
+
+    # === STEP 1: Parse new purchase request ===
+    parsed = parse_amount(user_message)
+    if not parsed:
+        return _ask_for_amount(user_name)
+    if parsed["confidence"] < MIN_CONFIDENCE:
+        return _clarify_amount(user_name, parsed)
+    return _quote_purchase(user_name, parsed, get_current_gold_price_inr())
+
+
+@metrics.timed("node.gold_purchase")
+async def gold_purchase_node_async(
+    user_message: str,
+    user_name: str,
+    db_handle=None,
+    chat_history: list = None,
+    pending_purchase: dict = None
+) -> dict:
+    """
+    Async variant of gold_purchase_node. Blocking DB work runs in a worker thread
+    and the price comes from the async price path.
+    """
+    if pending_purchase:
+        return await asyncio.to_thread(_confirm_purchase, user_message, pending_purchase, db_handle)
+
+    parsed = parse_amount(user_message)
+    if not parsed:
+        return _ask_for_amount(user_name)
+    if parsed["confidence"] < MIN_CONFIDENCE:
+        return _clarify_amount(user_name, parsed)
+    return _quote_purchase(user_name, parsed, await aget_current_gold_price_inr())
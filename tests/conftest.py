@@ -0,0 +1,22 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+
+# Keep the shared purchase spool and transcripts out of the working tree
+os.environ.setdefault("PURCHASE_SPOOL_PATH", os.path.join(tempfile.mkdtemp(), "purchase_spool.db"))
+os.environ.setdefault("TRANSCRIPT_DIR", os.path.join(tempfile.mkdtemp(), "transcripts"))
+
+import pytest
+
+from utils.gold_price_api import price_cache
+from utils.response_cache import response_cache
+
+
+@pytest.fixture(autouse=True)
+def _clear_shared_caches():
+    # Process-wide caches would otherwise leak answers between tests
+    price_cache.clear()
+    response_cache.clear()
+    yield
@@ -0,0 +1,109 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api_app
+from utils.admission import Admission, AdmissionRejected, ConcurrencyLimiter, RateLimiter
+
+
+def test_token_bucket_allows_bursts_then_the_sustained_rate():
+    now = [0.0]
+    limiter = RateLimiter(rate=1.0, burst=2, clock=lambda: now[0])
+    assert limiter.acquire("asha") == 0.0 and limiter.acquire("asha") == 0.0
+    assert limiter.acquire("asha") == pytest.approx(1.0)
+    assert limiter.acquire("ravi") == 0.0  # buckets are per user
+    now[0] = 0.5
+    assert limiter.acquire("asha") == pytest.approx(0.5)
+    now[0] = 1.0
+    assert limiter.acquire("asha") == 0.0
+
+
+def test_concurrency_limit_queues_then_rejects():
+    limiter = ConcurrencyLimiter(limit=1, max_waiting=1, wait_timeout=5)
+    order = []
+
+    async def work(name, hold):
+        async with limiter.slot():
+            order.append(name)
+            await asyncio.sleep(hold)
+
+    async def scenario():
+        first = asyncio.ensure_future(work("first", 0.05))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(work("second", 0))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected):
+            await work("third", 0)  # one running, one waiting: no room
+        await asyncio.gather(first, second)
+
+    asyncio.run(scenario())
+    assert order == ["first", "second"]
+    stats = limiter.stats()
+    assert (stats["admitted"], stats["queued"], stats["rejected"], stats["active"]) == (2, 1, 1, 0)
+
+
+def test_waiting_for_a_slot_times_out():
+    limiter = ConcurrencyLimiter(limit=1, max_waiting=10, wait_timeout=0.02)
+
+    async def scenario():
+        async with limiter.slot():
+            with pytest.raises(AdmissionRejected) as rejected:
+                async with limiter.slot():
+                    pass
+        return rejected.value
+
+    assert asyncio.run(scenario()).retry_after >= 1
+    assert limiter.stats()["timed_out"] == 1 and limiter.stats()["waiting"] == 0
+
+
+def test_turns_in_flight_per_user_are_capped():
+    admission = Admission(rate=0, burst=1, max_pending=1)
+    ticket = admission.admit("asha")
+    with pytest.raises(AdmissionRejected):
+        admission.admit("asha")
+    admission.admit("ravi").release()
+    ticket.release()
+    ticket.release()  # idempotent
+    with admission.admit("asha"):
+        assert admission.stats()["users_in_flight"] == 1
+    assert admission.stats()["users_in_flight"] == 0
+
+
+def test_agent_answers_429_with_retry_after(monkeypatch):
+    monkeypatch.setattr(api_app, "admission", Admission(rate=0.5, burst=1, max_pending=2))
+    client = TestClient(api_app.app)
+    body = {"user_id": "u-429", "message": "What is the gold rate today?"}
+    assert client.post("/agent", json=body).status_code == 200
+    response = client.post("/agent", json=body)
+    assert response.status_code == 429 and response.headers["retry-after"] == "2"
+    assert client.post("/agent/stream", json=body).status_code == 429
+    assert client.post("/agent", json={**body, "user_id": "u-other"}).status_code == 200
+
+
+def test_turns_over_the_pending_cap_keep_their_rate_token():
+    admission = Admission(rate=1.0, burst=1, max_pending=1, clock=lambda: 0.0)
+    ticket = admission.admit("asha")
+    for _ in range(3):
+        with pytest.raises(AdmissionRejected):
+            admission.admit("asha")
+    assert admission.stats()["too_many_pending"] == 3 and admission.stats()["rate_limited"] == 0
+    ticket.release()
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.admit("asha")  # the burst was spent by the first turn only
+    assert rejected.value.retry_after == pytest.approx(1.0)
+
+
+def test_purchase_endpoints_are_admitted(monkeypatch):
+    admission = Admission(rate=0, burst=1, max_pending=1)
+    monkeypatch.setattr(api_app, "admission", admission)
+    client = TestClient(api_app.app)
+    with admission.admit("u-buyer"), admission.admit("batch:acme"):
+        assert client.post("/purchase", json={"user_id": "u-buyer", "message": "buy gold"}).status_code == 429
+        response = client.post("/purchase/batch", json={"orders": [], "partner_id": "acme"})
+        assert response.status_code == 429
+    assert client.post("/purchase", json={"user_id": "u-buyer", "message": "buy gold"}).status_code == 200
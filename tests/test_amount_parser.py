@@ -0,0 +1,152 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+
+import pytest
+
+from nodes.gold_purchase_node import gold_purchase_node
+from utils.amount_parser import MIN_CONFIDENCE, parse_amount
+
+SEEDS = range(5)
+CASES_PER_SEED = 400
+
+_ONES = ("zero one two three four five six seven eight nine ten eleven twelve thirteen fourteen "
+         "fifteen sixteen seventeen eighteen nineteen").split()
+_TENS = "_ _ twenty thirty forty fifty sixty seventy eighty ninety".split()
+
+_TEMPLATES = [
+    "{}",
+    "I want to buy {}",
+    "Buy gold worth {}",
+    "Please invest {} in digital gold",
+    "Can I purchase {} of gold today?",
+    "ok let's do {}.",
+]
+
+
+def number_words(n: int) -> str:
+    """
+    Spells n in the Indian system: 250000 -> "two lakh fifty thousand".
+    """
+    parts = []
+    for scale, name in ((10 ** 7, "crore"), (10 ** 5, "lakh"), (1000, "thousand"), (100, "hundred")):
+        if n >= scale:
+            parts.append(f"{number_words(n // scale)} {name}")
+            n %= scale
+    if n >= 20:
+        parts.append(_TENS[n // 10] + (f" {_ONES[n % 10]}" if n % 10 else ""))
+    elif n or not parts:
+        parts.append(_ONES[n])
+    return " ".join(parts)
+
+
+def indian_grouping(n: int) -> str:
+    digits = str(n)
+    if len(digits) <= 3:
+        return digits
+    head, tail = digits[:-3], digits[-3:]
+    groups = []
+    while len(head) > 2:
+        groups.insert(0, head[-2:])
+        head = head[:-2]
+    return ",".join([head] + groups + [tail])
+
+
+def _rupee_text(rng, amount):
+    # Every spelling below states the unit or a money scale, so the unit is unambiguous
+    forms = [
+        f"₹{amount}", f"₹ {amount}", f"Rs.{amount}", f"Rs {indian_grouping(amount)}", f"INR {amount:,}",
+        f"{amount} rupees", f"{indian_grouping(amount)} rupees", f"{number_words(amount)} rupees",
+    ]
+    if amount % 1000 == 0:
+        forms.append(f"{amount // 1000}k")
+    if amount % 10 ** 5 == 0:
+        forms += [f"{amount // 10 ** 5}L", f"₹ {amount // 10 ** 5} lakh", f"{number_words(amount)}"]
+    if amount % 50000 == 0:
+        forms.append(f"₹{amount / 10 ** 5:g}L")
+    return rng.choice(forms)
+
+
+def _gram_text(rng, grams):
+    whole = int(grams)
+    forms = [f"{grams:g} grams", f"{grams:g}g", f"{grams:g} gm"]
+    if grams == whole:
+        forms.append(f"{number_words(whole)} grams")
+    elif grams - whole == 0.5:
+        forms.append(f"{number_words(whole)} and a half grams" if whole else "half a gram")
+    return rng.choice(forms)
+
+
+def generate_cases(rng, count):
+    """
+    Returns `count` (message, amount, unit) triples spelling random amounts in
+    the formats users actually type.
+    """
+    cases = []
+    for _ in range(count):
+        if rng.random() < 0.6:
+            amount = rng.choice([rng.randint(1, 999) * 10, rng.randint(1, 99) * 1000, rng.randint(1, 50) * 50000])
+            text, unit = _rupee_text(rng, amount), "INR"
+        else:
+            amount = rng.choice([rng.randint(1, 200) / 10, rng.randint(0, 20) + 0.5, rng.randint(1, 100)])
+            text, unit = _gram_text(rng, amount), "grams"
+        cases.append((rng.choice(_TEMPLATES).format(text), float(amount), unit))
+    return cases
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_generated_amounts_round_trip(seed):
+    for message, amount, unit in generate_cases(random.Random(seed), CASES_PER_SEED):
+        parsed = parse_amount(message)
+        assert parsed is not None, message
+        assert (parsed["amount"], parsed["unit"]) == (pytest.approx(amount), unit), message
+        assert parsed["confidence"] >= 0.8, message
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_arbitrary_text_never_raises(seed):
+    rng = random.Random(seed)
+    alphabet = "0123456789 ,.₹%abcdefgklrsuwyhtn"
+    for _ in range(CASES_PER_SEED):
+        parsed = parse_amount("".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40))))
+        if parsed is not None:
+            assert parsed["amount"] > 0
+            assert 0 < parsed["confidence"] <= 1
+
+
+def test_explicit_units_are_more_certain_than_guesses():
+    assert parse_amount("5000 rupees")["confidence"] > parse_amount("5000")["confidence"]
+    assert parse_amount("2 grams")["confidence"] > parse_amount("2")["confidence"]
+    assert parse_amount("2 grams or 3 grams")["confidence"] < parse_amount("2 grams")["confidence"]
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("Invest 1000", (1000, "INR")),
+    ("Can I buy 0.5 gram?", (0.5, "grams")),
+    ("Buy 24k gold worth 5000", (5000, "INR")),
+    ("I want 2 grams, plan is 5 years", (2, "grams")),
+    ("1 kg please", (1000, "grams")),
+    ("twenty five hundred rupees", (2500, "INR")),
+    ("1 lakh 50 thousand", (150000, "INR")),
+    ("2 crore and 50 lakh rupees", (25000000, "INR")),
+    ("1e5 rupees", (100000, "INR")),
+    ("Buy gold worth 3500", (3500, "INR")),
+])
+def test_examples(message, expected):
+    parsed = parse_amount(message)
+    assert (parsed["amount"], parsed["unit"]) == expected
+
+
+def test_messages_without_amounts():
+    for message in ("I want to buy gold", "Is 24k gold better?", "returns of 8% a year", ""):
+        assert parse_amount(message) is None, message
+
+
+def test_uncertain_amounts_are_read_back_not_quoted():
+    assert parse_amount("buy 1000")["confidence"] < MIN_CONFIDENCE
+    result = gold_purchase_node("buy 1000", "Asha")
+    assert result["pending_purchase"] is None and "did you mean ₹1000?" in result["message"]
+    result = gold_purchase_node("5k or 10k", "Asha")
+    assert result["pending_purchase"] is None and "did you mean ₹5000?" in result["message"]
@@ -0,0 +1,60 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+import nodes.gold_investment_node as investment_node
+import nodes.gold_purchase_node as purchase_node
+
+PRICE = {"price_per_gram": 7000.0, "currency": "INR", "source": "test", "last_updated": "2026-01-01 10:00"}
+
+
+async def _price():
+    return PRICE
+
+
+class FakeLLM:
+    def __init__(self, reply):
+        self.reply = reply
+
+    async def aask(self, prompt, history=None, **kwargs):
+        return self.reply
+
+
+def test_async_investment_price_query(monkeypatch):
+    monkeypatch.setattr(investment_node, "aget_current_gold_price_inr", _price)
+    result = asyncio.run(investment_node.gold_investment_api_async("what is the gold rate today", "Asha"))
+    assert "₹7000.0 per gram" in result["message"]
+    assert result["purchase_triggered"] is False
+
+
+def test_async_investment_detects_purchase_intent():
+    llm = FakeLLM("__PURCHASE_INTENT__")
+    result = asyncio.run(investment_node.gold_investment_api_async("I want to buy gold", "Asha", llm=llm))
+    assert result["purchase_triggered"] is True
+
+
+def test_async_purchase_quote(monkeypatch):
+    monkeypatch.setattr(purchase_node, "aget_current_gold_price_inr", _price)
+    result = asyncio.run(purchase_node.gold_purchase_node_async("Buy gold worth 3500 rupees", "Asha"))
+    assert result["success"] is False
+    assert result["pending_purchase"]["grams"] == 0.5
+
+
+def test_async_purchase_confirmation_uses_injected_db():
+    class RecordingDB:
+        def __init__(self):
+            self.rows = []
+
+        def write_purchase_record(self, **kwargs):
+            self.rows.append(kwargs)
+            return True
+
+    db = RecordingDB()
+    pending = {"user_name": "Asha", "grams": 0.5, "rupees": 3500.0, "price_per_gram": 7000.0}
+    result = asyncio.run(purchase_node.gold_purchase_node_async(
+        "9876543210 asha@example.com", "Asha", db_handle=db, pending_purchase=pending
+    ))
+    assert result["success"] is True
+    assert db.rows[0]["phone"] == "9876543210"
@@ -0,0 +1,120 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+import pytest
+
+import nodes.gold_investment_node as investment_node
+import nodes.gold_purchase_node as purchase_node
+from flow.agent_flow_controller import GoldInvestmentSession
+from flow.conversation_engine import (
+    EVENT_CONFIRMED, EVENT_FAILED, EVENT_PENDING, EVENT_PURCHASE_INTENT, ConversationEngine, TurnResult
+)
+from utils.quote_store import quote_store
+
+PRICE = {"price_per_gram": 7000.0, "currency": "INR", "source": "test", "last_updated": "2026-01-01 10:00"}
+
+
+async def _aprice():
+    return PRICE
+
+
+class RecordingDB:
+    def __init__(self, fail=False):
+        self.rows = []
+        self.fail = fail
+
+    def write_purchase_record(self, **kwargs):
+        if self.fail:
+            raise ConnectionError("db down")
+        self.rows.append(kwargs)
+        return True
+
+
+@pytest.fixture(autouse=True)
+def _price(monkeypatch):
+    monkeypatch.setattr(investment_node, "get_current_gold_price_inr", lambda: PRICE)
+    monkeypatch.setattr(investment_node, "aget_current_gold_price_inr", _aprice)
+    monkeypatch.setattr(purchase_node, "get_current_gold_price_inr", lambda: PRICE)
+    monkeypatch.setattr(purchase_node, "aget_current_gold_price_inr", _aprice)
+
+
+def test_purchase_conversation_runs_through_the_states():
+    db = RecordingDB()
+    engine = ConversationEngine(db_handle=db)
+    session = GoldInvestmentSession("Asha")
+    turns = [engine.turn(session, m) for m in (
+        "what is the gold rate today", "I want to buy gold", "Buy gold worth 3500 rupees",
+        "9876543210 asha@example.com",
+    )]
+    assert [t.state for t in turns] == ["investment", "purchase", "purchase", "investment"]
+    assert turns[1].event == EVENT_PURCHASE_INTENT and turns[3].event == EVENT_CONFIRMED
+    assert db.rows[0]["grams"] == 0.5
+    assert session.pending_purchase is None and len(session.chat_history) == 8
+
+
+def test_expired_quote_clears_the_pending_purchase():
+    engine = ConversationEngine(db_handle=RecordingDB())
+    session = GoldInvestmentSession("Asha")
+    session.state = "purchase"
+    engine.turn(session, "Buy gold worth 3500 rupees")
+    quote_store.discard(session.pending_purchase["quote_id"])
+    turn = engine.turn(session, "9876543210 asha@example.com")
+    assert (turn.event, turn.state, session.pending_purchase) == (EVENT_PENDING, "purchase", None)
+    assert engine.turn(session, "Buy gold worth 7000").event == EVENT_PENDING
+    assert session.pending_purchase["grams"] == 1.0
+
+
+def test_failed_write_keeps_the_quote_for_a_retry():
+    engine = ConversationEngine(db_handle=RecordingDB(fail=True))
+    session = GoldInvestmentSession("Asha")
+    session.state = "purchase"
+    engine.turn(session, "Buy gold worth 3500 rupees")
+    pending = session.pending_purchase
+    assert engine.turn(session, "9876543210 asha@example.com").event == EVENT_FAILED
+    assert session.pending_purchase == pending
+
+
+def test_unknown_state_is_reset():
+    session = GoldInvestmentSession("Asha")
+    session.state = "checkout"
+    assert ConversationEngine().turn(session, "gold price today").state == "investment"
+
+
+def test_batches_keep_each_sessions_turns_in_order():
+    engine = ConversationEngine(db_handle=RecordingDB())
+    asha, ravi = GoldInvestmentSession("Asha"), GoldInvestmentSession("Ravi")
+    turns = [(asha, "I want to buy gold"), (ravi, "gold rate today"), (asha, "Buy 2 grams"),
+             (ravi, "I want to buy gold"), (asha, "9876543210 asha@example.com")]
+    results = asyncio.run(engine.arun_batch(turns))
+    assert all(isinstance(r, TurnResult) for r in results)
+    assert [r.state for r in results] == ["purchase", "investment", "purchase", "purchase", "investment"]
+    assert results[4].event == EVENT_CONFIRMED and engine.db_handle.rows[0]["grams"] == 2.0
+    assert [r.state for r in engine.run_batch([(ravi, "Buy 1 gram")])] == ["purchase"]
+
+
+def test_batch_errors_can_be_returned_in_place():
+    async def unavailable(*args, **kwargs):
+        raise ConnectionError("llm down")
+
+    engine = ConversationEngine()
+    engine.async_nodes["investment"] = unavailable
+    session = GoldInvestmentSession("Asha")
+    results = asyncio.run(engine.arun_batch([(session, "hi"), (session, "hello")], return_exceptions=True))
+    assert all(isinstance(r, ConnectionError) for r in results)
+    assert session.chat_history == []
+    with pytest.raises(ConnectionError):
+        asyncio.run(engine.arun_batch([(session, "hi")]))
+
+
+def test_stream_without_a_streaming_node_sends_one_token():
+    session = GoldInvestmentSession("Asha")
+    session.state = "purchase"
+
+    async def collect():
+        return [e async for e in ConversationEngine().astream(session, "Buy gold worth 3500 rupees")]
+
+    token, done = asyncio.run(collect())
+    assert token["text"] == done["turn"].reply and done["turn"].event == EVENT_PENDING
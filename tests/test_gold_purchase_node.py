@@ -35,8 +35,8 @@ def main():
 
         print("\nAI:", result["message"], "\n")
 
-        if result.get("success") and result.get("db_updated", False):
-            print("🎉 Transaction saved to Supabase! Check your dashboard!")
+        if result.get("success") and result.get("receipt_id"):
+            print(f"🎉 Transaction queued for Supabase! Receipt: {result['receipt_id']}")
             pending_purchase = None
         else:
             pending_purchase = result.get("pending_purchase", None)
@@ -0,0 +1,60 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nodes.gold_investment_node import gold_investment_api
+from utils.history_window import HistoryWindow, estimate_tokens, message_tokens
+
+
+def _history(turns, words=40):
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"Question {i} about gold. " + "word " * words})
+        history.append({"role": "assistant", "content": f"Answer {i}. " + "gold " * words})
+    return history
+
+
+def test_estimate_tokens_counts_words_and_punctuation():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("Is digital gold safe?") == 5
+    assert estimate_tokens("supercalifragilistic") > 1
+
+
+def test_short_history_is_sent_verbatim():
+    history = _history(2)
+    assert HistoryWindow(budget_tokens=1000, summary_tokens=100).build(history, {}) == history
+
+
+def test_long_history_stays_within_budget():
+    window = HistoryWindow(budget_tokens=500, summary_tokens=100)
+    state = {}
+    history = _history(200)
+    messages = window.build(history, state)
+    assert sum(message_tokens(m) for m in messages) <= 500
+    assert messages[0]["role"] == "system" and "Summary" in messages[0]["content"]
+    assert messages[1]["role"] == "user"
+    assert messages[-1] == history[-1]
+
+
+def test_summary_is_extended_incrementally():
+    window = HistoryWindow(budget_tokens=300, summary_tokens=1000)
+    state = {}
+    history = _history(20)
+    window.build(history, state)
+    folded = state["upto"]
+    lines = list(state["lines"])
+    history.extend(_history(1))
+    window.build(history, state)
+    assert state["upto"] > folded
+    assert state["lines"][:len(lines)] == lines
+
+
+def test_user_message_is_sent_once():
+    class RecordingLLM:
+        def ask(self, prompt, history=None, **kwargs):
+            self.history = history
+            return "Gold is a store of value."
+
+    llm = RecordingLLM()
+    gold_investment_api("Is gold a good hedge?", "Asha", chat_history=_history(1), llm=llm)
+    assert all(m["content"] != "Is gold a good hedge?" for m in llm.history)
@@ -0,0 +1,46 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nodes.gold_investment_node import gold_investment_api
+from utils.intent_router import INTENT_ADVICE, INTENT_FAQ, INTENT_LLM, classify_intent, is_gold_rate_query, llm_intent
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "intent_corpus.tsv")
+
+
+def load_corpus():
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        return [tuple(line.rstrip("\n").split("\t", 1)) for line in f if line.strip() and not line.startswith("#")]
+
+
+def test_corpus_is_classified_correctly():
+    wrong = [(label, text, classify_intent(text)) for label, text in load_corpus() if classify_intent(text) != label]
+    assert wrong == []
+
+
+def test_is_gold_rate_query_matches_price_labels():
+    for label, text in load_corpus():
+        if label == "price":
+            assert is_gold_rate_query(text), text
+
+
+def test_long_messages_stay_fast_and_unmatched():
+    text = "gold " + "a" * 50000
+    assert classify_intent(text) == INTENT_LLM
+
+
+def test_routed_intents_skip_the_llm():
+    class ExplodingLLM:
+        def ask(self, *args, **kwargs):
+            raise AssertionError("LLM should not be called")
+
+    assert gold_investment_api("I want to buy gold", "Asha", llm=ExplodingLLM())["purchase_triggered"] is True
+    reply = gold_investment_api("What is the weather in Mumbai?", "Asha", llm=ExplodingLLM())
+    assert reply["message"] == "Sorry, I can only answer queries related to gold investment."
+
+
+def test_llm_questions_split_into_faq_and_advice():
+    assert llm_intent("How do gold ETFs work?") == INTENT_FAQ
+    assert llm_intent("What is a sovereign gold bond") == INTENT_FAQ
+    assert llm_intent("Should I buy SGBs or ETFs?") == INTENT_ADVICE
+    assert llm_intent("How much of my savings should go into gold?") == INTENT_ADVICE
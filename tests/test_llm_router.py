@@ -0,0 +1,134 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+import pytest
+
+from model.custom_llm import llm_upstream
+from model.llm_router import LLMRouter, parse_pins, router_from_env
+from utils.resilience import CircuitBreaker, Upstream, UpstreamUnavailable
+
+
+class FakeLLM:
+    def __init__(self, model, fail=False, fail_at=None, words=("Gold", "is", "steady")):
+        self.model = model
+        self.fail = fail
+        self.fail_at = fail_at
+        self.words = words
+        self.upstream = Upstream(f"test:{model}", breaker=CircuitBreaker())
+        self.calls = 0
+
+    def ask(self, prompt, history=None, **kwargs):
+        self.calls += 1
+        if self.fail:
+            raise UpstreamUnavailable(f"{self.model} down")
+        return f"{self.model}: {prompt}"
+
+    async def aask(self, prompt, history=None, **kwargs):
+        return self.ask(prompt, history)
+
+    async def astream(self, prompt, history=None, **kwargs):
+        self.calls += 1
+        for i, word in enumerate(self.words):
+            if self.fail or i == self.fail_at:
+                raise UpstreamUnavailable(f"{self.model} down")
+            yield word
+
+
+def _router(*llms, **kwargs):
+    now = [0.0]
+    router = LLMRouter(list(llms), clock=lambda: now[0], **kwargs)
+    return router, now
+
+
+def test_falls_back_down_the_chain_and_learns_from_errors():
+    big, small = FakeLLM("big", fail=True), FakeLLM("small")
+    router, now = _router(big, small)
+    assert router.ask("hi") == "small: hi"
+    assert asyncio.run(router.aask("hi")) == "small: hi"
+    # Four failures in a row push the error average past 0.5: "big" is no longer tried first
+    for _ in range(2):
+        router.ask("hi")
+    assert big.calls == 4
+    router.ask("hi")
+    assert big.calls == 4
+    stats = {s["model"]: s for s in router.stats()["models"]}
+    assert stats["big"]["failures"] == 4 and stats["small"]["fallbacks"] == 4
+    assert router.stats()["order"] == ["small", "big"]
+
+    # Errors decay, so a quiet model gets traffic again
+    now[0] += 600
+    big.fail = False
+    router.ask("hi")
+    assert big.calls == 5
+
+
+def test_fastest_healthy_model_goes_first():
+    router, _ = _router(FakeLLM("a"), FakeLLM("b"), FakeLLM("c"))
+    assert [r.model for r in router.order()] == ["a", "b", "c"]  # untried, list order
+    for route, latency in zip(router.routes, (0.9, 0.2, 0.5)):
+        route.record(True, latency=latency)
+    assert [r.model for r in router.order()] == ["b", "c", "a"]
+    router.routes[1].llm.upstream.breaker.record_failure()
+    router.routes[1].llm.upstream.breaker.state = "open"
+    assert [r.model for r in router.order()] == ["c", "a", "b"]
+
+
+def test_pinned_intent_tries_its_models_first():
+    router, _ = _router(FakeLLM("big"), FakeLLM("small"), pins={"llm": ["small"]})
+    router.routes[1].record(True, latency=5.0)
+    assert [r.model for r in router.order("llm")] == ["small", "big"]
+    assert [r.model for r in router.order()] == ["big", "small"]
+    assert router.ask("hi", intent="llm") == "small: hi"
+    with pytest.raises(ValueError):
+        LLMRouter([FakeLLM("big")], pins={"llm": ["missing"]})
+
+
+def test_stream_falls_back_only_before_the_first_token():
+    async def collect(router):
+        return [delta async for delta in router.astream("hi")]
+
+    router, _ = _router(FakeLLM("a", fail=True), FakeLLM("b"))
+    assert asyncio.run(collect(router)) == ["Gold", "is", "steady"]
+    assert router.stats()["models"][1]["ttft_ms"] is not None
+
+    router, _ = _router(FakeLLM("a", fail_at=1), FakeLLM("b"))
+    with pytest.raises(UpstreamUnavailable):
+        asyncio.run(collect(router))
+    assert router.routes[1].llm.calls == 0
+    # A stream that breaks after its first token counts once, as a failure
+    route = router.routes[0]
+    assert (route.calls, route.failures) == (1, 1) and route.ttft is not None
+
+    router, _ = _router(FakeLLM("a"))
+    asyncio.run(collect(router))
+    assert (router.routes[0].calls, router.routes[0].failures) == (1, 0)
+
+
+def test_router_from_env(monkeypatch):
+    monkeypatch.setenv("OPENROUTER_API_URL", "http://127.0.0.1:9")
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test")
+    monkeypatch.setenv("LLAMA_MODEL_ID", "default/model")
+    monkeypatch.delenv("LLM_MODELS", raising=False)
+    router = router_from_env()
+    assert [r.model for r in router.routes] == ["default/model"] and router.primary.upstream is llm_upstream
+
+    monkeypatch.setenv("LLM_MODELS", "big/model, fast/model")
+    monkeypatch.setenv("LLM_INTENT_MODELS", "faq=tiny/model")
+    router = router_from_env()
+    assert [r.model for r in router.routes] == ["big/model", "fast/model", "tiny/model"]
+    assert len({id(r.llm.upstream.breaker) for r in router.routes}) == 3
+    assert router.stats()["pins"]["faq"][0] == "tiny/model"
+    assert parse_pins("a=x, y; b=z") == {"a": ["x", "y"], "b": ["z"]}
+
+
+def test_faq_pins_reach_the_router_from_the_investment_node():
+    from nodes.gold_investment_node import gold_investment_api
+
+    big, small = FakeLLM("big"), FakeLLM("small")
+    router, _ = _router(big, small, pins={"faq": ["small"]})
+    history = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "Hello!"}]
+    assert gold_investment_api("How do gold ETFs work?", "Asha", history, llm=router)["message"].startswith("small")
+    assert gold_investment_api("Should I buy SGBs or ETFs?", "Asha", history, llm=router)["message"].startswith("big")
@@ -0,0 +1,62 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+from model.custom_llm import LlamaInstructLLM
+from nodes.gold_investment_node import gold_investment_stream_async
+
+
+class FakeStreamingLLM:
+    def __init__(self, deltas):
+        self.deltas = deltas
+        self.consumed = 0
+        self.closed = False
+
+    async def astream(self, prompt, history=None, **kwargs):
+        try:
+            for delta in self.deltas:
+                self.consumed += 1
+                yield delta
+        finally:
+            self.closed = True
+
+
+def _collect(llm, message="Tell me about digital gold"):
+    async def run():
+        return [event async for event in gold_investment_stream_async(message, "Asha", llm=llm)]
+    return asyncio.run(run())
+
+
+def test_parse_stream_line():
+    parse = LlamaInstructLLM._parse_stream_line
+    assert parse('data: {"choices": [{"delta": {"content": "Hi"}}]}') == "Hi"
+    assert parse('data: {"choices": [{"delta": {"role": "assistant"}}]}') == ""
+    assert parse(": OPENROUTER PROCESSING") == ""
+    assert parse("") == ""
+    assert parse("data: [DONE]") is None
+
+
+def test_stream_forwards_tokens_and_finishes():
+    llm = FakeStreamingLLM(["Digital ", "gold ", "is ", "safe."])
+    events = _collect(llm)
+    text = "".join(e["text"] for e in events if e["type"] == "token")
+    assert text == "Digital gold is safe."
+    assert events[-1] == {"type": "done", "message": "Digital gold is safe.", "purchase_triggered": False}
+
+
+def test_stream_short_circuits_on_purchase_sentinel():
+    llm = FakeStreamingLLM([" __PUR", "CHASE_", "INTENT__", " and more", " text"])
+    events = _collect(llm, "Okay, let's get started with it")
+    assert events[-1]["type"] == "done"
+    assert events[-1]["purchase_triggered"] is True
+    assert "__PURCHASE" not in "".join(e.get("text", "") for e in events)
+    assert llm.consumed == 3
+    assert llm.closed
+
+
+def test_stream_text_resembling_sentinel_prefix_is_released():
+    llm = FakeStreamingLLM(["__", "Hello"])
+    events = _collect(llm)
+    assert "".join(e["text"] for e in events if e["type"] == "token") == "__Hello"
@@ -0,0 +1,72 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api_app
+from utils.metrics import Histogram, Metrics, metrics
+
+
+def test_histogram_quantiles_track_exact_ones():
+    rng = random.Random(5)
+    samples = sorted(rng.lognormvariate(-4, 1.2) for _ in range(20000))
+    histogram = Histogram()
+    for s in samples:
+        histogram.observe(s)
+    for q in (0.5, 0.95, 0.99):
+        exact = samples[int(q * len(samples)) - 1]
+        assert histogram.quantile(q) == pytest.approx(exact, rel=0.1)
+    assert histogram.quantile(1.0) == samples[-1]
+    assert Histogram().quantile(0.5) is None
+
+
+def test_spans_and_timed_functions_are_recorded():
+    registry = Metrics()
+
+    @registry.timed("sync")
+    def work(x):
+        return x * 2
+
+    @registry.timed("async")
+    async def awork():
+        return 1
+
+    assert work(2) == 4 and asyncio.run(awork()) == 1
+    with pytest.raises(KeyError):
+        with registry.span("sync"):
+            raise KeyError("boom")
+    spans = registry.snapshot()["spans"]
+    assert (spans["sync"]["count"], spans["sync"]["errors"]) == (2, 1)
+    assert spans["async"]["count"] == 1 and spans["async"]["p99_ms"] >= 0
+
+
+def test_prometheus_buckets_are_cumulative():
+    registry = Metrics()
+    for seconds in (0.001, 0.002, 0.5, 100.0):
+        registry.observe("db.get_purchases", seconds)
+    buckets = {}
+    for line in registry.render_prometheus().splitlines():
+        if line.startswith("gold_agent_span_duration_seconds_bucket"):
+            buckets[line.split('le="')[1].split('"')[0]] = int(line.rsplit(" ", 1)[1])
+    counts = list(buckets.values())
+    assert counts == sorted(counts)
+    assert (buckets["0.00256"], buckets["0.65536"], buckets["+Inf"]) == (2, 3, 4)
+
+
+def test_endpoint_metrics_and_server_timing(monkeypatch):
+    metrics.reset()
+    monkeypatch.setattr(metrics, "server_timing", True)
+    client = TestClient(api_app.app)
+    response = client.post("/investment-chat", json={"user_id": "Asha", "message": "What is the capital of France?"})
+    timing = response.headers["server-timing"]
+    assert "intent.classify;dur=" in timing and "node.gold_investment;dur=" in timing and "total;dur=" in timing
+
+    body = client.get("/metrics").text
+    assert 'gold_agent_span_duration_seconds_count{span="node.gold_investment"} 1' in body
+    assert 'gold_agent_http_responses_total{endpoint="investment_only",status="200"} 1' in body
+    assert client.get("/metrics", params={"format": "json"}).json()["requests"]["investment_only"]["count"] == 1
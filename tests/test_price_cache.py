@@ -0,0 +1,109 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+import time
+
+from utils.price_cache import PriceCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_fresh_value_is_served_from_cache():
+    clock = FakeClock()
+    cache = PriceCache(ttl=60, stale_ttl=300, clock=clock)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return {"price_per_gram": 7000.0}
+
+    assert cache.get(loader) == {"price_per_gram": 7000.0}
+    clock.now = 59
+    assert cache.get(loader) == {"price_per_gram": 7000.0}
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert stats["misses"] == 1 and stats["hits"] == 1
+
+
+def test_stale_value_is_served_while_refreshing():
+    clock = FakeClock()
+    cache = PriceCache(ttl=60, stale_ttl=300, clock=clock)
+    prices = iter([7000.0, 7100.0])
+    cache.get(lambda: next(prices))
+
+    clock.now = 120
+    assert cache.get(lambda: next(prices)) == 7000.0
+    for _ in range(100):
+        if cache.stats()["refreshes"] == 2:
+            break
+        time.sleep(0.01)
+    assert cache.get(lambda: 0) == 7100.0
+    assert cache.stats()["stale_hits"] == 1
+
+
+def test_expired_value_blocks_on_reload():
+    clock = FakeClock()
+    cache = PriceCache(ttl=60, stale_ttl=300, clock=clock)
+    cache.get(lambda: 7000.0)
+    clock.now = 1000
+    assert cache.get(lambda: 7200.0) == 7200.0
+
+
+def test_concurrent_misses_share_one_load():
+    cache = PriceCache(ttl=60, stale_ttl=0)
+    calls = []
+    release = threading.Event()
+
+    def loader():
+        calls.append(1)
+        release.wait(5)
+        return 7000.0
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get(loader))) for _ in range(20)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert results == [7000.0] * 20
+    assert len(calls) == 1
+    assert cache.stats()["coalesced"] == 19
+
+
+def test_uncacheable_values_are_not_stored():
+    cache = PriceCache(ttl=60, cacheable=lambda v: v["source"] != "Static Fallback")
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return {"source": "Static Fallback"}
+
+    cache.get(loader)
+    cache.get(loader)
+    assert len(calls) == 2
+
+
+def test_loader_errors_propagate_to_all_waiters():
+    cache = PriceCache(ttl=60)
+
+    def loader():
+        raise RuntimeError("upstream down")
+
+    try:
+        cache.get(loader)
+    except RuntimeError as e:
+        assert str(e) == "upstream down"
+    else:
+        raise AssertionError("expected RuntimeError")
+    assert cache.stats()["errors"] == 1
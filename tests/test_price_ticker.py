@@ -0,0 +1,40 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+from utils.price_cache import PriceCache
+from utils.price_ticker import PriceRingBuffer, PriceTicker
+
+
+def test_ring_buffer_keeps_newest_ticks():
+    buf = PriceRingBuffer(capacity=3)
+    assert buf.latest() is None
+    for i in range(5):
+        buf.append(7000.0 + i, timestamp=float(i))
+    assert len(buf) == 3
+    assert buf.latest() == (4.0, 7004.0)
+    assert buf.recent() == [(4.0, 7004.0), (3.0, 7003.0), (2.0, 7002.0)]
+    assert buf.recent(2) == [(4.0, 7004.0), (3.0, 7003.0)]
+
+
+def test_ticker_records_tick_and_primes_cache():
+    buf = PriceRingBuffer(capacity=10)
+    cache = PriceCache(ttl=60)
+    info = {"price_per_gram": 7250.0, "source": "API Ninjas:commodityprice"}
+    ticker = PriceTicker(buf, fetch=lambda: info, cache=cache)
+
+    asyncio.run(ticker.poll_once())
+
+    assert buf.latest()[1] == 7250.0
+    assert cache.get(lambda: None) is info
+
+
+def test_ticker_skips_fallback_prices():
+    buf = PriceRingBuffer(capacity=10)
+    cache = PriceCache(ttl=60)
+    ticker = PriceTicker(buf, fetch=lambda: {"price_per_gram": 6500.0, "source": "Static Fallback"}, cache=cache)
+
+    assert asyncio.run(ticker.poll_once()) is None
+    assert len(buf) == 0
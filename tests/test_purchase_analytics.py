@@ -0,0 +1,92 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api_app
+from database.purchase_analytics import PurchaseAnalytics
+from database.purchase_writer import PurchaseWriter
+
+
+def _rows(count, seed=3):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        grams = round(rng.uniform(0.1, 5), 4)
+        rows.append({
+            "user_name": f"user{rng.randint(1, 20)}",
+            "grams": grams,
+            "amount_inr": round(grams * rng.uniform(6000, 8000), 2),
+            "purchase_time": f"2024-01-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00",
+            "receipt_id": f"GP-{i}",
+        })
+    return rows
+
+
+def _snapshot(analytics):
+    users = sorted({row["user_name"] for row in _rows(500)})
+    return [analytics.portfolio(u, 7000.0) for u in users], analytics.daily(100)
+
+
+def test_rebuild_matches_incremental_updates():
+    rows = _rows(500)
+    incremental = PurchaseAnalytics()
+    for i in range(0, len(rows), 7):
+        incremental.record_many(rows[i:i + 7])
+    rebuilt = PurchaseAnalytics()
+    assert rebuilt.rebuild([rows[:250], rows[250:]]) == 500
+    for (a, b) in zip(_snapshot(incremental), _snapshot(rebuilt)):
+        assert a == pytest.approx(b)
+
+
+def test_portfolio_cost_basis_and_pnl():
+    analytics = PurchaseAnalytics()
+    analytics.record_many([
+        {"user_name": "Asha", "grams": 1.0, "amount_inr": 6000.0, "purchase_time": "2024-01-01 10:00:00"},
+        {"user_name": "Asha", "grams": 0.5, "amount_inr": 3500.0, "purchase_time": "2024-02-01T10:00:00.5"},
+    ])
+    p = analytics.portfolio("Asha", 7000.0)
+    assert (p["purchases"], p["total_grams"], p["total_invested"]) == (2, 1.5, 9500.0)
+    assert p["avg_cost_per_gram"] == 6333.33
+    assert (p["current_value"], p["unrealised_pnl"]) == (10500.0, 1000.0)
+    assert (p["first_purchase"], p["last_purchase"]) == ("2024-01-01T10:00:00", "2024-02-01T10:00:00")
+    assert analytics.portfolio("Nobody", 7000.0) is None
+
+
+def test_rebuild_skips_receipts_still_in_the_spool(tmp_path):
+    class DB:
+        def write_purchase_records(self, records):
+            return True
+
+    analytics = PurchaseAnalytics()
+    writer = PurchaseWriter(str(tmp_path / "spool.db"), db=DB(), flush_interval=60)
+    writer.start = lambda: None  # nothing is written until stop()
+    writer.listeners.append(analytics.record_many)
+    row = dict(_rows(1)[0])
+    receipt = writer.submit({"quote_id": "q1"}, row)
+    in_db = dict(row, receipt_id=receipt)  # written before a crash, still pending locally
+    analytics.rebuild([[in_db]], writer.pending_receipts())
+    assert analytics.rows == 0
+    writer.stop()
+    assert analytics.rows == 1
+
+
+def test_endpoints(monkeypatch):
+    analytics = PurchaseAnalytics()
+    analytics.rebuild([_rows(200)])
+
+    async def price():
+        return {"price_per_gram": 7000.0}
+
+    monkeypatch.setattr(api_app, "purchase_analytics", analytics)
+    monkeypatch.setattr(api_app, "aget_current_gold_price_inr", price)
+    client = TestClient(api_app.app)
+    body = client.get("/portfolio/user1").json()
+    assert body["current_price_per_gram"] == 7000.0 and body["purchases"] > 0
+    assert client.get("/portfolio/nobody").status_code == 404
+    days = client.get("/stats/daily", params={"days": 3}).json()["days"]
+    assert [d["date"] for d in days] == ["2024-01-28", "2024-01-27", "2024-01-26"]
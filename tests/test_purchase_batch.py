@@ -0,0 +1,127 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+
+from fastapi.testclient import TestClient
+
+import api_app
+from database.purchase_writer import PurchaseWriter
+from nodes.gold_purchase_batch import MAX_ORDER_AMOUNT, _quote_loop, place_orders, quote_amounts
+from nodes.gold_purchase_node import quote_amount
+
+PRICE = {"price_per_gram": 7253.47, "currency": "INR", "source": "test", "last_updated": "2026-01-01 10:00"}
+
+
+class BatchDB:
+    def __init__(self):
+        self.records = []
+
+    def write_purchase_records(self, records):
+        self.records += records
+        return True
+
+
+def _order(i, **overrides):
+    order = {"user_name": f"user{i}", "amount": 1000 + i, "unit": "INR", "phone": "9876543210",
+             "email": f"user{i}@example.com", "order_id": f"sip-{i}"}
+    order.update(overrides)
+    return order
+
+
+def test_quotes_round_half_up_exactly():
+    assert quote_amount(1.005, True, 1.0) == (1.005, 1.01)  # float round() gives 1.0
+    assert quote_amount(0.00005, True, 7000.0) == (0.0001, 0.7)
+    assert quote_amount(3500, False, 7000.0) == (0.5, 3500.0)
+    assert quote_amount(1000, False, 7253.47) == (0.1379, 1000.0)
+
+
+def test_vectorised_quotes_match_the_scalar_ones():
+    rng = random.Random(7)
+    amounts = [round(rng.uniform(10, 50000), rng.choice([0, 2, 3])) for _ in range(2000)]
+    in_grams = [rng.random() < 0.3 for _ in amounts]
+    amounts = [a / 1000 if g else a for a, g in zip(amounts, in_grams)]
+    assert quote_amounts(amounts, in_grams, 7253.47) == _quote_loop(amounts, in_grams, 7253.47)
+
+
+def test_vectorised_quotes_match_the_scalar_ones_at_the_limits():
+    # Largest gram orders the int64 path takes, and ones up to MAX_ORDER_AMOUNT that must fall back
+    for amount in (3e8, 3.2e8, 9e8, MAX_ORDER_AMOUNT - 0.01):
+        for in_grams in (True, False):
+            amounts, flags = [amount] * 100, [in_grams] * 100
+            assert quote_amounts(amounts, flags, 7253.47) == _quote_loop(amounts, flags, 7253.47)
+    assert quote_amounts([9e8] * 100, [True] * 100, 7253.47)[1][0] == 6528123000000.0
+
+
+def test_invalid_orders_are_rejected_and_the_rest_placed_once(tmp_path):
+    db = BatchDB()
+    writer = PurchaseWriter(str(tmp_path / "spool.db"), db=db, flush_interval=60)
+    writer.start = lambda: None
+    orders = [_order(0), _order(1, unit="grams", amount=2), _order(2, phone="12345"), _order(3, amount=-5)]
+    result = place_orders(orders, PRICE, writer=writer)
+    assert (result["placed"], result["rejected"]) == (2, 2)
+    assert result["orders"][1]["rupees"] == 14506.94
+    assert result["orders"][2]["errors"] == ["invalid phone number"]
+    assert result["orders"][3]["status"] == "rejected"
+    receipts = [o["receipt_id"] for o in result["orders"][:2]]
+
+    # A partner retrying the same batch after the price moved gets what was recorded the first time
+    again = place_orders(orders, dict(PRICE, price_per_gram=7300.0), writer=writer)
+    assert [o["receipt_id"] for o in again["orders"][:2]] == receipts
+    assert [o["status"] for o in again["orders"][:2]] == ["duplicate"] * 2
+    assert (again["placed"], again["duplicates"], again["total_rupees"]) == (0, 2, 0)
+    assert again["orders"][1]["rupees"] == 14506.94 and again["orders"][1]["price_per_gram"] == 7253.47
+    writer.flush()
+    assert sorted(r["receipt_id"] for r in db.records) == sorted(receipts)
+    assert writer.status(receipts[0])["status"] == "written"
+
+
+def test_quote_only_places_nothing(tmp_path):
+    writer = PurchaseWriter(str(tmp_path / "spool.db"), db=BatchDB())
+    writer.start = lambda: None
+    result = place_orders([_order(i) for i in range(100)], PRICE, quote_only=True, writer=writer)
+    assert result["quoted"] == 100 and result["placed"] == 0
+    assert "receipt_id" not in result["orders"][0] and writer.pending_receipts() == []
+
+
+def test_batch_endpoint(monkeypatch):
+    async def price():
+        return PRICE
+
+    monkeypatch.setattr(api_app, "aget_current_gold_price_inr", price)
+    monkeypatch.setattr(api_app, "MAX_BATCH_ORDERS", 3)
+    client = TestClient(api_app.app)
+    response = client.post("/purchase/batch", json={"orders": [_order(i, order_id=None) for i in range(3)],
+                                                    "quote_only": True})
+    assert response.status_code == 200
+    assert [o["status"] for o in response.json()["orders"]] == ["quoted"] * 3
+    assert client.post("/purchase/batch", json={"orders": [_order(i) for i in range(4)]}).status_code == 413
+
+
+def test_batch_endpoint_refuses_to_trade_without_a_live_price(monkeypatch):
+    async def fallback():
+        return dict(PRICE, source="Static Fallback")
+
+    monkeypatch.setattr(api_app, "aget_current_gold_price_inr", fallback)
+    response = TestClient(api_app.app).post("/purchase/batch", json={"orders": [_order(0)]})
+    assert response.status_code == 503 and "Retry-After" in response.headers
+
+
+def test_order_ids_are_scoped_to_the_user(tmp_path):
+    writer = PurchaseWriter(str(tmp_path / "spool.db"), db=BatchDB())
+    writer.start = lambda: None
+    first = place_orders([_order(0, order_id="sip-1")], PRICE, writer=writer)
+    other = place_orders([_order(1, order_id="sip-1")], PRICE, writer=writer)
+    assert first["orders"][0]["receipt_id"] != other["orders"][0]["receipt_id"]
+    assert len(writer.pending_receipts()) == 2
+
+
+def test_repeated_order_id_in_one_batch_is_placed_once(tmp_path):
+    writer = PurchaseWriter(str(tmp_path / "spool.db"), db=BatchDB())
+    writer.start = lambda: None
+    result = place_orders([_order(0), _order(0, amount=5000)], PRICE, writer=writer)
+    placed, repeated = result["orders"]
+    assert (placed["status"], repeated["status"]) == ("placed", "duplicate")
+    assert repeated["receipt_id"] == placed["receipt_id"] and repeated["rupees"] == 1000.0
+    assert result["total_rupees"] == 1000.0 and writer.pending_receipts() == [placed["receipt_id"]]
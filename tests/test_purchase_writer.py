@@ -0,0 +1,206 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlite3
+import time
+
+from benchmarks.bench_transactions import SCHEMA
+from benchmarks.stubs import serve_postgrest_stub
+from database.purchase_writer import PurchaseWriter, receipt_id_for
+from nodes.gold_purchase_node import _confirm_purchase
+from utils.quote_store import QuoteStore
+
+
+class BatchDB:
+    def __init__(self, fail=0):
+        self.batches = []
+        self.fail = fail
+
+    def write_purchase_records(self, records):
+        if self.fail:
+            self.fail -= 1
+            raise ConnectionError("db down")
+        self.batches.append(records)
+        return True
+
+
+def _pending(i=0):
+    return {"quote_id": f"q{i}", "user_name": "Asha", "grams": 0.5, "rupees": 3500.0, "price_per_gram": 7000.0}
+
+
+def _record(i=0):
+    return {"user_name": "Asha", "phone": "9876543210", "email": "a@example.com", "grams": 0.5,
+            "amount_inr": 3500.0 + i, "price_per_gram": 7000.0, "purchase_time": "2026-01-01 10:00:00"}
+
+
+def _writer(tmp_path, db, background=False, **kwargs):
+    kwargs.setdefault("flush_interval", 60)
+    writer = PurchaseWriter(str(tmp_path / "spool.db"), db=db, **kwargs)
+    if not background:
+        writer.start = lambda: None  # tests flush explicitly (stop() does a final flush)
+    return writer
+
+
+def test_records_are_written_in_batches(tmp_path):
+    db = BatchDB()
+    writer = _writer(tmp_path, db, batch_size=4)
+    receipts = [writer.submit(_pending(i), _record(i)) for i in range(10)]
+    writer.stop()
+    assert [len(b) for b in db.batches] == [4, 4, 2]
+    assert [r["receipt_id"] for b in db.batches for r in b] == receipts
+    assert writer.status(receipts[0])["status"] == "written"
+
+
+def test_same_quote_is_recorded_once(tmp_path):
+    db = BatchDB()
+    writer = _writer(tmp_path, db)
+    first = writer.submit(_pending(), _record())
+    assert writer.submit(_pending(), _record()) == first == receipt_id_for(_pending())
+    writer.stop()
+    assert sum(len(b) for b in db.batches) == 1
+
+
+def test_identical_purchases_without_a_quote_get_their_own_receipts(tmp_path):
+    db = BatchDB()
+    writer = _writer(tmp_path, db)
+    legacy = {"user_name": "Asha", "grams": 0.5, "rupees": 3500.0, "price_per_gram": 7000.0}
+    receipts = [_confirm_purchase("9876543210 asha@example.com", dict(legacy), writer=writer)["receipt_id"]
+                for _ in range(2)]
+    assert receipts[0] != receipts[1] and all(len(r) == 31 for r in receipts)
+    writer.stop()
+    assert sum(len(b) for b in db.batches) == 2
+
+
+def test_spooled_records_survive_a_restart(tmp_path):
+    # The DB is unreachable until the first process dies
+    crashed = _writer(tmp_path, BatchDB(fail=1000))
+    receipt = crashed.submit(_pending(), _record())
+    db = BatchDB()
+    restarted = _writer(tmp_path, db, background=True)
+    restarted.start()
+    restarted.stop()
+    assert db.batches and db.batches[0][0]["receipt_id"] == receipt
+    assert restarted.status(receipt)["status"] == "written"
+
+
+def test_failed_batches_are_retried_then_marked_failed(tmp_path):
+    db = BatchDB(fail=1)
+    writer = _writer(tmp_path, db, max_attempts=2)
+    receipt = writer.submit(_pending(), _record())
+    writer.flush()
+    status = writer.status(receipt)
+    assert status["status"] == "pending" and status["attempts"] == 1 and "db down" in status["error"]
+    writer.flush()
+    assert writer.status(receipt)["status"] == "written"
+
+    db.fail = 2
+    receipt = writer.submit(_pending(1), _record(1))
+    writer.flush()
+    writer.flush()
+    assert writer.status(receipt)["status"] == "failed"
+    assert writer.stats()["failed"] == 1
+    writer.stop()
+
+
+class RejectingDB(BatchDB):
+    # Rejects any batch containing a record whose amount is in `bad`, as PostgREST does a constraint violation
+    def __init__(self, bad):
+        super().__init__()
+        self.bad = bad
+        self.calls = 0
+
+    def write_purchase_records(self, records):
+        self.calls += 1
+        if any(r["amount_inr"] in self.bad for r in records):
+            from postgrest.exceptions import APIError
+            raise APIError({"code": "23514", "message": "violates check constraint"})
+        return super().write_purchase_records(records)
+
+
+def test_a_rejected_row_fails_alone_and_at_once(tmp_path):
+    db = RejectingDB(bad={3503.0})
+    writer = _writer(tmp_path, db, batch_size=8)
+    receipts = [writer.submit(_pending(i), _record(i)) for i in range(8)]
+    assert writer.flush() == 7
+    assert writer.status(receipts[3])["status"] == "failed" and writer.status(receipts[3])["attempts"] == 1
+    assert all(writer.status(r)["status"] == "written" for i, r in enumerate(receipts) if i != 3)
+    assert db.calls < 8  # bisected, not retried row by row
+    writer.stop()
+
+
+def test_errors_are_classified():
+    from postgrest.exceptions import APIError
+    from database.purchase_writer import is_permanent, is_transient
+
+    assert is_transient(ConnectionError("db down")) and not is_permanent(ConnectionError("db down"))
+    assert is_permanent(APIError({"code": "23505"})) and is_permanent(APIError({"code": "PGRST204"}))
+    assert is_permanent(APIError({"code": 400})) and not is_transient(APIError({"code": 400}))
+    assert is_transient(APIError({"code": 503})) and not is_permanent(APIError({"code": 503}))
+
+
+def test_written_rows_are_purged_after_the_retention(tmp_path):
+    writer = _writer(tmp_path, BatchDB(), retention=3600)
+    written = writer.submit(_pending(0), _record(0))
+    writer.flush()
+    pending = writer.submit(_pending(1), _record(1))
+    assert writer.purge() == 0
+    assert writer.purge(now=time.time() + 3601) == 1
+    assert writer.status(written) is None and writer.status(pending)["status"] == "pending"
+    assert writer.stats()["purged"] == 1
+
+
+def test_without_autostart_submissions_wait_for_start(tmp_path):
+    db = BatchDB()
+    writer = PurchaseWriter(str(tmp_path / "spool.db"), db=db, flush_interval=0.01, autostart=False)
+    receipt = writer.submit(_pending(), _record())
+    writer.submit_many([(_pending(1), _record(1))])
+    time.sleep(0.05)
+    assert writer._thread is None and writer.status(receipt)["status"] == "pending"
+    writer.start()
+    writer.stop()
+    assert writer.status(receipt)["status"] == "written" and len(db.batches[0]) == 2
+
+
+def test_background_flush_on_interval(tmp_path):
+    db = BatchDB()
+    writer = _writer(tmp_path, db, background=True, flush_interval=0.05)
+    receipt = writer.submit(_pending(), _record())
+    deadline = time.monotonic() + 5
+    while writer.status(receipt)["status"] != "written" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    writer.stop()
+    assert writer.status(receipt)["status"] == "written"
+
+
+def test_confirmation_returns_receipt_without_touching_the_db(tmp_path):
+    db = BatchDB()
+    writer = _writer(tmp_path, db)
+    quotes = QuoteStore()
+    pending = dict(_pending(), quote_id=quotes.issue("Asha", 0.5, 3500.0, 7000.0))
+    result = _confirm_purchase("9876543210 asha@example.com", pending, writer=writer, quotes=quotes)
+    assert result["success"] is True and result["db_updated"] is False
+    assert result["receipt_id"] in result["message"]
+    assert db.batches == []
+    assert writer.status(result["receipt_id"])["status"] == "pending"
+    writer.stop()
+    assert writer.status(result["receipt_id"])["status"] == "written"
+
+
+def test_replayed_batches_are_stored_once(tmp_path, monkeypatch):
+    path = str(tmp_path / "supabase.db")
+    conn = sqlite3.connect(path)
+    conn.execute(SCHEMA)
+    conn.close()
+    server = serve_postgrest_stub(path)
+    monkeypatch.setenv("SUPABASE_URL", server.url)
+    monkeypatch.setenv("SUPABASE_KEY", "test.test.test")
+    from database.supabase_client import SupabaseDB
+    db = SupabaseDB()
+    records = [dict(_record(i), receipt_id=receipt_id_for(_pending(i))) for i in range(3)]
+    assert db.write_purchase_records(records[:2]) and db.write_purchase_records(records)
+    server.stop()
+    conn = sqlite3.connect(path)
+    stored = [r[0] for r in conn.execute("SELECT receipt_id FROM gold_purchases ORDER BY id")]
+    conn.close()
+    assert stored == [r["receipt_id"] for r in records]
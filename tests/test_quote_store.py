@@ -0,0 +1,120 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+import api_app
+import nodes.gold_purchase_node as purchase_node
+from database.purchase_writer import receipt_id_for
+from nodes.gold_purchase_node import _confirm_purchase, _quote_purchase
+from utils.quote_store import QuoteStore
+
+PRICE = {"price_per_gram": 7000.0}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class RecordingDB:
+    def __init__(self):
+        self.rows = []
+
+    def write_purchase_record(self, **kwargs):
+        self.rows.append(kwargs)
+        return True
+
+
+def test_quotes_expire_and_their_slots_are_reused():
+    clock = Clock()
+    store = QuoteStore(capacity=10, ttl=60, clock=clock)
+    quote_id = store.issue("Asha", 0.5, 3500.0, 7000.0)
+    assert store.get(quote_id)["price_per_gram"] == 7000.0
+    clock.now += 61
+    assert store.get(quote_id) is None and len(store) == 0
+    assert store.stats()["expired"] == 1
+    reused = store.issue("Ravi", 1.0, 7100.0, 7100.0)
+    assert store.stats()["slots"] == 1
+    assert reused != quote_id and store.get(quote_id) is None  # the old ID doesn't see the new quote
+    assert store.get(reused)["user_name"] == "Ravi"
+
+
+def test_full_store_evicts_the_quote_closest_to_expiry():
+    clock = Clock()
+    store = QuoteStore(capacity=3, ttl=60, clock=clock)
+    ids = []
+    for i in range(3):
+        ids.append(store.issue(f"user{i}", 1.0, 7000.0, 7000.0))
+        clock.now += 5
+    newest = store.issue("user3", 1.0, 7000.0, 7000.0)
+    assert store.get(ids[0]) is None
+    assert all(store.get(q) for q in ids[1:] + [newest])
+    assert store.stats()["evicted"] == 1 and len(store) == 3
+
+
+def test_reused_slots_get_unrelated_128_bit_ids():
+    store = QuoteStore(capacity=2)
+    ids = set()
+    for _ in range(50):
+        quote_id = store.issue("Asha", 1.0, 7000.0, 7000.0)
+        assert quote_id.startswith("q0") and len(quote_id) == 2 + 32  # slot 0 every time
+        store.discard(quote_id)
+        ids.add(quote_id[2:])
+    assert len(ids) == 50 and len({receipt_id_for({"quote_id": "q0" + n}) for n in ids}) == 50
+
+
+def test_malformed_ids_are_misses():
+    store = QuoteStore(capacity=2)
+    for quote_id in (None, "", "q0", "qzzzzzzzzzz", "q1" + "0" * 32, "x" * 40):
+        assert store.get(quote_id) is None
+
+
+def test_confirmation_uses_the_locked_quote():
+    store = QuoteStore(ttl=60, clock=Clock())
+    pending = _quote_purchase("Asha", {"amount": 3500, "unit": "INR"}, PRICE, quotes=store)["pending_purchase"]
+    tampered = dict(pending, grams=50.0)
+    db = RecordingDB()
+    result = _confirm_purchase("9876543210 asha@example.com", tampered, db_handle=db, quotes=store)
+    assert result["success"] is True and db.rows[0]["grams"] == 0.5
+    assert store.get(pending["quote_id"]) is None  # used up
+
+
+def test_expired_quote_asks_for_the_amount_again():
+    clock = Clock()
+    store = QuoteStore(ttl=60, clock=clock)
+    pending = _quote_purchase("Asha", {"amount": 1, "unit": "grams"}, PRICE, quotes=store)["pending_purchase"]
+    clock.now += 3600
+    db = RecordingDB()
+    result = _confirm_purchase("9876543210 asha@example.com", pending, db_handle=db, quotes=store)
+    assert result["success"] is False and result["pending_purchase"] is None
+    assert db.rows == []
+
+
+def test_no_quote_without_a_live_price():
+    store = QuoteStore(ttl=60, clock=Clock())
+    for price in (dict(PRICE, source="Static Fallback"), dict(PRICE, stale=True)):
+        result = _quote_purchase("Asha", {"amount": 3500, "unit": "INR"}, price, quotes=store)
+        assert result["pending_purchase"] is None and "live gold price" in result["message"]
+    assert len(store) == 0
+
+
+def test_stateless_purchase_endpoint_hands_back_a_confirmable_quote(monkeypatch):
+    async def price():
+        return PRICE
+
+    store = QuoteStore(ttl=60, clock=Clock())
+    monkeypatch.setattr(purchase_node, "aget_current_gold_price_inr", price)
+    monkeypatch.setattr(purchase_node, "quote_store", store)
+    client = TestClient(api_app.app)
+    quote_id = client.post("/purchase", json={"user_id": "Asha", "message": "Buy gold worth 3500"}).json()["quote_id"]
+    assert store.get(quote_id)["grams"] == 0.5
+    retry = client.post("/purchase", json={"user_id": "Asha", "message": "my phone is 98765", "quote_id": quote_id})
+    assert retry.json()["quote_id"] == quote_id and "phone number" in retry.json()["reply"]
+    other = client.post("/purchase", json={"user_id": "Ravi", "message": "9876543210 ravi@example.com",
+                                           "quote_id": quote_id})
+    assert "no longer held" in other.json()["reply"] and store.get(quote_id) is not None
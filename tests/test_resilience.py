@@ -0,0 +1,147 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import time
+
+import pytest
+import requests
+from fastapi.testclient import TestClient
+
+import api_app
+from benchmarks.stubs import serve_llm_stub, serve_price_stub
+from model import custom_llm
+from utils import gold_price_api, resilience
+from utils.resilience import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, DeadlineExceeded, Upstream, UpstreamUnavailable,
+    deadline,
+)
+
+
+def _http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"{status}", response=response)
+
+
+class Flaky:
+    def __init__(self, errors, result="ok"):
+        self.errors = list(errors)
+        self.result = result
+        self.timeouts = []
+
+    def __call__(self, timeout):
+        self.timeouts.append(timeout)
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.result
+
+
+def _upstream(**kwargs):
+    kwargs.setdefault("base_backoff", 0.001)
+    return Upstream("test", **kwargs)
+
+
+def test_retryable_errors_are_retried_others_are_not():
+    upstream = _upstream(max_attempts=3)
+    assert upstream.call(Flaky([requests.ConnectionError(), _http_error(503)])) == "ok"
+    assert upstream.stats()["retries"] == 2
+
+    with pytest.raises(requests.HTTPError):
+        upstream.call(Flaky([_http_error(401)]))
+    with pytest.raises(UpstreamUnavailable):
+        upstream.call(Flaky([_http_error(503)] * 3))
+    assert upstream.stats()["failures"] == 2
+
+
+def test_breaker_opens_then_probes_after_reset_timeout():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+    upstream = _upstream(max_attempts=1, breaker=breaker)
+    for _ in range(2):
+        with pytest.raises(UpstreamUnavailable):
+            upstream.call(Flaky([requests.Timeout()]))
+    assert breaker.state == OPEN
+    fn = Flaky([])
+    with pytest.raises(CircuitOpenError) as rejected:
+        upstream.call(fn)
+    assert fn.timeouts == [] and rejected.value.retry_after == 10
+
+    now[0] = 11
+    breaker.allow()  # the single half-open probe
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and upstream.call(fn) == "ok"
+
+
+def test_deadline_caps_attempt_timeouts(monkeypatch):
+    monkeypatch.setattr(resilience.random, "uniform", lambda low, high: high)  # no lucky short backoff
+    upstream = _upstream(timeout=30, max_attempts=2, base_backoff=5, max_backoff=5)
+    fn = Flaky([requests.Timeout()])
+    with deadline(0.5):
+        with pytest.raises(UpstreamUnavailable):
+            upstream.call(fn)  # backing off would overrun the deadline, so no second attempt
+    assert len(fn.timeouts) == 1 and fn.timeouts[0] <= 0.5
+    with deadline(0.01):
+        time.sleep(0.02)
+        with pytest.raises(DeadlineExceeded):
+            upstream.call(fn)
+
+
+def test_hedged_attempt_answers_for_a_slow_one():
+    upstream = _upstream(hedge_after=0.05)
+    delays = [1.0, 0.0]
+
+    async def fn(timeout):
+        await asyncio.sleep(delays.pop(0))
+        return "fast"
+
+    start = time.perf_counter()
+    assert asyncio.run(upstream.acall(fn)) == "fast"
+    assert time.perf_counter() - start < 0.5
+    stats = upstream.stats()
+    assert (stats["hedges"], stats["hedge_wins"]) == (1, 1)
+
+
+def test_llm_failures_open_the_circuit(monkeypatch):
+    server = serve_llm_stub(latency=0, token_latency=0, error_rate=1.0)
+    monkeypatch.setenv("OPENROUTER_API_URL", server.url)
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test")
+    monkeypatch.setenv("LLAMA_MODEL_ID", "test/model")
+    monkeypatch.setattr(custom_llm.llm_upstream, "breaker", CircuitBreaker(failure_threshold=2))
+    monkeypatch.setattr(custom_llm.llm_upstream, "base_backoff", 0.001)
+    llm = custom_llm.LlamaInstructLLM()
+    with pytest.raises(UpstreamUnavailable):
+        asyncio.run(llm.aask("Is gold safe?"))
+    assert server.calls == 2
+    with pytest.raises(CircuitOpenError):
+        llm.ask("Is gold safe?")
+    assert server.calls == 2
+    server.stop()
+
+
+def test_agent_returns_503_with_retry_after(monkeypatch):
+    async def unavailable(*args, **kwargs):
+        raise CircuitOpenError("circuit open", retry_after=12.5)
+
+    monkeypatch.setitem(api_app.conversation_engine.async_nodes, "investment", unavailable)
+    response = TestClient(api_app.app).post("/agent", json={"user_id": "u-503", "message": "Is gold safe?"})
+    assert response.status_code == 503 and response.headers["retry-after"] == "13"
+
+
+def test_price_api_outage_serves_last_known_price(monkeypatch):
+    server = serve_price_stub(latency=0)
+    monkeypatch.setenv("GOLDPRICE_API_URL", server.url)
+    monkeypatch.setenv("GOLDPRICE_API_KEY", "test")
+    monkeypatch.setattr(gold_price_api, "_last_good", None)
+    monkeypatch.setattr(gold_price_api.price_upstream, "breaker", CircuitBreaker())
+    monkeypatch.setattr(gold_price_api.price_upstream, "base_backoff", 0.001)
+    live = gold_price_api.fetch_gold_price_inr()
+    assert gold_price_api.is_live(live)
+    server.error_rate = 1.0
+    stale = gold_price_api.fetch_gold_price_inr()
+    assert stale["price_per_gram"] == live["price_per_gram"] and not gold_price_api.is_live(stale)
+    server.stop()
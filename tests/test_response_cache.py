@@ -0,0 +1,109 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nodes.gold_investment_node import gold_investment_api
+from utils.personalization import NAME_PLACEHOLDER, render_name, template_name
+from utils.response_cache import ResponseCache, normalize_text, response_cache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingLLM:
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = 0
+
+    def ask(self, prompt, history=None, **kwargs):
+        self.calls += 1
+        return self.reply
+
+
+def test_normalize_text():
+    assert normalize_text("  Is Digital-Gold SAFE?? ") == "is digital gold safe"
+
+
+def test_exact_hit_and_ttl_expiry():
+    clock = FakeClock()
+    cache = ResponseCache(ttl=60, clock=clock)
+    cache.put("1", "What is SGB?", "A sovereign gold bond.", upstream_seconds=2.0)
+    assert cache.get("1", "what is sgb") == "A sovereign gold bond."
+    assert cache.get("2", "what is sgb") is None
+    clock.now = 61
+    assert cache.get("1", "what is sgb") is None
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2
+    assert stats["latency_saved_seconds"] == 2.0
+
+
+def test_lru_eviction():
+    cache = ResponseCache(max_entries=2)
+    cache.put("1", "a question", "A")
+    cache.put("1", "b question", "B")
+    cache.get("1", "a question")
+    cache.put("1", "c question", "C")
+    assert cache.get("1", "b question") is None
+    assert cache.get("1", "a question") == "A"
+
+
+def test_near_duplicate_questions_hit_with_similarity():
+    cache = ResponseCache(similarity=0.8)
+    cache.put("1", "How do gold ETFs work?", "ETF answer")
+    assert cache.get("1", "how do gold etf work") == "ETF answer"
+    assert cache.get("1", "is silver safe") is None
+    assert cache.stats()["similar_hits"] == 1
+
+
+def test_similar_questions_with_different_numbers_miss():
+    cache = ResponseCache(similarity=0.8)
+    cache.put("1", "Should I buy 2 grams of gold?", "2 gram answer")
+    assert cache.get("1", "Should I buy 5 grams of gold?") is None
+    assert cache.get("1", "Should I buy 2 gram of gold?") == "2 gram answer"
+    assert cache.stats()["similar_hits"] == 1
+
+
+def test_index_is_updated_in_place_and_rewritten_slots_miss():
+    cache = ResponseCache(max_entries=2, similarity=0.8)
+    cache.put("1", "How do gold ETFs work?", "ETF answer")
+    index = cache._index
+    tf = index.tf
+    indexed = index.version
+    slot, _ = index.nearest("how do gold etf work")
+    cache.put("1", "Is silver safe?", "silver answer")
+    cache.clear()
+    assert index.tf is tf and not index.used.any() and not index.df.any()
+    cache.put("1", "Is platinum rare?", "platinum answer")
+    with cache._lock:
+        assert cache._similar_entry("1", "how do gold etf work", slot, index, indexed) is None
+
+
+def test_name_templating():
+    template = template_name("Asha, digital gold is safe, Asha.", "Asha")
+    assert template == f"{NAME_PLACEHOLDER}, digital gold is safe, {NAME_PLACEHOLDER}."
+    assert render_name(template, "Ravi") == "Ravi, digital gold is safe, Ravi."
+    assert template_name("Call 9876543210 to confirm", "Asha") is None
+    assert template_name("Hi Al", "Al") is None
+
+
+def test_opening_questions_are_answered_from_cache_for_other_users():
+    llm = CountingLLM("Asha, a sovereign gold bond is issued by the RBI.")
+    first = gold_investment_api("What is SGB?", "Asha", chat_history=[], llm=llm)
+    second = gold_investment_api("what is sgb", "Ravi", chat_history=[], llm=llm)
+    assert llm.calls == 1
+    assert first["message"].startswith("Asha,")
+    assert second["message"] == "Ravi, a sovereign gold bond is issued by the RBI."
+    assert response_cache.stats()["hits"] == 1
+
+
+def test_follow_up_turns_bypass_the_cache():
+    llm = CountingLLM("It depends on your horizon, Asha.")
+    history = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+    gold_investment_api("Is it safe?", "Asha", chat_history=history, llm=llm)
+    gold_investment_api("Is it safe?", "Asha", chat_history=history, llm=llm)
+    assert llm.calls == 2
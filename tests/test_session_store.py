@@ -0,0 +1,168 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+import pytest
+
+from flow.agent_flow_controller import GoldInvestmentSession
+from flow.session_store import InMemorySessionStore, RedisSessionStore, SessionStore, SQLiteSessionStore
+from utils.history_window import HistoryWindow
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _session(name, turns=0, text="x"):
+    session = GoldInvestmentSession(name)
+    for _ in range(turns):
+        session.chat_history.append({"role": "user", "content": text})
+    return session
+
+
+def test_lru_evicts_least_recently_used_when_over_count():
+    store = InMemorySessionStore(max_sessions=2)
+    store.save("a", _session("a"))
+    store.save("b", _session("b"))
+    store.get("a")
+    store.save("c", _session("c"))
+    assert store.get("b") is None
+    assert store.get("a") is not None and store.get("c") is not None
+    assert store.stats()["evictions"] == 1
+
+
+def test_byte_cap_evicts_oldest_sessions():
+    store = InMemorySessionStore(max_sessions=100, max_bytes=5000)
+    for name in "abcd":
+        store.save(name, _session(name, turns=4, text="y" * 300))
+    assert store.stats()["bytes"] <= 5000
+    assert store.get("a") is None
+    assert store.get("d") is not None
+
+
+def test_session_over_the_byte_cap_is_dropped_not_kept():
+    store = InMemorySessionStore(max_sessions=100, max_bytes=5000)
+    store.save("a", _session("a", turns=2, text="y" * 300))
+    store.save("b", _session("b", turns=2, text="y" * 300))
+    store.save("huge", _session("huge", turns=20, text="y" * 300))
+    assert store.get("huge") is None
+    assert store.get("a") is not None and store.get("b") is not None
+    assert store.stats()["evictions"] == 1
+
+
+def test_compacted_history_stays_within_the_window():
+    window = HistoryWindow(budget_tokens=300, summary_tokens=100)
+    state, history = {}, []
+    for i in range(100):
+        history.append({"role": "user", "content": f"Question {i} about gold. " + "word " * 20})
+        history.append({"role": "assistant", "content": f"Answer {i}. " + "gold " * 20})
+        history = window.compact(history, state)
+    assert len(history) < 10 and history[-1]["content"].startswith("Answer 99")
+    assert state["upto"] == 0 and "Question 98" not in state["summary"]
+    messages = window.build(history, state)
+    assert messages[0]["role"] == "system" and messages[1:] == history
+
+
+def test_idle_sessions_expire():
+    clock = FakeClock()
+    store = InMemorySessionStore(ttl=60, clock=clock)
+    store.save("a", _session("a"))
+    clock.now = 61
+    assert store.get("a") is None
+    assert len(store) == 0
+
+
+def test_sqlite_store_round_trips_sessions(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    session = _session("asha", turns=2, text="is digital gold safe?")
+    session.state = "purchase"
+    session.pending_purchase = {"user_name": "asha", "grams": 1.0, "rupees": 7000.0, "price_per_gram": 7000.0}
+    SQLiteSessionStore(path).save("asha", session)
+
+    loaded = SQLiteSessionStore(path).get("asha")
+    assert loaded.to_dict() == session.to_dict()
+    assert SQLiteSessionStore(path).get("nobody") is None
+
+
+def test_sqlite_store_purges_expired_sessions_every_n_saves(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl=60, purge_every=2)
+    store._conn.execute("INSERT INTO sessions VALUES ('old', '{}', 0)")
+    store.save("asha", _session("asha", turns=1))
+    assert store.stats()["sessions"] == 2  # not on every save
+    store.save("ravi", _session("ravi", turns=1))
+    assert store.stats()["sessions"] == 2 and store.get("asha") is not None
+    store._conn.execute("INSERT INTO sessions VALUES ('old', '{}', 0)")
+    assert store.purge() == 1
+
+
+def test_session_store_is_abstract():
+    with pytest.raises(TypeError):
+        SessionStore()
+
+
+def test_lock_serialises_turns_for_the_same_user():
+    store = InMemorySessionStore()
+    order = []
+
+    async def turn(label):
+        async with store.lock("asha"):
+            order.append(f"{label}-start")
+            await asyncio.sleep(0.01)
+            order.append(f"{label}-end")
+
+    async def main():
+        await asyncio.gather(turn("one"), turn("two"))
+
+    asyncio.run(main())
+    assert order == ["one-start", "one-end", "two-start", "two-end"]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value, nx=False, px=None, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def register_script(self, script):
+        def release(keys, args):
+            if self.data.get(keys[0]) == args[0]:
+                del self.data[keys[0]]
+        return release
+
+
+def test_redis_lock_serialises_turns_across_workers():
+    client = FakeRedis()
+    workers = [RedisSessionStore(client=client), RedisSessionStore(client=client)]
+    order = []
+
+    async def turn(store, label):
+        async with store.lock("asha"):
+            order.append(f"{label}-start")
+            await asyncio.sleep(0.01)
+            order.append(f"{label}-end")
+
+    async def main():
+        await asyncio.gather(turn(workers[0], "one"), turn(workers[1], "two"))
+        session = await workers[0].aget_or_create("asha")
+        await workers[0].asave("asha", session)
+        return await workers[1].aget_or_create("asha")
+
+    assert asyncio.run(main()).user_name == "asha"
+    assert order == ["one-start", "one-end", "two-start", "two-end"]
+    assert list(client.data) == ["gold:session:asha"]
@@ -0,0 +1,117 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import subprocess
+
+from database.purchase_writer import PurchaseWriter
+from utils.price_cache import PriceCache
+from utils.price_ticker import PriceRingBuffer, PriceTicker
+from utils.quote_store import SQLiteQuoteStore
+from utils.shared_state import KeyedFileLock, SharedPrice, WorkerLeader
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PRICE = {"price_per_gram": 7253.47, "currency": "INR", "source": "API Ninjas", "last_updated": "2026-01-01 10:00"}
+
+
+def in_subprocess(code):
+    # Runs `code` in a separate process, as another worker would
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO, capture_output=True, text=True, timeout=30)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip()
+
+
+def test_shared_price_is_seen_by_other_processes(tmp_path):
+    path = str(tmp_path / "price.mmap")
+    assert SharedPrice(path).read() is None
+    SharedPrice(path).publish(PRICE, 1000.0)
+    out = in_subprocess(f"from utils.shared_state import SharedPrice; info, at = SharedPrice({path!r}).read(); "
+                        f"print(info['price_per_gram'], at)")
+    assert out == "7253.47 1000.0"
+    reader = SharedPrice(path)
+    assert reader.read() == (PRICE, 1000.0)
+    SharedPrice(path).publish(dict(PRICE, price_per_gram=7300.0), 1030.0)
+    assert reader.read() == (dict(PRICE, price_per_gram=7300.0), 1030.0)
+
+
+def test_one_worker_leads_until_it_exits(tmp_path):
+    path = str(tmp_path / "leader.lock")
+    check = f"from utils.shared_state import WorkerLeader; print(WorkerLeader({path!r}).is_leader())"
+    leader = WorkerLeader(path)
+    assert leader.is_leader() and leader.is_leader()
+    assert in_subprocess(check) == "False"
+    leader.release()
+    assert in_subprocess(check) == "True"
+
+
+def test_keyed_file_lock_excludes_other_processes(tmp_path):
+    path = str(tmp_path / "sessions.locks")
+    probe = (f"import fcntl, os, zlib; fd = os.open({path!r}, os.O_RDWR); "
+             f"stripe = zlib.crc32(b'Asha') % 65536\n"
+             f"try:\n    fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, stripe); print('free')\n"
+             f"except OSError:\n    print('held')")
+    locks = KeyedFileLock(path)
+
+    async def hold():
+        await locks.acquire("Asha")
+        await locks.acquire("Asha")  # same process: counted, not blocked
+        locks.release("Asha")
+        held = in_subprocess(probe)
+        locks.release("Asha")
+        return held
+
+    assert asyncio.run(hold()) == "held"
+    assert in_subprocess(probe) == "free"
+
+
+def test_sqlite_quotes_are_shared_between_stores(tmp_path):
+    path = str(tmp_path / "quotes.db")
+    now = [1000.0]
+    issuing = SQLiteQuoteStore(path, ttl=60, clock=lambda: now[0])
+    confirming = SQLiteQuoteStore(path, ttl=60, clock=lambda: now[0])
+    quote_id = issuing.issue("Asha", 0.5, 3500.0, 7000.0)
+    assert len(quote_id) == 34 and int(quote_id[2:], 16) > 0  # "q0" + 128-bit nonce
+    assert confirming.get(quote_id)["price_per_gram"] == 7000.0
+    assert confirming.discard(quote_id) and issuing.get(quote_id) is None
+    expiring = issuing.issue("Ravi", 1.0, 7000.0, 7000.0)
+    now[0] += 61
+    assert confirming.get(expiring) is None and len(issuing) == 0
+
+
+def test_follower_ticker_takes_the_leaders_price(tmp_path):
+    shared = SharedPrice(str(tmp_path / "price.mmap"))
+    leader = PriceTicker(PriceRingBuffer(10), fetch=lambda: PRICE, cache=PriceCache(ttl=60), shared=shared)
+    cache = PriceCache(ttl=60)
+    follower = PriceTicker(PriceRingBuffer(10), fetch=lambda: 1 / 0, cache=cache, shared=SharedPrice(shared.path))
+    assert follower.follow_once() is None
+    asyncio.run(leader.poll_once())
+    assert follower.follow_once() == PRICE
+    assert follower.follow_once() is None  # already recorded
+    assert follower.buffer.latest()[1] == 7253.47
+    assert cache.try_get(lambda: 1 / 0) == (True, PRICE)
+
+
+def test_only_the_leader_flushes_the_spool(tmp_path):
+    class NotLeader:
+        def is_leader(self):
+            return False
+
+    class RecordingDB:
+        def __init__(self):
+            self.rows = []
+
+        def write_purchase_records(self, records):
+            self.rows.extend(records)
+            return True
+
+    spool, db = str(tmp_path / "spool.db"), RecordingDB()
+    follower = PurchaseWriter(spool_path=spool, db=db, leader=NotLeader())
+    follower.submit({"quote_id": "q1"}, {"user_name": "Asha", "grams": 0.5})
+    follower.stop()
+    assert db.rows == []
+    leader = PurchaseWriter(spool_path=spool, db=db)
+    assert leader.flush() == 1
+    records, cursor = follower.written_since(0.0)
+    assert [r["user_name"] for r in records] == ["Asha"]
+    assert follower.written_since(cursor) == ([], cursor)
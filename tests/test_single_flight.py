@@ -0,0 +1,103 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import nodes.gold_investment_node as investment_node
+from utils.single_flight import SingleFlight
+
+
+def test_concurrent_sync_calls_share_one_run():
+    flights = SingleFlight()
+    release = threading.Event()
+    runs = []
+
+    def slow():
+        runs.append(1)
+        release.wait(5)
+        return "answer"
+
+    with ThreadPoolExecutor(5) as pool:
+        futures = [pool.submit(flights.run, "key", slow) for _ in range(5)]
+        while flights.stats()["issued"] + flights.stats()["coalesced"] < 5:
+            time.sleep(0.001)
+        release.set()
+        results = [f.result() for f in futures]
+    assert len(runs) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert {"issued": 1, "coalesced": 4, "in_flight": 0} == {k: flights.stats()[k] for k in ("issued", "coalesced", "in_flight")}
+    assert flights.run("key", lambda: "again") == ("again", False)
+
+
+def test_errors_reach_every_waiter_and_leader_cancellation_does_not():
+    flights = SingleFlight()
+
+    async def failing():
+        await asyncio.sleep(0.05)
+        raise RuntimeError("upstream down")
+
+    async def errors():
+        return await asyncio.gather(*(flights.arun("k", failing) for _ in range(3)), return_exceptions=True)
+
+    assert [type(e) for e in asyncio.run(errors())] == [RuntimeError] * 3
+
+    async def answer():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def cancelled_leader():
+        leader = asyncio.ensure_future(flights.arun("k2", answer))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.arun("k2", answer))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(cancelled_leader()) == ("ok", True)
+
+
+class NameEchoLLM:
+    def __init__(self):
+        self.calls = 0
+
+    async def aask(self, prompt, history=None, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        name = re.search(r"user's name is (\w+)", history[0]["content"]).group(1)
+        return f"{name}, Sovereign Gold Bonds pay 2.5% interest a year."
+
+
+def test_identical_opening_questions_share_one_llm_call(monkeypatch):
+    monkeypatch.setattr(investment_node, "llm_flights", SingleFlight())
+    llm = NameEchoLLM()
+    names = ["Asha", "Ravi", "Meera", "Kabir"]
+
+    async def burst():
+        return await asyncio.gather(*(
+            investment_node.gold_investment_api_async("What is an SGB?", name, llm=llm) for name in names
+        ))
+
+    replies = asyncio.run(burst())
+    assert llm.calls == 1
+    assert [r["message"].split(",")[0] for r in replies] == names
+    assert investment_node.llm_flights.stats()["coalesced"] == 3
+
+
+def test_follow_up_questions_are_not_coalesced(monkeypatch):
+    monkeypatch.setattr(investment_node, "llm_flights", SingleFlight())
+    llm = NameEchoLLM()
+    history = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "Hello!"}]
+
+    async def burst():
+        return await asyncio.gather(*(
+            investment_node.gold_investment_api_async("What is an SGB?", "Asha", chat_history=history, llm=llm)
+            for _ in range(3)
+        ))
+
+    asyncio.run(burst())
+    assert llm.calls == 3
@@ -0,0 +1,10 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_startup import eagerly_imported
+
+
+def test_heavy_clients_are_not_imported_with_the_app():
+    # supabase, numpy and the HTTP clients load on first use or in the post-startup warm-up
+    assert eagerly_imported("api_app") == []
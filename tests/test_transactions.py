@@ -0,0 +1,113 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api_app
+from benchmarks.stubs import serve_postgrest_stub
+from database.purchase_query import decode_cursor, encode_cursor, project, select_columns
+from database.supabase_client import SupabaseDB
+
+ROWS = 45
+
+
+@pytest.fixture(scope="module")
+def db(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("purchases") / "purchases.db")
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute(
+            "CREATE TABLE gold_purchases (id INTEGER PRIMARY KEY, user_name TEXT, phone TEXT, email TEXT, "
+            "grams REAL, amount_inr REAL, price_per_gram REAL, purchase_time TEXT, receipt_id TEXT)"
+        )
+        # Three rows per timestamp, so pages have to break ties on id
+        conn.executemany("INSERT INTO gold_purchases VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [
+            (i, f"user{i % 3}", "9876543210", f"u{i}@example.com", i / 10, 100.0 * i, 7250.0,
+             f"2024-01-{1 + i // 3:02d}T10:00:00", f"GP-{i}")
+            for i in range(1, ROWS + 1)
+        ])
+    conn.close()
+    server = serve_postgrest_stub(path)
+    saved = {key: os.environ.get(key) for key in ("SUPABASE_URL", "SUPABASE_KEY")}
+    os.environ["SUPABASE_URL"] = server.url
+    os.environ["SUPABASE_KEY"] = "test.test.test"
+    yield SupabaseDB()
+    server.stop()
+    for key, value in saved.items():
+        if value is None:
+            os.environ.pop(key, None)
+        else:
+            os.environ[key] = value
+
+
+def _ids(rows):
+    return [row["id"] for row in rows]
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor({"purchase_time": "2024-01-01T10:00:00", "id": 7})
+    assert decode_cursor(cursor) == ("2024-01-01T10:00:00", 7)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_forged_cursors_are_rejected():
+    for purchase_time in ('2024-01-01T10:00:00",id.gt.0)', "2024-01-01,id.gt.0", "yesterday", 5):
+        with pytest.raises(ValueError):
+            decode_cursor(encode_cursor({"purchase_time": purchase_time, "id": 7}))
+    # Valid timestamps are re-serialised in a canonical form
+    assert decode_cursor(encode_cursor({"purchase_time": "2024-01-01 10:00:00", "id": 7}))[0] == "2024-01-01 10:00:00"
+    assert decode_cursor(encode_cursor({"purchase_time": "2024-01-01T10:00:00.12Z", "id": 7}))[0] == \
+        "2024-01-01T10:00:00.120000+00:00"
+
+
+def test_projection_keeps_sort_keys_for_the_cursor():
+    assert select_columns(["grams"]) == "grams,purchase_time,id"
+    assert project([{"grams": 1, "purchase_time": "t", "id": 1}], ["grams"]) == [{"grams": 1}]
+    with pytest.raises(ValueError):
+        select_columns(["grams", "password"])
+
+
+def test_pages_cover_every_row_once_in_order(db):
+    seen, cursor = [], None
+    while True:
+        rows, cursor = db.get_purchases(limit=10, cursor=cursor)
+        seen += _ids(rows)
+        if cursor is None:
+            break
+    assert seen == list(range(ROWS, 0, -1))
+
+
+def test_filters_and_projection(db):
+    rows, cursor = db.get_purchases(limit=100, user_name="user1", min_amount=1000, columns=["amount_inr"])
+    assert cursor is None
+    assert rows and all(set(row) == {"amount_inr"} and row["amount_inr"] >= 1000 for row in rows)
+    rows, _ = db.get_purchases(since="2024-01-03T00:00:00", until="2024-01-04T23:59:59")
+    assert sorted(_ids(rows)) == [6, 7, 8, 9, 10, 11]
+
+
+def test_iter_purchases_yields_chunks(db):
+    chunks = list(db.iter_purchases(chunk_size=20))
+    assert [len(c) for c in chunks] == [20, 20, 5]
+
+
+def test_endpoint_pages_and_streams(db, monkeypatch):
+    monkeypatch.setattr(api_app, "get_db", lambda: db)
+    client = TestClient(api_app.app)
+    body = client.get("/transactions", params={"limit": 40}).json()
+    assert len(body["transactions"]) == 40
+    rest = client.get("/transactions", params={"limit": 40, "cursor": body["next_cursor"]}).json()
+    assert _ids(rest["transactions"]) == [5, 4, 3, 2, 1] and rest["next_cursor"] is None
+
+    response = client.get("/transactions", params={"format": "ndjson", "user_name": "user0"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == ROWS // 3 and all(row["user_name"] == "user0" for row in lines)
+
+    assert client.get("/transactions", params={"cursor": "garbage"}).status_code == 400
+    assert client.get("/transactions", params={"columns": "secret"}).status_code == 400
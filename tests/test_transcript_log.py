@@ -0,0 +1,102 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import nodes.gold_investment_node as investment_node
+from database.transcript_log import TranscriptLog, iter_transcripts, segment_paths
+from flow.agent_flow_controller import GoldInvestmentSession
+from flow.conversation_engine import ConversationEngine
+from tools.transcripts import rebuild_sessions
+
+PRICE = {"price_per_gram": 7000.0, "currency": "INR", "source": "test", "last_updated": "2026-01-01 10:00"}
+
+
+def _log(tmp_path, **kwargs):
+    log = TranscriptLog(str(tmp_path / "transcripts"), flush_interval=60, **kwargs)
+    log.start = lambda: None  # tests flush explicitly
+    return log
+
+
+def test_turns_round_trip_and_filter_by_user(tmp_path):
+    log = _log(tmp_path)
+    log.append("asha", "सोने का भाव?", "₹7000 per gram", "investment", "reply", timestamp=1.0)
+    log.append("ravi", "Buy 2 grams", "You're about to purchase 2.0 grams", "purchase", "pending", timestamp=2.0)
+    log.append("asha", "9876543210 a@example.com", "Congratulations", "investment", "confirmed", "GP-1", 3.0)
+    log.stop()
+    records = list(iter_transcripts(log.directory))
+    assert [r["user_id"] for r in records] == ["asha", "ravi", "asha"]
+    assert records[0]["message"] == "सोने का भाव?" and records[0]["receipt_id"] is None
+    asha = list(iter_transcripts(log.directory, user_id="asha"))
+    assert [r["receipt_id"] for r in asha] == [None, "GP-1"]
+
+
+def test_oversized_fields_are_truncated_not_dropped(tmp_path):
+    log = _log(tmp_path)
+    long_user = "अ" * 30000  # 90,000 UTF-8 bytes, over the 64 KiB user_id slot
+    log.append(long_user, "gold rate today", "₹7000", "investment", "reply", "GP-" + "9" * 300)
+    log.append("asha", "next", "turn", "investment", "reply")
+    log.stop()
+    records = list(iter_transcripts(log.directory))
+    assert len(records) == 2 and records[1]["user_id"] == "asha"
+    assert long_user.startswith(records[0]["user_id"]) and len(records[0]["user_id"].encode()) <= 0xFFFF
+    assert records[0]["message"] == "gold rate today" and len(records[0]["receipt_id"]) == 255
+
+
+def test_contact_details_are_redacted_unless_raw_pii_is_opted_in(tmp_path):
+    log = _log(tmp_path)
+    log.append("asha", "9876543210 a@example.com", "Contact: 9876543210, Email: a@example.com",
+               "investment", "confirmed", "GP-1")
+    log.stop()
+    record = next(iter_transcripts(log.directory))
+    assert (record["message"], record["reply"]) == ("[phone] [email]", "Contact: [phone], Email: [email]")
+    raw = _log(tmp_path, redact_pii=False)
+    raw.append("ravi", "+91 98765 43210", "ok", "purchase", "pending")
+    raw.stop()
+    assert list(iter_transcripts(raw.directory, user_id="ravi"))[0]["message"] == "+91 98765 43210"
+
+
+def test_segments_older_than_the_retention_are_deleted(tmp_path):
+    log = _log(tmp_path, retention=3600)
+    log.append("asha", "old turn", "reply", "investment", "reply")
+    log.stop()
+    old = segment_paths(log.directory)[0]
+    os.utime(old, (0, 0))
+    log.append("asha", "new turn", "reply", "investment", "reply")
+    log.flush()  # leaves this segment open
+    os.utime(segment_paths(log.directory)[1], (0, 0))
+    assert log.purge() == 1 and not os.path.exists(old)
+    assert [r["message"] for r in iter_transcripts(log.directory)] == ["new turn"]
+    assert TranscriptLog(log.directory).purge() == 0  # no retention: keep everything
+
+
+def test_segments_rotate_by_size(tmp_path):
+    log = _log(tmp_path, segment_bytes=300)
+    for i in range(20):
+        log.append(f"user{i}", "gold rate today", "x" * 50, "investment", "reply")
+        log.flush()
+    log.stop()
+    assert len(segment_paths(log.directory)) > 3
+    assert [r["user_id"] for r in iter_transcripts(log.directory)] == [f"user{i}" for i in range(20)]
+
+
+def test_torn_tail_is_ignored(tmp_path):
+    log = _log(tmp_path)
+    for i in range(3):
+        log.append("asha", f"question {i}", "answer", "investment", "reply")
+    log.stop()
+    path = segment_paths(log.directory)[0]
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 5)  # crashed mid-write
+    assert [r["message"] for r in iter_transcripts(log.directory)] == ["question 0", "question 1"]
+
+
+def test_engine_turns_are_logged_and_sessions_rebuilt(tmp_path, monkeypatch):
+    monkeypatch.setattr(investment_node, "get_current_gold_price_inr", lambda: PRICE)
+    log = _log(tmp_path)
+    engine = ConversationEngine(transcript=log)
+    session = GoldInvestmentSession("asha")
+    for message in ("gold rate today", "I want to buy gold"):
+        engine.turn(session, message)
+    log.stop()
+    rebuilt = rebuild_sessions(iter_transcripts(log.directory))["asha"]
+    assert rebuilt.chat_history == session.chat_history and rebuilt.state == "purchase"
@@ -0,0 +1,74 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+
+from dotenv import load_dotenv
+load_dotenv()
+from database.transcript_log import iter_transcripts
+
+
+def export(records, out):
+    count = 0
+    for record in records:
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+def rebuild_sessions(records):
+    """
+    GoldInvestmentSessions rebuilt from transcript records: chat history and
+    conversation state as of each user's last recorded turn. Pending purchases
+    are not logged, so a session left mid-purchase asks for the amount again.
+    """
+    from flow.agent_flow_controller import GoldInvestmentSession
+
+    sessions = {}
+    for record in sorted(records, key=lambda r: r["timestamp"]):
+        session = sessions.get(record["user_id"])
+        if session is None:
+            session = sessions[record["user_id"]] = GoldInvestmentSession(record["user_id"])
+        session.chat_history.append({"role": "user", "content": record["message"]})
+        session.chat_history.append({"role": "assistant", "content": record["reply"]})
+        session.state = record["state"]
+    return sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export transcript logs or rebuild sessions from them")
+    parser.add_argument("command", choices=("export", "sessions"),
+                        help="export: one JSON line per turn; sessions: one JSON line per rebuilt session")
+    parser.add_argument("--dir", default=os.getenv("TRANSCRIPT_DIR", "transcripts"))
+    parser.add_argument("--user", help="only this user_id")
+    parser.add_argument("--since", type=float, help="only turns at or after this Unix timestamp")
+    parser.add_argument("--restore", action="store_true",
+                        help="with sessions: save them into the configured SESSION_STORE instead of printing")
+    args = parser.parse_args()
+
+    records = iter_transcripts(args.dir, args.user)
+    if args.since is not None:
+        records = (r for r in records if r["timestamp"] >= args.since)
+    if args.command == "export":
+        count = export(records, sys.stdout)
+        print(f"Exported {count} turns", file=sys.stderr)
+        return
+
+    sessions = rebuild_sessions(records)
+    if args.restore:
+        from flow.session_store import create_session_store
+        store = create_session_store()
+        if store.stats()["backend"] == "memory":
+            parser.error("--restore needs a shared store: set SESSION_STORE to sqlite or redis")
+        for user_id, session in sessions.items():
+            store.save(user_id, session)
+        print(f"Restored {len(sessions)} sessions into {store.stats()['backend']}", file=sys.stderr)
+        return
+    for user_id, session in sessions.items():
+        print(json.dumps({"user_id": user_id, **session.to_dict()}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
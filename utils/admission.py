@@ -0,0 +1,235 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+
+from utils.resilience import remaining
+
+# Admission control, in the order a request meets it:
+#   1. a cap on turns per user_id in flight (one running, the rest waiting
+#      on the session lock), so one client can't queue up unbounded work,
+#   2. a token bucket per user_id (sustained rate plus a burst),
+#   3. a global limit on concurrent LLM calls with a bounded wait queue.
+# Anything over a limit is rejected at once with a Retry-After hint instead
+# of slowing every other request down.
+
+
+class AdmissionRejected(RuntimeError):
+    """
+    A request was turned away by a limit; `retry_after` is in seconds.
+    """
+
+    def __init__(self, message, retry_after=1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """
+    Token buckets keyed by user: each holds up to `burst` tokens and refills
+    at `rate` tokens per second. `rate` <= 0 disables limiting. Full buckets
+    are dropped when more than `max_keys` are tracked.
+    """
+
+    def __init__(self, rate, burst, max_keys=100_000, clock=time.monotonic):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_keys = max_keys
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._buckets = {}  # key -> [tokens, last refill]
+
+    def acquire(self, key) -> float:
+        """
+        Takes a token for `key`. Returns 0.0 if one was available, otherwise
+        the seconds until one will be.
+        """
+        if self.rate <= 0:
+            return 0.0
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._prune(now)
+                bucket = self._buckets[key] = [self.burst, now]
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens >= 1:
+                bucket[0] = tokens - 1
+                return 0.0
+            bucket[0] = tokens
+            return (1 - tokens) / self.rate
+
+    def _prune(self, now):
+        full = [key for key, (tokens, at) in self._buckets.items() if tokens + (now - at) * self.rate >= self.burst]
+        for key in full:
+            del self._buckets[key]
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class ConcurrencyLimiter:
+    """
+    Async limit of `limit` concurrent holders. Up to `max_waiting` callers
+    queue (FIFO) for at most `wait_timeout` seconds, or less if the request
+    deadline is closer; beyond that AdmissionRejected is raised immediately.
+    `limit` <= 0 disables it.
+    """
+
+    def __init__(self, limit, max_waiting, wait_timeout):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.active = 0
+        self._waiters = deque()
+        self._hold = 1.0  # moving average of how long a slot is held, for Retry-After
+        self._counters = {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0}
+
+    def retry_after(self) -> float:
+        if self.limit <= 0:
+            return 1.0
+        return max(1.0, self._hold * (len(self._waiters) + 1) / self.limit)
+
+    async def acquire(self):
+        if self.limit <= 0:
+            return
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self._counters["admitted"] += 1
+            return
+        if len(self._waiters) >= self.max_waiting:
+            self._counters["rejected"] += 1
+            raise AdmissionRejected("too many requests in flight", self.retry_after())
+        self._counters["queued"] += 1
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout=min(self.wait_timeout, remaining(self.wait_timeout)))
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # the slot was handed over as we gave up; pass it on
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self._counters["timed_out"] += 1
+                raise AdmissionRejected("timed out waiting for capacity", self.retry_after()) from None
+            raise
+        self._counters["admitted"] += 1
+
+    def release(self):
+        if self.limit <= 0:
+            return
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done() and not waiter.get_loop().is_closed():
+                waiter.set_result(None)  # hand the slot straight to the next waiter
+                return
+        self.active -= 1
+
+    def slot(self):
+        """
+        `async with limiter.slot():` holds one slot for the block.
+        """
+        return _Slot(self)
+
+    def stats(self):
+        return {**self._counters, "active": self.active, "waiting": len(self._waiters), "limit": self.limit}
+
+
+class _Slot:
+    __slots__ = ("limiter", "start")
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+
+    async def __aenter__(self):
+        await self.limiter.acquire()
+        self.start = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        limiter = self.limiter
+        limiter._hold = 0.8 * limiter._hold + 0.2 * (time.monotonic() - self.start)
+        limiter.release()
+        return False
+
+
+class Admission:
+    """
+    Per-user admission for conversation endpoints: a token bucket and a cap
+    of `max_pending` turns in flight per user. `admit` raises
+    AdmissionRejected or returns a ticket to release when the turn ends.
+    """
+
+    def __init__(self, rate, burst, max_pending, clock=time.monotonic):
+        self.rates = RateLimiter(rate, burst, clock=clock)
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._counters = {"admitted": 0, "rate_limited": 0, "too_many_pending": 0}
+
+    def admit(self, user_id) -> "_Ticket":
+        with self._lock:
+            # The pending cap is checked first so a rejected turn doesn't spend a rate token
+            pending = self._pending.get(user_id, 0)
+            if self.max_pending > 0 and pending >= self.max_pending:
+                self._counters["too_many_pending"] += 1
+                raise AdmissionRejected("previous messages still in progress", 1.0)
+            wait = self.rates.acquire(user_id)
+            if wait:
+                self._counters["rate_limited"] += 1
+                raise AdmissionRejected("rate limit exceeded", wait)
+            self._pending[user_id] = pending + 1
+            self._counters["admitted"] += 1
+        return _Ticket(self, user_id)
+
+    def _release(self, user_id):
+        with self._lock:
+            pending = self._pending.get(user_id, 0) - 1
+            if pending > 0:
+                self._pending[user_id] = pending
+            else:
+                self._pending.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, "users_in_flight": len(self._pending), "buckets": len(self.rates)}
+
+
+class _Ticket:
+    __slots__ = ("admission", "user_id", "released")
+
+    def __init__(self, admission, user_id):
+        self.admission = admission
+        self.user_id = user_id
+        self.released = False
+
+    def release(self):
+        # Idempotent, so it can be called from both a stream's end and a fallback
+        if not self.released:
+            self.released = True
+            self.admission._release(self.user_id)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+admission = Admission(
+    rate=float(os.getenv("ADMISSION_USER_RATE", "1")),
+    burst=float(os.getenv("ADMISSION_USER_BURST", "10")),
+    max_pending=int(os.getenv("ADMISSION_USER_MAX_PENDING", "2")),
+)
+
+# Shared by every LLM call (see model.llm_router)
+llm_limiter = ConcurrencyLimiter(
+    limit=int(os.getenv("LLM_MAX_CONCURRENCY", "32")),
+    max_waiting=int(os.getenv("LLM_MAX_QUEUE", "64")),
+    wait_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "5")),
+)
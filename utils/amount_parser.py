@@ -1,64 +1,198 @@
+import math
 import re
 
+# One regex pass splits the message into tokens: numbers (with Indian or
+# western digit grouping and decimals, or an exponent as in 1e5), words, ₹
+# and %. Everything after that is a single walk over the token list using
+# the tables below.
+# Words are tried first as they are the most common token.
+_TOKEN_RE = re.compile(r"[a-z]+|\d+(?:\.\d+)?e[+-]?\d+(?![a-z])|\d+(?:,\d{2,3})*(?:\.\d+)?|(?<![a-z])\.\d+|₹|%")
+
+_ONES = "zero one two three four five six seven eight nine ten eleven twelve thirteen fourteen " \
+        "fifteen sixteen seventeen eighteen nineteen".split()
+_TENS = "twenty thirty forty fifty sixty seventy eighty ninety".split()
+_NUMBER_WORDS = {word: i for i, word in enumerate(_ONES)}
+_NUMBER_WORDS.update({word: 20 + 10 * i for i, word in enumerate(_TENS)})
+_FRACTIONS = {"half": 0.5, "quarter": 0.25}
+
+_BIG_SCALES = {
+    "thousand": 1e3, "k": 1e3,
+    "lakh": 1e5, "lakhs": 1e5, "lac": 1e5, "lacs": 1e5, "l": 1e5,
+    "million": 1e6,
+    "crore": 1e7, "crores": 1e7, "cr": 1e7,
+}
+# Multiplier words allowed after a number; "k", "l" and "cr" only count after digits
+_SCALES = dict(_BIG_SCALES, hundred=1e2)
+_WORD_SCALES = {word: scale for word, scale in _SCALES.items() if word not in ("k", "l", "cr")}
+
+# unit token -> (unit, factor to that unit)
+_UNITS = {
+    "rs": ("INR", 1), "inr": ("INR", 1), "rupee": ("INR", 1), "rupees": ("INR", 1), "₹": ("INR", 1),
+    "g": ("grams", 1), "gm": ("grams", 1), "gms": ("grams", 1), "gram": ("grams", 1), "grams": ("grams", 1),
+    "gramme": ("grams", 1), "grammes": ("grams", 1),
+    "kg": ("grams", 1000), "kgs": ("grams", 1000), "kilo": ("grams", 1000), "kilos": ("grams", 1000),
+}
+_CURRENCY_PREFIXES = frozenset({"₹", "rs", "inr"})
+# "gold worth 3500" is an amount of money
+_MONEY_WORDS = _CURRENCY_PREFIXES | {"worth"}
+# Numbers followed by these are not amounts ("5%", "3 years", "22 karat")
+_NOT_AMOUNTS = frozenset({"%", "percent", "year", "years", "yr", "yrs", "month", "months", "day", "days",
+                          "am", "pm", "kt", "karat", "carat", "ct", "x"})
+_KARAT_VALUES = frozenset({14e3, 18e3, 22e3, 24e3})  # after the "k" has scaled them
+
+# Confidence for each way an amount can be found
+CONFIDENCE_EXPLICIT = 1.0     # digits with a unit: "2 grams", "₹500"
+CONFIDENCE_WORDS = 0.9        # number words with a unit: "two and a half grams"
+CONFIDENCE_SCALED = 0.8       # no unit but a money scale: "5k", "2.5 lakh"
+CONFIDENCE_GUESSED = 0.6      # bare digits, unit guessed from size: "invest 1000"
+CONFIDENCE_BARE_WORDS = 0.5   # bare number words: "buy five"
+AMBIGUITY_PENALTY = 0.8       # applied when the message holds more than one amount
+# Below this an amount is only a guess: ask the user instead of quoting it
+MIN_CONFIDENCE = 0.7
+
+
+_DIGIT_STARTS = frozenset("0123456789.")
+# Words that can open a spelled-out number; "a"/"an" only before _AFTER_ARTICLE
+_AFTER_ARTICLE = frozenset(_WORD_SCALES) | frozenset(_FRACTIONS)
+_WORD_STARTS = frozenset(_NUMBER_WORDS) | _AFTER_ARTICLE
+
+
+def _starts_words(tokens, i):
+    tok = tokens[i]
+    if tok in _WORD_STARTS:
+        return True
+    # "a thousand", "a half"
+    return (tok == "a" or tok == "an") and i + 1 < len(tokens) and tokens[i + 1] in _AFTER_ARTICLE
+
+
+def _starts_number(tokens, i):
+    return tokens[i][0] in _DIGIT_STARTS or _starts_words(tokens, i)
+
+
+def _read_words(tokens, i):
+    # Compound number words: "two lakh fifty thousand", "twenty five hundred",
+    # "two and a half". Returns (value, next index, saw a scale word).
+    total = current = 0.0
+    scaled = False
+    n = len(tokens)
+    while i < n:
+        tok = tokens[i]
+        nxt = tokens[i + 1] if i + 1 < n else ""
+        if tok in _NUMBER_WORDS:
+            current += _NUMBER_WORDS[tok]
+        elif tok in _FRACTIONS:
+            current += _FRACTIONS[tok]
+            if nxt in ("a", "an"):  # "half a gram"
+                i += 1
+        elif tok == "hundred":
+            current = (current or 1) * 100
+            scaled = True
+        elif tok in _WORD_SCALES:
+            total += (current or 1) * _WORD_SCALES[tok]
+            current = 0.0
+            scaled = True
+        elif (tok == "a" or tok == "an") and nxt in _AFTER_ARTICLE:
+            pass
+        elif tok == "and" and i > 0 and nxt and _starts_number(tokens, i + 1):
+            pass
+        else:
+            break
+        i += 1
+    return total + current, i, scaled
+
+
+def _read_digits(tokens, i):
+    # "1,50,000", "2.5 lakh", "5k", "1 and a half", "1e5", and compounds
+    # "1 lakh 50 thousand" / "2 crore and fifty lakh"
+    value = float(tokens[i].replace(",", ""))
+    i += 1
+    scaled = False
+    n = len(tokens)
+    if i < n and tokens[i] == "and" and tokens[i + 1:i + 3] == ["a", "half"]:
+        value += 0.5
+        i += 3
+    scale = 1.0
+    while i < n and tokens[i] in _SCALES:
+        scale = _SCALES[tokens[i]]
+        value *= scale
+        scaled = True
+        i += 1
+    if scaled:
+        j = i + 1 if i < n and tokens[i] == "and" else i
+        if j < n and _starts_number(tokens, j):
+            read = _read_digits if tokens[j][0] in _DIGIT_STARTS else _read_words
+            rest, k, rest_scaled = read(tokens, j)
+            if rest_scaled and rest < scale:  # a smaller part follows, not a second amount
+                value += rest
+                i = k
+    return value, i, scaled
+
+
+def _is_karat(tokens, i):
+    # "24k gold" is a purity, not ₹24,000
+    return tokens[i + 1:i + 3] == ["k", "gold"]
+
+
 def parse_amount(user_message: str):
     """
     Extracts an investment amount (in INR or grams) from the user's message.
-    Returns a dict: {'amount': float, 'unit': 'INR' or 'grams'} or None if not found.
-    Supports formats like:
+    Returns a dict: {'amount': float, 'unit': 'INR' or 'grams', 'confidence': float}
+    or None if not found. Supports formats like:
         - "I want to invest 5000 rupees"
-        - "Buy gold worth ₹2500"
-        - "Purchase 2 grams"
-        - "Invest 1000"
-        - "Can I buy 0.5 gram?"
-        - "Invest one thousand rupees"
+        - "Buy gold worth ₹2500" / "₹ 2.5L" / "Rs.1,50,000" / "5k"
+        - "Purchase 2 grams" / "Can I buy 0.5 gram?" / "1 kg"
+        - "Invest one thousand rupees" / "two lakh fifty thousand" / "1 lakh 50 thousand"
+        - "1e5 rupees"
+        - "two and a half grams" / "half a gram"
+    Without an explicit unit, amounts of 10 or more are taken as INR and smaller
+    ones as grams, at lower confidence; callers should confirm amounts below
+    MIN_CONFIDENCE with the user.
     """
+    tokens = _TOKEN_RE.findall(user_message.lower())
+    best = None
+    found = 0
+    i, n = 0, len(tokens)
+    while i < n:
+        start = i
+        tok = tokens[i]
+        if tok[0] in _DIGIT_STARTS:
+            from_words = False
+            value, i, scaled = _read_digits(tokens, i)
+            if value in _KARAT_VALUES and _is_karat(tokens, start):
+                i = start + 2
+                continue
+        elif tok in _WORD_STARTS or ((tok == "a" or tok == "an") and _starts_words(tokens, i)):
+            from_words = True
+            value, i, scaled = _read_words(tokens, i)
+        else:
+            i += 1
+            continue
+        nxt = tokens[i] if i < n else ""
+        if value <= 0 or not math.isfinite(value) or nxt in _NOT_AMOUNTS:
+            continue
 
-    message = user_message.lower()
+        unit = None
+        if nxt in _UNITS:
+            unit, factor = _UNITS[nxt]
+            value *= factor
+            i += 1
+        elif start > 0 and tokens[start - 1] in _MONEY_WORDS:
+            unit = "INR"
 
-    # 1. Number in digits (with or without units/rupees/grams)
-    matches = re.findall(r'(\d+(?:\.\d+)?)(?:\s*)(rupees?|rs\.?|₹|inr|grams?|g\b)?', message)
-    for match in matches:
-        num, unit = match
-        amount = float(num)
-        # Normalize and guess unit
         if unit:
-            if 'gram' in unit or 'g' == unit.strip('.'):
-                return {"amount": amount, "unit": "grams"}
-            else:
-                return {"amount": amount, "unit": "INR"}
-        else:
-            # No explicit unit: assume INR for amounts >= 10, grams for < 10
-            return {"amount": amount, "unit": "INR" if amount >= 10 else "grams"}
-
-    # 2. Numbers in words (rudimentary support for English, e.g. "one thousand")
-    words_to_numbers = {
-        "zero": 0,
-        "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
-        "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
-        "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50,
-        "hundred": 100, "thousand": 1000, "lakh": 100000, "crore": 10000000
-    }
-    # Trivial logic: look for "X thousand/lakh/crore"
-    for key in ["thousand", "lakh", "crore"]:
-        pattern = r'(\w+)\s*' + key
-        match = re.search(pattern, message)
-        if match and match.group(1) in words_to_numbers:
-            base = words_to_numbers[match.group(1)]
-            total = base * words_to_numbers[key]
-            # Guess unit
-            if "gram" in message:
-                return {"amount": total, "unit": "grams"}
-            else:
-                return {"amount": total, "unit": "INR"}
-    # Example: "one hundred", "two thousand"
-    match = re.search(r'(one|two|three|four|five|six|seven|eight|nine|ten)\s*(hundred|thousand|lakh|crore)', message)
-    if match:
-        n = words_to_numbers[match.group(1)]
-        mult = words_to_numbers[match.group(2)]
-        amount = n * mult
-        if "gram" in message:
-            return {"amount": amount, "unit": "grams"}
+            confidence = CONFIDENCE_WORDS if from_words else CONFIDENCE_EXPLICIT
+        elif scaled and value >= 100:
+            unit, confidence = "INR", CONFIDENCE_SCALED
         else:
-            return {"amount": amount, "unit": "INR"}
+            unit = "INR" if value >= 10 else "grams"
+            confidence = CONFIDENCE_BARE_WORDS if from_words else CONFIDENCE_GUESSED
+        found += 1
+        if best is None or confidence > best[2]:  # first of the most certain
+            best = (value, unit, confidence)
 
-    return None
+    if best is None:
+        return None
+    value, unit, confidence = best
+    if found > 1:
+        confidence *= AMBIGUITY_PENALTY
+    return {"amount": value, "unit": unit, "confidence": round(confidence, 2)}
@@ -0,0 +1,73 @@
+import threading
+
+from database.supabase_client import MockDB, SupabaseDB
+from model.llm_router import LLMRouter, router_from_env
+from utils.http_client import close_http_clients
+
+
+class Clients:
+    """
+    Process-wide holder for the long-lived upstream clients. Each client is
+    built once (at startup or on first use) and shared by every request, so
+    env parsing and supabase client construction are not paid per call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._llm = None
+        self._db = None
+
+    @property
+    def llm(self) -> LLMRouter:
+        if self._llm is None:
+            with self._lock:
+                if self._llm is None:
+                    self._llm = router_from_env()
+        return self._llm
+
+    @property
+    def db(self):
+        if self._db is None:
+            with self._lock:
+                if self._db is None:
+                    try:
+                        self._db = SupabaseDB()
+                    except Exception as e:
+                        print(f"⚠️ Supabase connection failed: {e}")
+                        self._db = MockDB()
+        return self._db
+
+    def startup(self):
+        """
+        Builds every client up front. A missing LLM config is reported here but
+        only raised again when the LLM is actually needed.
+        """
+        self.db
+        try:
+            self.llm
+        except ValueError as e:
+            print(f"[Warning] LLM client not configured: {e}")
+
+    async def aclose(self):
+        """
+        Closes the DB client and the shared HTTP pools. Called at shutdown.
+        """
+        with self._lock:
+            db, self._db, self._llm = self._db, None, None
+        if db is not None:
+            try:
+                db.close()
+            except Exception as e:
+                print(f"[Warning] Error closing DB client: {e}")
+        await close_http_clients()
+
+
+clients = Clients()
+
+
+def get_llm() -> LLMRouter:
+    return clients.llm
+
+
+def get_db():
+    return clients.db
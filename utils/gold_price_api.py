@@ -1,47 +1,133 @@
-import requests
+import asyncio
 import time
 import os
 
+from utils.http_client import get_session
+from utils.metrics import metrics
+from utils.price_cache import PriceCache
+from utils.resilience import Upstream
+from utils.shared_state import shared_price
+
+FALLBACK_SOURCE = "Static Fallback"
+
+
+def is_live(price_info: dict) -> bool:
+    """
+    False for the static fallback and for a last known price served while the API is down.
+    """
+    return price_info.get("source") != FALLBACK_SOURCE and not price_info.get("stale")
+
+
+# Shared by every caller in this process. TTLs are read once at import.
+price_cache = PriceCache(
+    ttl=float(os.getenv("GOLDPRICE_CACHE_TTL", "60")),
+    stale_ttl=float(os.getenv("GOLDPRICE_CACHE_STALE_TTL", "300")),
+    cacheable=is_live,
+)
+
+price_upstream = Upstream("price_api", timeout=float(os.getenv("GOLDPRICE_TIMEOUT", "10")), max_attempts=2)
+
+# Most recent price the API returned, served (marked stale) when it fails
+_last_good = None
+
+
+def _shared_fresh_price():
+    # With several workers, the price any of them fetched last, while within the cache TTL
+    if shared_price is None:
+        return None
+    found = shared_price.read()
+    if found is None or time.time() - found[1] >= price_cache.ttl:
+        return None
+    return found[0]
+
+
+def _load_price():
+    info = fetch_gold_price_inr()
+    if shared_price is not None and is_live(info):
+        shared_price.publish(info, time.time())
+    return info
+
+
 def get_current_gold_price_inr():
+    """
+    Returns the current gold price per gram in INR from the shared price cache.
+    Upstream is only hit when the cached price is missing or too old; see PriceCache.
+    With several workers (WEB_CONCURRENCY > 1) the price published by any of
+    them in utils.shared_state is served first, so all workers quote alike.
+    """
+    info = _shared_fresh_price()
+    if info is not None:
+        return info
+    return price_cache.get(_load_price)
+
+
+async def aget_current_gold_price_inr():
+    """
+    Async variant of get_current_gold_price_inr. Cache hits return without
+    leaving the event loop; a miss runs the blocking fetch in a worker thread.
+    """
+    info = _shared_fresh_price()
+    if info is not None:
+        return info
+    found, info = price_cache.try_get(_load_price)
+    if found:
+        return info
+    return await asyncio.to_thread(get_current_gold_price_inr)
+
+
+@metrics.timed("price_api.fetch")
+def fetch_gold_price_inr():
     """
     Fetches the current gold price per gram in INR using API Ninjas /commodityprice.
     Reads API URL and key from .env. Returns a consistent dict.
+    Calls go through `price_upstream` (retry, circuit breaker, request deadline);
+    when they fail the last price fetched is returned with `stale: True`, or
+    the static fallback if there is none.
     """
+    global _last_good
     api_key = os.getenv("GOLDPRICE_API_KEY")
     url = os.getenv("GOLDPRICE_API_URL")
 
+    def get(timeout):
+        response = get_session().get(url, headers={"X-Api-Key": api_key}, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
     try:
         if api_key and url:
-            response = requests.get(url, headers={"X-Api-Key": api_key}, timeout=10)
-            data = response.json()
+            data = price_upstream.call(get)
             # For API Ninjas /commodityprice, price is usually per 10 grams in INR
             if "price" in data:
                 price_per_gram = float(data["price"]) / 10  # Adjust if API docs indicate per 10g
-                return {
+                _last_good = {
                     "price_per_gram": round(price_per_gram, 2),
                     "currency": "INR",
                     "source": "API Ninjas:commodityprice",
                     "last_updated": time.strftime("%Y-%m-%d %H:%M")
                 }
+                return _last_good
             # If it's a list (other endpoints), also handle:
             elif isinstance(data, list) and len(data) > 0 and "price" in data[0]:
                 price_per_gram = float(data[0]["price"]) / 10
-                return {
+                _last_good = {
                     "price_per_gram": round(price_per_gram, 2),
                     "currency": "INR",
                     "source": "API Ninjas:commodityprice",
                     "last_updated": time.strftime("%Y-%m-%d %H:%M")
                 }
+                return _last_good
             else:
                 print(f"[Warning] Gold price not found in API response: {data}")
 
     except Exception as e:
         print(f"[Warning] Gold price API error: {e}")
 
-    # Fallback if API fails
+    # Fallback if API fails: the last price fetched, else a static one
+    if _last_good is not None:
+        return dict(_last_good, stale=True)
     return {
         "price_per_gram": 6500.0,
         "currency": "INR",
-        "source": "Static Fallback",
+        "source": FALLBACK_SOURCE,
         "last_updated": time.strftime("%Y-%m-%d %H:%M")
     }
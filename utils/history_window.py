@@ -0,0 +1,121 @@
+import os
+import re
+
+# Words, numbers and individual punctuation marks; close enough to BPE counts
+# for budgeting, and much cheaper than a real tokenizer.
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+# Chat formats add a few tokens of framing per message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Local token estimate: one per word/punctuation mark, plus one per extra
+    4 characters in long words (long words split into several BPE tokens).
+    """
+    count = 0
+    for piece in _TOKEN_RE.findall(text):
+        count += 1 + max(0, len(piece) - 6) // 4
+    return count
+
+
+def message_tokens(message: dict) -> int:
+    return MESSAGE_OVERHEAD_TOKENS + estimate_tokens(message.get("content", ""))
+
+
+def _summary_line(message: dict, max_words=24) -> str:
+    text = message.get("content", "").strip()
+    first = _SENTENCE_END_RE.split(text, 1)[0]
+    words = first.split()
+    if len(words) > max_words:
+        first = " ".join(words[:max_words]) + " ..."
+    speaker = "User" if message.get("role") == "user" else "Assistant"
+    return f"{speaker}: {first}"
+
+
+class HistoryWindow:
+    """
+    Fits chat history into a token budget for the LLM request.
+
+    The most recent turns are kept verbatim while they fit in `budget_tokens`.
+    Older turns are folded into a rolling extractive summary (one short line
+    per message, oldest lines dropped beyond `summary_tokens`). The summary is
+    cached in a caller-owned `state` dict, so each message is summarised once
+    across the whole conversation.
+    """
+
+    def __init__(self, budget_tokens=None, summary_tokens=None):
+        self.budget_tokens = budget_tokens or int(os.getenv("LLM_HISTORY_TOKEN_BUDGET", "1500"))
+        self.summary_tokens = summary_tokens or int(os.getenv("LLM_SUMMARY_TOKEN_BUDGET", "300"))
+
+    def build(self, chat_history: list, state: dict = None) -> list:
+        """
+        Returns the messages to send in place of `chat_history`: an optional
+        summary system message followed by the most recent turns.
+        """
+        history = chat_history or []
+        state = {} if state is None else state
+        start = self._window_start(history, self.budget_tokens)
+        if start > 0:
+            # Older turns will be summarised; leave room for the summary
+            start = self._window_start(history, self.budget_tokens - self.summary_tokens)
+
+        start = self._fold(history, start, state)
+        messages = []
+        if state.get("summary"):
+            messages.append({
+                "role": "system",
+                "content": "Summary of the earlier conversation:\n" + state["summary"],
+            })
+        messages.extend(history[start:])
+        return messages
+
+    @staticmethod
+    def _window_start(history, budget):
+        start = len(history)
+        used = 0
+        while start > 0:
+            cost = message_tokens(history[start - 1])
+            if used + cost > budget:
+                break
+            used += cost
+            start -= 1
+        # Never open the window on an assistant reply without its question
+        if 0 < start < len(history) and history[start].get("role") == "assistant":
+            start += 1
+        return start
+
+    def _fold(self, history, start, state):
+        upto = state.get("upto", 0)
+        if upto > len(history):
+            # History was replaced (e.g. new session); rebuild from scratch
+            upto = state["upto"] = 0
+            state["lines"] = []
+            state["summary"] = ""
+        if start <= upto:
+            # Already summarised up to here; don't repeat those turns verbatim
+            return upto
+        lines = state.setdefault("lines", [])
+        lines.extend(_summary_line(m) for m in history[upto:start])
+        total = sum(estimate_tokens(line) for line in lines)
+        while lines and total > self.summary_tokens:
+            total -= estimate_tokens(lines.pop(0))
+        state["upto"] = start
+        state["summary"] = "\n".join(lines)
+        return start
+
+    def compact(self, chat_history: list, state: dict) -> list:
+        """
+        Returns `chat_history` without the turns already folded into the
+        summary, first folding any that would not fit in the next window.
+        Keeps a stored session's history, and the cost of saving it, bounded
+        by the token budget rather than by the length of the conversation.
+        """
+        history = chat_history or []
+        start = self._window_start(history, self.budget_tokens - self.summary_tokens)
+        upto = self._fold(history, start, state)
+        if upto == 0:
+            return history
+        state["upto"] = 0
+        return history[upto:]
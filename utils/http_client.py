@@ -0,0 +1,60 @@
+import os
+import threading
+
+# requests and httpx are imported on first use, keeping them off the startup path
+# Shared connection pools for outbound calls (LLM, price API). Reusing them keeps
+# TCP/TLS connections alive across requests instead of reconnecting every call.
+_session = None
+_session_lock = threading.Lock()
+_async_client = None
+
+
+def _pool_size():
+    return int(os.getenv("HTTP_POOL_SIZE", "100"))
+
+
+def get_session() -> "requests.Session":
+    """
+    Returns the process-wide requests.Session used by the sync code paths.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                import requests.adapters
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=_pool_size())
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def get_async_client() -> "httpx.AsyncClient":
+    """
+    Returns the process-wide httpx.AsyncClient used by the async code paths.
+    Must be called from the event loop that will use it.
+    """
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        import httpx
+        size = _pool_size()
+        _async_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=size, max_keepalive_connections=size),
+            timeout=httpx.Timeout(30.0, connect=10.0),
+        )
+    return _async_client
+
+
+async def close_http_clients():
+    """
+    Closes the shared pools. Called from the app's shutdown hook.
+    """
+    global _session, _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    if _session is not None:
+        _session.close()
+        _session = None
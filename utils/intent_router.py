@@ -0,0 +1,207 @@
+import string
+
+from utils.metrics import metrics
+
+INTENT_PRICE = "price"
+INTENT_PURCHASE = "purchase"
+INTENT_OFF_TOPIC = "off_topic"
+INTENT_LLM = "llm"  # anything that needs the model
+# INTENT_LLM messages split further for model routing (see llm_intent)
+INTENT_FAQ = "faq"        # how gold investing works
+INTENT_ADVICE = "advice"  # what the user should do
+
+# Messages are split into words with str.translate + split and classified with the
+# lookup tables below (all built once at import): most words map straight to
+# a feature through a set intersection, and only the few context-dependent
+# words are located and checked against their neighbours. There is no
+# per-pattern rescanning and no `.*` backtracking, so cost is linear in
+# message length.
+# Punctuation becomes whitespace; apostrophes survive so contractions stay whole
+_PUNCTUATION = str.maketrans({c: " " for c in string.punctuation.replace("'", "")} | {"’": "'"})
+
+_WORD_FEATURES = {}
+for _feature, _words in {
+    "gold": "gold bullion",
+    "price": "price prices rate rates",
+    "value": "cost costs value",
+    "now": "current currently live latest",
+    "today": "today today's todays",
+    "karat": "24k 22k 18k 24kt 22kt 18kt",
+    "neg": "not don't dont never no",
+    "domain": (
+        "invest investing investment investments investor sgb sgbs etf etfs bond bonds sip sips "
+        "portfolio return returns tax taxes taxed taxation gram grams rupee rupees inflation hedge "
+        "saving savings buy buying purchase purchasing sell selling jewellery jewelry coin coins ₹"
+    ),
+    "off_topic": (
+        "weather movie movies film films cricket football recipe recipes cook cooking joke jokes "
+        "song songs poem poems lyrics python javascript programming code homework politics political "
+        "election elections celebrity celebrities bitcoin crypto cryptocurrency translate horoscope"
+    ),
+}.items():
+    for _word in _words.split():
+        _WORD_FEATURES[_word] = _feature
+
+_GRAM_WORDS = frozenset({"gram", "grams", "gm", "g"})
+_KARAT_WORDS = frozenset({"k", "kt", "karat", "carat"})
+_KARAT_NUMBERS = frozenset({"24", "22", "18"})
+_BUY_WORDS = frozenset({"buy", "purchase"})
+_SUBJECTS = frozenset({"i", "we", "i'd", "we'd", "i'll", "we'll"})
+# Words that, directly before "to buy", make it a statement of intent
+_INTENT_VERBS = frozenset({"want", "wanna", "like", "wish", "intend", "plan", "need", "going"})
+_CURRENCY_WORDS = frozenset({"rs", "inr", "₹", "rupees"})
+_GOLD_WORDS = frozenset({"gold", "bullion"})
+# Words that may stand between a buy verb and what is bought
+_OBJECT_FILLERS = frozenset({"some", "more", "digital", "physical", "pure", "the", "a", "an", "worth"})
+# A message with any of these is a question for the LLM, never a purchase
+_QUESTION_WORDS = frozenset({"or", "which", "should"})
+# Any of these makes an LLM question one of advice rather than a general FAQ
+_ADVICE_WORDS = frozenset({
+    "should", "shall", "recommend", "recommended", "advice", "advise", "suggest", "better", "best",
+    "worth", "my", "our", "me", "portfolio", "allocate", "allocation", "strategy",
+})
+# Words that need a look at their neighbours; every other word maps straight to its feature
+_CONTEXT_WORDS = _KARAT_WORDS | _BUY_WORDS | {"per", "interest", "rate", "rates", "capital", "want", "invest"}
+_PLAIN_WORDS = frozenset(_WORD_FEATURES) - _CONTEXT_WORDS
+
+
+def _is_amount(word: str) -> bool:
+    return word[0].isdigit() or word[0] == "₹" or word in _CURRENCY_WORDS
+
+
+def _buys_gold(words, i, window=6) -> bool:
+    # Whether the object starting at words[i] is gold ("gold", "some digital gold") or
+    # an amount in grams or rupees ("2 grams", "₹500 of gold"), but not "gold price",
+    # "bitcoin", "2 grams of silver" or "10 reasons"
+    unit = False
+    for j in range(i, min(len(words), i + window)):
+        word = words[j]
+        if word in _GOLD_WORDS:
+            return j + 1 == len(words) or _WORD_FEATURES.get(words[j + 1]) not in ("price", "value")
+        suffix = word.lstrip("0123456789.₹")
+        if word[0] == "₹" or (suffix and (suffix in _GRAM_WORDS or suffix in _CURRENCY_WORDS)):
+            unit = True  # "₹500", "5g", "rupees"
+        elif word in ("of", "in"):
+            unit = False  # "<amount> of/in X" is an amount of X
+        elif not (word[0].isdigit() or word in _OBJECT_FILLERS):
+            break
+    return unit
+
+
+def _has_subject(words, i, window=4):
+    return any(w in _SUBJECTS for w in words[max(0, i - window):i])
+
+
+def _intent_to(words, i) -> bool:
+    # "<subject> ... want/like/plan to" ending just before words[i]
+    return i >= 2 and words[i - 1] == "to" and words[i - 2] in _INTENT_VERBS and _has_subject(words, i - 2)
+
+
+def _buy_intent_at(words, i) -> bool:
+    # words[i] is "buy", "purchase", "want" or "invest"; looks only at its neighbours
+    # and the object that follows
+    word = words[i]
+    nxt = words[i + 1] if i + 1 < len(words) else ""
+    if not nxt:
+        return False
+    if word in _BUY_WORDS:
+        if i == 0 or (i == 1 and words[0] == "please"):
+            return _buys_gold(words, i + 1)
+        prev = words[i - 1]
+        if prev in ("will", "shall", "i'll", "we'll") or (prev == "me" and i >= 2 and words[i - 2] == "let"):
+            return _buys_gold(words, i + 1)
+        return _intent_to(words, i) and _buys_gold(words, i + 1)
+    if word == "want":
+        return i > 0 and words[i - 1] in _SUBJECTS and _buys_gold(words, i + 1)
+    # invest
+    return _is_amount(nxt) and _intent_to(words, i) and _buys_gold(words, i + 1)
+
+
+def _positions(words, word):
+    i = -1
+    while True:
+        try:
+            i = words.index(word, i + 1)
+        except ValueError:
+            return
+        yield i
+
+
+def _context_feature(words, i):
+    # Feature of a word whose meaning depends on its neighbours, or None
+    word = words[i]
+    last = len(words) - 1
+    if word == "per":
+        return "per_gram" if i < last and words[i + 1] in _GRAM_WORDS else None
+    if word in _KARAT_WORDS:
+        return "karat" if i > 0 and words[i - 1] in _KARAT_NUMBERS else None
+    if word == "interest":
+        return "domain" if i < last and words[i + 1] in ("rate", "rates") else None
+    if word in ("rate", "rates"):
+        return None if i > 0 and words[i - 1] == "interest" else "price"  # an interest rate is not a gold rate
+    if word == "capital":
+        return "off_topic" if i < last and words[i + 1] == "of" else None
+    return "buy" if _buy_intent_at(words, i) else None
+
+
+def _features(text: str) -> set:
+    padded = f" {text.lower().translate(_PUNCTUATION)} "
+    words = padded.replace(" '", " ").replace("' ", " ").split()
+    present = set(words)
+    features = {_WORD_FEATURES[word] for word in present & _PLAIN_WORDS}
+    if "?" in text or present & _QUESTION_WORDS:
+        features.add("question")
+    for word in present & _CONTEXT_WORDS:
+        if word in _WORD_FEATURES and word not in ("rate", "rates"):
+            features.add(_WORD_FEATURES[word])
+        for i in _positions(words, word):
+            feature = _context_feature(words, i)
+            if feature:
+                features.add(feature)
+    return features
+
+
+def _is_price(features: set) -> bool:
+    if "gold" in features:
+        return bool(features & {"price", "value", "per_gram", "today"})
+    if "price" in features:
+        return bool(features & {"per_gram", "now", "today", "karat"})
+    return False
+
+
+@metrics.timed("intent.classify")
+def classify_intent(text: str) -> str:
+    """
+    Routes a user message without calling the LLM. Returns one of:
+      INTENT_PURCHASE   explicit, un-negated wish to buy gold or an amount of
+                        it ("I want to buy gold", "buy 2 grams"), not a question
+      INTENT_PRICE      asks for the current gold rate
+      INTENT_OFF_TOPIC  clearly unrelated and mentions nothing gold/investment
+      INTENT_LLM        everything else
+    """
+    features = _features(text)
+    if "buy" in features and not features & {"neg", "question"}:
+        return INTENT_PURCHASE
+    if _is_price(features):
+        return INTENT_PRICE
+    if "off_topic" in features and not features & {"gold", "price", "value", "per_gram", "karat", "domain"}:
+        return INTENT_OFF_TOPIC
+    return INTENT_LLM
+
+
+def llm_intent(text: str) -> str:
+    """
+    Finer intent of a message classify_intent sent to the LLM, for pinning
+    models per intent (LLM_INTENT_MODELS): INTENT_ADVICE when it asks what
+    the user should do ("Should I buy SGBs or ETFs?", "how much of my
+    savings in gold?"), otherwise INTENT_FAQ ("How do gold ETFs work?").
+    """
+    words = text.lower().translate(_PUNCTUATION).split()
+    return INTENT_ADVICE if _ADVICE_WORDS.intersection(words) else INTENT_FAQ
+
+
+def is_gold_rate_query(text: str) -> bool:
+    """
+    Returns True if text is a gold rate/gold price query.
+    """
+    return _is_price(_features(text))
@@ -0,0 +1,277 @@
+import contextvars
+import functools
+import inspect
+import math
+import os
+import threading
+import time
+
+# Histogram buckets grow by 2**(1/4) (~19%) from 10 µs to ~40 s, so quantile
+# estimates are within ~10% whatever the latency range, in fixed memory.
+_MIN_SECONDS = 1e-5
+_STEPS_PER_DOUBLING = 4
+_BUCKETS = 88
+_BOUNDS = [_MIN_SECONDS * 2 ** (i / _STEPS_PER_DOUBLING) for i in range(_BUCKETS)]
+# Only every doubling is exported to Prometheus; they are exact bucket edges
+_EXPORTED = list(range(0, _BUCKETS, _STEPS_PER_DOUBLING))
+
+# Spans of the current request, for the Server-Timing header (None outside one)
+_request_spans = contextvars.ContextVar("request_spans", default=None)
+
+
+def _bucket(seconds: float) -> int:
+    if seconds <= _MIN_SECONDS:
+        return 0
+    return min(_BUCKETS, math.ceil(_STEPS_PER_DOUBLING * math.log2(seconds / _MIN_SECONDS) - 1e-9))
+
+
+class Histogram:
+    """
+    Latency histogram over fixed log-spaced buckets (the last one is +Inf).
+    """
+    __slots__ = ("counts", "count", "sum", "min", "max", "errors")
+
+    def __init__(self):
+        self.counts = [0] * (_BUCKETS + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.errors = 0
+
+    def observe(self, seconds: float, error=False):
+        # Caller holds the registry lock
+        self.counts[_bucket(seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        if error:
+            self.errors += 1
+
+    def quantile(self, q: float):
+        """
+        Estimated `q` quantile in seconds (interpolated within its bucket), or None if empty.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = _BOUNDS[i - 1] if i else 0.0
+                upper = _BOUNDS[i] if i < _BUCKETS else self.max
+                estimate = lower + (upper - lower) * (rank - seen) / n
+                return min(max(estimate, self.min), self.max)
+            seen += n
+        return self.max
+
+
+class _Span:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # A generator closed early by its consumer is not an error
+        error = exc_type is not None and exc_type is not GeneratorExit
+        self.metrics.observe(self.name, time.perf_counter() - self.start, error)
+        return False
+
+
+class Metrics:
+    """
+    Process-wide latency registry. Each named span (a node, an upstream call,
+    a DB call) gets its own Histogram; `render_prometheus` exposes them all and
+    `snapshot` reports p50/p95/p99. Inside a request wrapped by MetricsMiddleware
+    span durations are also collected for the Server-Timing header.
+    """
+
+    def __init__(self, enabled=True, server_timing=False):
+        self.enabled = enabled
+        self.server_timing = server_timing
+        self._lock = threading.Lock()
+        self._spans = {}
+        self._requests = {}
+        self._responses = {}
+
+    def observe(self, name: str, seconds: float, error=False):
+        """
+        Records one duration for span `name`.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._spans.get(name)
+            if histogram is None:
+                histogram = self._spans[name] = Histogram()
+            histogram.observe(seconds, error)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((name, seconds))
+
+    def span(self, name: str) -> _Span:
+        """
+        Context manager timing the enclosed block as span `name`; an exception
+        counts as an error.
+        """
+        return _Span(self, name)
+
+    def timed(self, name: str):
+        """
+        Decorator timing every call of a sync or async function as span `name`.
+        """
+        def decorate(func):
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with _Span(self, name):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with _Span(self, name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def observe_request(self, endpoint: str, status: int, seconds: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._requests.get(endpoint)
+            if histogram is None:
+                histogram = self._requests[endpoint] = Histogram()
+            histogram.observe(seconds, status >= 500)
+            key = (endpoint, status)
+            self._responses[key] = self._responses.get(key, 0) + 1
+
+    def snapshot(self):
+        """
+        {"spans": {name: stats}, "requests": {endpoint: stats}} with count,
+        errors and mean/p50/p95/p99/max in milliseconds.
+        """
+        def stats(h):
+            ms = lambda s: None if s is None else round(s * 1000, 3)
+            return {
+                "count": h.count,
+                "errors": h.errors,
+                "mean_ms": ms(h.sum / h.count if h.count else None),
+                "p50_ms": ms(h.quantile(0.5)),
+                "p95_ms": ms(h.quantile(0.95)),
+                "p99_ms": ms(h.quantile(0.99)),
+                "max_ms": ms(h.max if h.count else None),
+            }
+        with self._lock:
+            return {
+                "spans": {name: stats(h) for name, h in sorted(self._spans.items())},
+                "requests": {name: stats(h) for name, h in sorted(self._requests.items())},
+            }
+
+    def render_prometheus(self, prefix="gold_agent") -> str:
+        """
+        All histograms and counters in the Prometheus text exposition format.
+        """
+        lines = []
+
+        def histogram(family, label, series):
+            lines.append(f"# TYPE {family} histogram")
+            for value, h in series:
+                cumulative = 0
+                exported = iter(_EXPORTED)
+                edge = next(exported)
+                for i, n in enumerate(h.counts[:_BUCKETS]):
+                    cumulative += n
+                    if i == edge:
+                        lines.append(f'{family}_bucket{{{label}="{value}",le="{_BOUNDS[i]:.6g}"}} {cumulative}')
+                        edge = next(exported, None)
+                lines.append(f'{family}_bucket{{{label}="{value}",le="+Inf"}} {h.count}')
+                lines.append(f'{family}_sum{{{label}="{value}"}} {h.sum:.9g}')
+                lines.append(f'{family}_count{{{label}="{value}"}} {h.count}')
+
+        with self._lock:
+            spans = sorted(self._spans.items())
+            requests = sorted(self._requests.items())
+            responses = sorted(self._responses.items())
+            histogram(f"{prefix}_span_duration_seconds", "span", spans)
+            lines.append(f"# TYPE {prefix}_span_errors_total counter")
+            for name, h in spans:
+                lines.append(f'{prefix}_span_errors_total{{span="{name}"}} {h.errors}')
+            histogram(f"{prefix}_http_request_duration_seconds", "endpoint", requests)
+            lines.append(f"# TYPE {prefix}_http_responses_total counter")
+            for (endpoint, status), n in responses:
+                lines.append(f'{prefix}_http_responses_total{{endpoint="{endpoint}",status="{status}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._requests.clear()
+            self._responses.clear()
+
+
+def server_timing(spans, total: float) -> str:
+    """
+    Server-Timing header value: per span name, the summed duration in ms.
+    """
+    totals = {}
+    for name, seconds in spans:
+        totals[name] = totals.get(name, 0.0) + seconds
+    parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in totals.items()]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request per endpoint. With
+    `metrics.server_timing` on, responses carry a Server-Timing header with the
+    spans recorded until the response started (so not the body of a stream).
+    """
+
+    def __init__(self, app, registry=None):
+        self.app = app
+        self.metrics = registry or metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.metrics.enabled:
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        spans = []
+        token = _request_spans.set(spans)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.metrics.server_timing:
+                    header = server_timing(spans, time.perf_counter() - start)
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", header.encode("latin-1"))
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_spans.reset(token)
+            endpoint = scope.get("endpoint")
+            name = getattr(endpoint, "__name__", None) or "unmatched"
+            self.metrics.observe_request(name, status, time.perf_counter() - start)
+
+
+metrics = Metrics(
+    enabled=os.getenv("METRICS_ENABLED", "1") != "0",
+    server_timing=os.getenv("METRICS_SERVER_TIMING", "0") == "1",
+)
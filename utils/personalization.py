@@ -0,0 +1,24 @@
+import re
+
+# Stands in for the user's name in text shared between users
+NAME_PLACEHOLDER = "{user_name}"
+
+# Content that is specific to one user and must never be shared
+_PERSONAL_RE = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+|\b[6-9]\d{9}\b")
+
+
+def template_name(text: str, user_name: str):
+    """
+    Replaces whole-word occurrences of `user_name` in `text` with NAME_PLACEHOLDER.
+    Returns None when the text can't be safely shared: it holds contact details,
+    already contains the placeholder, or the name is too short to template
+    reliably.
+    """
+    name = (user_name or "").strip()
+    if len(name) < 3 or NAME_PLACEHOLDER in text or _PERSONAL_RE.search(text):
+        return None
+    return re.sub(rf"\b{re.escape(name)}\b", NAME_PLACEHOLDER, text)
+
+
+def render_name(template: str, user_name: str) -> str:
+    return template.replace(NAME_PLACEHOLDER, user_name)
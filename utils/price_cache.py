@@ -0,0 +1,143 @@
+import threading
+import time
+
+
+class _Flight:
+    """
+    One in-progress upstream load that concurrent callers can wait on.
+    """
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class PriceCache:
+    """
+    In-process TTL cache for a single value with stale-while-revalidate.
+
+    - Within `ttl` seconds of the last load the cached value is returned as is.
+    - Within a further `stale_ttl` seconds the stale value is returned immediately
+      and one background refresh is started.
+    - Beyond that (or when empty) callers block on a load. Only one upstream load
+      runs at a time; concurrent callers wait for its result (single-flight).
+
+    Values rejected by `cacheable` (e.g. a static fallback price) are returned to
+    the caller but never stored.
+    """
+
+    def __init__(self, ttl=60.0, stale_ttl=300.0, cacheable=None, clock=time.monotonic):
+        self.ttl = float(ttl)
+        self.stale_ttl = float(stale_ttl)
+        self.cacheable = cacheable or (lambda value: True)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._value = None
+        self._loaded_at = None
+        self._flight = None
+        self._counters = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "refreshes": 0,
+            "errors": 0,
+        }
+
+    def get(self, loader):
+        """
+        Returns the cached value, loading it with `loader()` when needed.
+        """
+        with self._lock:
+            found, value = self._lookup(loader)
+            if found:
+                return value
+            self._counters["misses"] += 1
+            flight = self._flight
+            leader = flight is None
+            if leader:
+                flight = self._flight = _Flight()
+            else:
+                self._counters["coalesced"] += 1
+
+        if leader:
+            self._load(loader, flight)
+        else:
+            flight.event.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def try_get(self, loader):
+        """
+        Non-blocking lookup: returns (True, value) for a fresh or stale-servable
+        value (starting a background refresh if stale), else (False, None).
+        Lets async callers skip a thread hop on the common hit path.
+        """
+        with self._lock:
+            return self._lookup(loader)
+
+    def _lookup(self, loader):
+        # Caller holds self._lock
+        age = None if self._loaded_at is None else self.clock() - self._loaded_at
+        if age is not None and age < self.ttl:
+            self._counters["hits"] += 1
+            return True, self._value
+        if age is not None and age < self.ttl + self.stale_ttl:
+            self._counters["stale_hits"] += 1
+            if self._flight is None:
+                self._flight = _Flight()
+                threading.Thread(
+                    target=self._load, args=(loader, self._flight), daemon=True
+                ).start()
+            return True, self._value
+        return False, None
+
+    def _load(self, loader, flight):
+        try:
+            value = loader()
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                self._counters["errors"] += 1
+        else:
+            flight.value = value
+            self.set(value)
+        finally:
+            with self._lock:
+                if self._flight is flight:
+                    self._flight = None
+            flight.event.set()
+
+    def set(self, value):
+        """
+        Stores `value` as freshly loaded (ignored if it is not cacheable).
+        """
+        if not self.cacheable(value):
+            return
+        with self._lock:
+            self._value = value
+            self._loaded_at = self.clock()
+            self._counters["refreshes"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._value = None
+            self._loaded_at = None
+
+    def stats(self):
+        """
+        Returns hit/miss/staleness counters and the age of the cached value.
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+            stats["hit_ratio"] = round((stats["hits"] + stats["stale_hits"]) / lookups, 4) if lookups else 0.0
+            stats["age_seconds"] = (
+                None if self._loaded_at is None else round(self.clock() - self._loaded_at, 3)
+            )
+            stats["ttl"] = self.ttl
+            stats["stale_ttl"] = self.stale_ttl
+            return stats
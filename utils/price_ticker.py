@@ -0,0 +1,140 @@
+import asyncio
+import os
+import threading
+import time
+from array import array
+
+from utils.gold_price_api import fetch_gold_price_inr, is_live, price_cache
+from utils.shared_state import shared_price, worker_leader
+
+
+class PriceRingBuffer:
+    """
+    Fixed-size ring buffer of (timestamp, price_per_gram) ticks backed by two
+    preallocated float arrays. Appends overwrite the oldest tick once full;
+    reading the latest tick is O(1).
+    """
+
+    def __init__(self, capacity=1440):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self._timestamps = array("d", bytes(8 * capacity))
+        self._prices = array("d", bytes(8 * capacity))
+        self._next = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def append(self, price_per_gram, timestamp=None):
+        with self._lock:
+            self._timestamps[self._next] = time.time() if timestamp is None else timestamp
+            self._prices[self._next] = price_per_gram
+            self._next = (self._next + 1) % self.capacity
+            if self._size < self.capacity:
+                self._size += 1
+
+    def latest(self):
+        """
+        Returns the newest tick as (timestamp, price_per_gram), or None if empty.
+        """
+        with self._lock:
+            if not self._size:
+                return None
+            i = (self._next - 1) % self.capacity
+            return self._timestamps[i], self._prices[i]
+
+    def recent(self, limit=None):
+        """
+        Returns up to `limit` ticks, newest first.
+        """
+        with self._lock:
+            n = self._size if limit is None else max(0, min(limit, self._size))
+            ticks = []
+            i = self._next
+            for _ in range(n):
+                i = (i - 1) % self.capacity
+                ticks.append((self._timestamps[i], self._prices[i]))
+            return ticks
+
+
+class PriceTicker:
+    """
+    Background poller that refreshes the gold price every `interval` seconds,
+    records each tick in a PriceRingBuffer and primes the shared price cache so
+    request handlers never wait on the upstream API.
+
+    With a `leader` (a utils.shared_state.WorkerLeader) only the elected
+    worker polls and publishes each tick to `shared`; the others pick the
+    published ticks up from there instead of calling the API themselves.
+    """
+
+    def __init__(self, buffer, interval=30.0, fetch=fetch_gold_price_inr, cache=price_cache, shared=None,
+                 leader=None):
+        self.buffer = buffer
+        self.interval = interval
+        self.fetch = fetch
+        self.cache = cache
+        self.shared = shared
+        self.leader = leader
+        self._last_published = 0.0
+        self._task = None
+
+    async def poll_once(self):
+        info = await asyncio.to_thread(self.fetch)
+        if not is_live(info):
+            return None
+        now = time.time()
+        self.buffer.append(info["price_per_gram"], now)
+        self.cache.set(info)
+        if self.shared is not None:
+            self.shared.publish(info, now)
+            self._last_published = now
+        return info
+
+    def follow_once(self):
+        """
+        Records the leader's latest tick, if it is new. Returns its info or None.
+        """
+        found = self.shared.read()
+        if found is None or found[1] <= self._last_published:
+            return None
+        info, self._last_published = found
+        self.buffer.append(info["price_per_gram"], self._last_published)
+        self.cache.set(info)
+        return info
+
+    async def run(self):
+        while True:
+            try:
+                if self.leader is None or self.shared is None or self.leader.is_leader():
+                    await self.poll_once()
+                else:
+                    self.follow_once()
+            except Exception as e:
+                print(f"[Warning] Gold price ticker error: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """
+        Starts polling on the running event loop. No-op if interval <= 0.
+        """
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+price_history = PriceRingBuffer(capacity=int(os.getenv("GOLDPRICE_HISTORY_SIZE", "1440")))
+price_ticker = PriceTicker(price_history, interval=float(os.getenv("GOLDPRICE_POLL_INTERVAL", "30")),
+                           shared=shared_price, leader=worker_leader)
@@ -0,0 +1,303 @@
+import math
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from array import array
+
+from utils.shared_state import multi_worker
+
+_FREE = 0  # nonce of an unused slot; issued nonces are never 0
+_NONCE_HEX = 32
+_LOW_64 = (1 << 64) - 1
+
+
+def _new_quote_id(slot=0):
+    """
+    Returns (quote ID, nonce): "q", `slot` in hex, then a random 128-bit
+    nonce in 32 hex digits. Shared by both stores so IDs are equally hard to
+    guess whichever one issued them.
+    """
+    nonce = secrets.randbits(128) or 1
+    return f"q{slot:x}{nonce:0{_NONCE_HEX}x}", nonce
+
+
+class QuoteStore:
+    """
+    Server-side price quotes: `issue` locks a price for `ttl` seconds and
+    returns a short quote ID, `get` looks it up in O(1) until it expires.
+
+    Quotes live in slots of parallel typed arrays (about 60 bytes each plus
+    the user name) that grow up to `capacity` and are reused through a free
+    list. A quote ID is the slot number plus a random 128-bit nonce, so a
+    reused slot never answers for an older ID, IDs can't be guessed and two
+    quotes never share an ID (it is the purchase's idempotency key).
+    Expired slots are reclaimed by a timing wheel of `resolution`-second
+    buckets, each a doubly linked list threaded through the slot arrays, as
+    time moves on; with every slot taken the quote closest to expiry is
+    evicted.
+    """
+
+    def __init__(self, capacity=1_000_000, ttl=600.0, resolution=1.0, clock=time.monotonic):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.ttl = ttl
+        self.resolution = resolution
+        self.clock = clock
+        self._lock = threading.Lock()
+        # Per-slot columns
+        self._price = array("d")
+        self._grams = array("d")
+        self._rupees = array("d")
+        self._expires = array("d")
+        self._nonce_hi = array("Q")  # 128-bit nonce as two 64-bit halves
+        self._nonce_lo = array("Q")
+        self._prev = array("i")
+        self._next = array("i")
+        self._bucket = array("i")
+        self._users = []
+        self._free = array("i")
+        # Timing wheel: one bucket per tick of the longest TTL
+        self._wheel_size = int(math.ceil(ttl / resolution)) + 2
+        self._heads = array("i", [-1]) * self._wheel_size
+        self._tick = int(clock() // resolution)
+        self._live = 0
+        self._counters = {"issued": 0, "expired": 0, "evicted": 0, "misses": 0}
+
+    def __len__(self):
+        return self._live
+
+    def issue(self, user_name: str, grams: float, rupees: float, price_per_gram: float, ttl=None) -> str:
+        """
+        Stores a quote valid for `ttl` seconds (at most the store's TTL) and
+        returns its ID.
+        """
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            now = self.clock()
+            self._advance(now)
+            slot = self._take_slot()
+            quote_id, nonce = _new_quote_id(slot)
+            expires = now + ttl
+            self._price[slot] = price_per_gram
+            self._grams[slot] = grams
+            self._rupees[slot] = rupees
+            self._expires[slot] = expires
+            self._nonce_hi[slot], self._nonce_lo[slot] = nonce >> 64, nonce & _LOW_64
+            self._users[slot] = user_name
+            self._link(slot, int(math.ceil(expires / self.resolution)) % self._wheel_size)
+            self._live += 1
+            self._counters["issued"] += 1
+        return quote_id
+
+    def get(self, quote_id: str):
+        """
+        Returns {"quote_id", "user_name", "grams", "rupees", "price_per_gram",
+        "expires_in"} for a live quote, or None if it is unknown or expired.
+        """
+        with self._lock:
+            now = self.clock()
+            self._advance(now)
+            slot = self._find(quote_id, now)
+            if slot is None:
+                self._counters["misses"] += 1
+                return None
+            return {
+                "quote_id": quote_id,
+                "user_name": self._users[slot],
+                "grams": self._grams[slot],
+                "rupees": self._rupees[slot],
+                "price_per_gram": self._price[slot],
+                "expires_in": self._expires[slot] - now,
+            }
+
+    def discard(self, quote_id: str) -> bool:
+        """
+        Drops a quote once it has been used. Returns False if it was not live.
+        """
+        with self._lock:
+            slot = self._find(quote_id, self.clock())
+            if slot is None:
+                return False
+            self._release(slot)
+            return True
+
+    def clear(self):
+        with self._lock:
+            for head in range(self._wheel_size):
+                while self._heads[head] != -1:
+                    self._release(self._heads[head])
+
+    def _find(self, quote_id, now):
+        # Caller holds self._lock
+        if not isinstance(quote_id, str) or len(quote_id) < _NONCE_HEX + 2 or quote_id[0] != "q":
+            return None
+        try:
+            slot, nonce = int(quote_id[1:-_NONCE_HEX], 16), int(quote_id[-_NONCE_HEX:], 16)
+        except ValueError:
+            return None
+        if slot >= len(self._nonce_hi) or nonce == _FREE:
+            return None
+        if self._nonce_hi[slot] != nonce >> 64 or self._nonce_lo[slot] != nonce & _LOW_64:
+            return None
+        if self._expires[slot] <= now:
+            return None
+        return slot
+
+    def _take_slot(self):
+        if self._free:
+            return self._free.pop()
+        if len(self._nonce_hi) < self.capacity:
+            for column in (self._price, self._grams, self._rupees, self._expires):
+                column.append(0.0)
+            for column in (self._nonce_hi, self._nonce_lo, self._prev, self._next, self._bucket):
+                column.append(0)
+            self._users.append(None)
+            return len(self._nonce_hi) - 1
+        # Full: evict the quote that would expire first
+        for step in range(1, self._wheel_size + 1):
+            slot = self._heads[(self._tick + step) % self._wheel_size]
+            if slot != -1:
+                self._release(slot)
+                self._counters["evicted"] += 1
+                return self._free.pop()
+        raise RuntimeError("quote store is full")  # unreachable: every live quote sits in the wheel
+
+    def _link(self, slot, bucket):
+        head = self._heads[bucket]
+        self._prev[slot] = -1
+        self._next[slot] = head
+        self._bucket[slot] = bucket
+        if head != -1:
+            self._prev[head] = slot
+        self._heads[bucket] = slot
+
+    def _release(self, slot):
+        prev, nxt = self._prev[slot], self._next[slot]
+        if prev == -1:
+            self._heads[self._bucket[slot]] = nxt
+        else:
+            self._next[prev] = nxt
+        if nxt != -1:
+            self._prev[nxt] = prev
+        self._nonce_hi[slot] = self._nonce_lo[slot] = _FREE
+        self._users[slot] = None
+        self._free.append(slot)
+        self._live -= 1
+
+    def _advance(self, now):
+        # Empties every bucket whose tick has passed; all quotes in it have expired
+        target = int(now // self.resolution)
+        if target <= self._tick:
+            return
+        start = max(self._tick + 1, target - self._wheel_size + 1)
+        for tick in range(start, target + 1):
+            bucket = tick % self._wheel_size
+            slot = self._heads[bucket]
+            while slot != -1:
+                nxt = self._next[slot]
+                if self._expires[slot] <= now:
+                    self._release(slot)
+                    self._counters["expired"] += 1
+                slot = nxt
+        self._tick = target
+
+    def stats(self):
+        with self._lock:
+            self._advance(self.clock())
+            return {
+                "live": self._live,
+                "slots": len(self._nonce_hi),
+                "capacity": self.capacity,
+                "ttl": self.ttl,
+                "bytes": sum(c.itemsize * len(c) for c in (
+                    self._price, self._grams, self._rupees, self._expires,
+                    self._nonce_hi, self._nonce_lo, self._prev, self._next, self._bucket)) + 8 * len(self._users),
+                **self._counters,
+            }
+
+
+class SQLiteQuoteStore:
+    """
+    QuoteStore with the same interface over a local SQLite file (WAL mode),
+    for worker processes that must confirm each other's quotes. IDs carry
+    the same 128-bit random nonce. Expired rows are deleted as new quotes
+    are issued.
+    """
+
+    def __init__(self, path="quotes.db", ttl=600.0, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._counters = {"issued": 0, "misses": 0}
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS quotes (quote_id TEXT PRIMARY KEY, user_name TEXT NOT NULL, "
+            "grams REAL NOT NULL, rupees REAL NOT NULL, price_per_gram REAL NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS quotes_expiry ON quotes (expires_at)")
+        self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM quotes WHERE expires_at > ?", (self.clock(),)).fetchone()[0]
+
+    def issue(self, user_name: str, grams: float, rupees: float, price_per_gram: float, ttl=None) -> str:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        quote_id, _ = _new_quote_id()
+        now = self.clock()
+        with self._lock:
+            self._conn.execute("DELETE FROM quotes WHERE expires_at <= ?", (now,))
+            self._conn.execute("INSERT INTO quotes VALUES (?, ?, ?, ?, ?, ?)",
+                               (quote_id, user_name, grams, rupees, price_per_gram, now + ttl))
+            self._conn.commit()
+            self._counters["issued"] += 1
+        return quote_id
+
+    def get(self, quote_id: str):
+        now = self.clock()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT user_name, grams, rupees, price_per_gram, expires_at FROM quotes "
+                "WHERE quote_id = ? AND expires_at > ?", (quote_id, now)
+            ).fetchone()
+            if row is None:
+                self._counters["misses"] += 1
+                return None
+        user_name, grams, rupees, price_per_gram, expires_at = row
+        return {"quote_id": quote_id, "user_name": user_name, "grams": grams, "rupees": rupees,
+                "price_per_gram": price_per_gram, "expires_in": expires_at - now}
+
+    def discard(self, quote_id: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM quotes WHERE quote_id = ? AND expires_at > ?",
+                                        (quote_id, self.clock()))
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM quotes")
+            self._conn.commit()
+
+    def stats(self):
+        return {"backend": "sqlite", "path": self.path, "live": len(self), "ttl": self.ttl, **self._counters}
+
+
+def create_quote_store():
+    """
+    Builds the quote store selected by QUOTE_STORE (memory | sqlite). The
+    default is memory, or sqlite when running several workers.
+    """
+    ttl = float(os.getenv("QUOTE_TTL", "600"))
+    if os.getenv("QUOTE_STORE", "sqlite" if multi_worker() else "memory").lower() == "sqlite":
+        return SQLiteQuoteStore(os.getenv("QUOTE_DB_PATH", "quotes.db"), ttl=ttl)
+    return QuoteStore(capacity=int(os.getenv("QUOTE_STORE_CAPACITY", "1000000")), ttl=ttl)
+
+
+quote_store = create_quote_store()
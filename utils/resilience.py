@@ -0,0 +1,359 @@
+import asyncio
+import contextvars
+import os
+import random
+import sys
+import threading
+import time
+
+# Absolute time.monotonic() by which the current request must finish (None: no deadline)
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class UpstreamUnavailable(RuntimeError):
+    """
+    An upstream call failed after its retries, or was not attempted because
+    the circuit is open. `retry_after` is a hint in seconds, if known.
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    pass
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+def remaining(default=None):
+    """
+    Seconds left until the current deadline, `default` if there is none.
+    Raises DeadlineExceeded once it has passed.
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return default
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded("request deadline exceeded")
+    return left
+
+
+class deadline:
+    """
+    Context manager bounding everything inside it, including worker threads
+    started with asyncio.to_thread, to `seconds`. Nested deadlines can only
+    shorten the enclosing one.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def __enter__(self):
+        at = time.monotonic() + self.seconds
+        current = _deadline.get()
+        self._token = _deadline.set(at if current is None else min(at, current))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _deadline.reset(self._token)
+        return False
+
+
+def is_retryable(exc) -> bool:
+    """
+    Timeouts, connection failures, 429 and 5xx responses are worth retrying;
+    other errors (bad requests, auth, parsing) are not.
+    """
+    # Only clients that are already loaded can have raised `exc`; importing
+    # them here would put them back on the startup path
+    requests, httpx = sys.modules.get("requests"), sys.modules.get("httpx")
+    transient, http_errors = (), ()
+    if requests is not None:
+        transient += (requests.Timeout, requests.ConnectionError)
+        http_errors += (requests.HTTPError,)
+    if httpx is not None:
+        transient += (httpx.TimeoutException, httpx.TransportError)
+        http_errors += (httpx.HTTPStatusError,)
+    if isinstance(exc, transient):
+        return True
+    response = getattr(exc, "response", None)
+    if isinstance(exc, http_errors) and response is not None:
+        return response.status_code == 429 or response.status_code >= 500
+    return False
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_timeout` seconds, then lets a single probe through (half-open):
+    its success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self.rejected = 0
+        self._probing = False
+
+    def allow(self):
+        """
+        Raises CircuitOpenError if a call may not go out now.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            wait = self.opened_at + self.reset_timeout - self.clock()
+            if self.state == OPEN and wait <= 0:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            self.rejected += 1
+        raise CircuitOpenError("circuit open", retry_after=max(wait, 0.0) or self.reset_timeout)
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.times_opened += 1
+                self.state = OPEN
+                self.opened_at = self.clock()
+
+    def release(self):
+        # A probe that ended without a verdict (e.g. a non-retryable error) frees the slot
+        with self._lock:
+            self._probing = False
+
+
+class Upstream:
+    """
+    Resilience policy for one outbound dependency: per-attempt timeouts capped
+    by the request deadline, up to `max_attempts` tries with full-jitter
+    exponential backoff for retryable errors, a CircuitBreaker, and (async
+    only) hedging: if an attempt has not answered after `hedge_after`
+    seconds a second identical one is started and the first to succeed wins.
+
+    Callables passed to `call`/`acall` take the attempt timeout in seconds.
+    """
+
+    def __init__(self, name, timeout=10.0, max_attempts=2, base_backoff=0.2, max_backoff=2.0,
+                 hedge_after=0.0, breaker=None):
+        self.name = name
+        self.timeout = timeout
+        self.max_attempts = max(1, max_attempts)
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker()
+        self._lock = threading.Lock()
+        self._counters = {"calls": 0, "attempts": 0, "retries": 0, "failures": 0, "hedges": 0, "hedge_wins": 0}
+        upstreams[name] = self
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._counters[key] += n
+
+    def attempt_timeout(self):
+        """
+        Timeout for the next attempt: the configured one, or less if the
+        request deadline is closer. Raises DeadlineExceeded if it has passed.
+        """
+        return min(self.timeout, remaining(self.timeout))
+
+    def _backoff(self, attempt):
+        delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+        left = remaining()
+        if left is not None and delay >= left:
+            return None  # no time left for another attempt
+        return delay
+
+    def _settle(self, exc):
+        if exc is None:
+            self.breaker.record_success()
+        elif is_retryable(exc) or isinstance(exc, DeadlineExceeded):
+            self.breaker.record_failure()
+        else:
+            self.breaker.release()
+
+    def _give_up(self, exc):
+        self._count("failures")
+        if not is_retryable(exc):
+            raise exc
+        raise UpstreamUnavailable(f"{self.name} unavailable: {exc}") from exc
+
+    def call(self, fn):
+        """
+        Runs `fn(timeout)` under this policy and returns its result.
+        """
+        self._count("calls")
+        for attempt in range(self.max_attempts):
+            timeout = self.attempt_timeout()
+            self.breaker.allow()
+            self._count("attempts")
+            try:
+                result = fn(timeout)
+            except Exception as e:
+                self._settle(e)
+                delay = self._backoff(attempt) if attempt + 1 < self.max_attempts and is_retryable(e) else None
+                if delay is None:
+                    self._give_up(e)
+                self._count("retries")
+                time.sleep(delay)
+            else:
+                self._settle(None)
+                return result
+
+    async def acall(self, fn):
+        """
+        Async variant of `call`; `fn(timeout)` returns an awaitable. Attempts
+        are hedged when `hedge_after` > 0.
+        """
+        self._count("calls")
+        for attempt in range(self.max_attempts):
+            timeout = self.attempt_timeout()
+            self.breaker.allow()
+            self._count("attempts")
+            try:
+                if self.hedge_after > 0:
+                    result = await self._hedged(fn, timeout)
+                else:
+                    result = await fn(timeout)
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                self._settle(e)
+                delay = self._backoff(attempt) if attempt + 1 < self.max_attempts and is_retryable(e) else None
+                if delay is None:
+                    self._give_up(e)
+                self._count("retries")
+                await asyncio.sleep(delay)
+            else:
+                self._settle(None)
+                return result
+
+    async def _hedged(self, fn, timeout):
+        tasks = [asyncio.ensure_future(fn(timeout))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if done:
+                return tasks[0].result()
+            self._count("hedges")
+            tasks.append(asyncio.ensure_future(fn(max(0.001, timeout - self.hedge_after))))
+            pending, error = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is tasks[1]:
+                            self._count("hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()  # no-op for finished ones
+
+    def guard(self):
+        """
+        Context manager for calls that can't be retried as a whole (streams):
+        checks the breaker on entry and reports the outcome on exit.
+        """
+        return _Guard(self)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        breaker = self.breaker
+        with breaker._lock:
+            stats.update(state=breaker.state, consecutive_failures=breaker.failures,
+                         times_opened=breaker.times_opened, rejected=breaker.rejected)
+        return stats
+
+
+class _Guard:
+    __slots__ = ("upstream",)
+
+    def __init__(self, upstream):
+        self.upstream = upstream
+
+    def __enter__(self):
+        self.upstream.breaker.allow()
+        self.upstream._count("calls")
+        self.upstream._count("attempts")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.upstream._settle(None)
+        elif not issubclass(exc_type, Exception):
+            # GeneratorExit / cancellation: the consumer stopped, not the upstream's fault
+            self.upstream.breaker.release()
+        else:
+            self.upstream._settle(exc)
+            self.upstream._give_up(exc)
+        return False
+
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware giving every HTTP request a deadline of `seconds`, which
+    Upstream calls made while handling it respect.
+    """
+
+    def __init__(self, app, seconds=None):
+        self.app = app
+        self.seconds = seconds if seconds is not None else float(os.getenv("REQUEST_DEADLINE", "25"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.seconds <= 0:
+            await self.app(scope, receive, send)
+            return
+        with deadline(self.seconds):
+            await self.app(scope, receive, send)
+
+
+# Every Upstream registers itself here for monitoring
+upstreams = {}
+
+
+def upstream_stats():
+    return {name: upstream.stats() for name, upstream in sorted(upstreams.items())}
+
+
+def render_prometheus(prefix="gold_agent") -> str:
+    """
+    Circuit state (0 closed, 1 half-open, 2 open) and call counters per upstream.
+    """
+    stats = upstream_stats()
+    lines = [f"# TYPE {prefix}_upstream_circuit_state gauge"]
+    lines += [f'{prefix}_upstream_circuit_state{{upstream="{name}"}} {_STATE_VALUES[s["state"]]}'
+              for name, s in stats.items()]
+    for counter in ("calls", "attempts", "retries", "failures", "hedges", "hedge_wins", "rejected", "times_opened"):
+        lines.append(f"# TYPE {prefix}_upstream_{counter}_total counter")
+        lines += [f'{prefix}_upstream_{counter}_total{{upstream="{name}"}} {s[counter]}' for name, s in stats.items()]
+    return "\n".join(lines) + "\n"
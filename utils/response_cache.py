@@ -0,0 +1,220 @@
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+_NON_WORD_RE = re.compile(r"[^\w₹]+")
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Canonical form of a user question for cache lookups: lowercase, punctuation
+    stripped, whitespace collapsed.
+    """
+    return " ".join(_NON_WORD_RE.sub(" ", text.lower()).split())
+
+
+def _numbers(text: str) -> list:
+    # "buy 2 grams" and "buy 5 grams" are near-identical as n-grams but not the same question
+    return sorted(_NUMBER_RE.findall(text))
+
+
+class NgramIndex:
+    """
+    Character n-gram TF-IDF index over cached questions for near-duplicate
+    lookups. N-grams are hashed into `dims` buckets, so every vector is a fixed
+    row in a preallocated (slots x dims) NumPy matrix; IDF comes from
+    incrementally maintained document frequencies.
+
+    Rows are updated in place. Each write stamps its slot with a new
+    `version`, so a search run outside the cache lock can be checked
+    afterwards, under the lock, with `unchanged(slot, version)`. Writes that
+    race a search can only skew it slightly or make it miss.
+    """
+
+    def __init__(self, slots, dims=1024, n=3):
+        import numpy as np
+        self.np = np
+        self.n = n
+        self.dims = dims
+        self.tf = np.zeros((slots, dims), dtype=np.float32)
+        self.df = np.zeros(dims, dtype=np.float32)
+        self.used = np.zeros(slots, dtype=bool)
+        self.changed = np.zeros(slots, dtype=np.int64)  # version of each slot's last write
+        self.version = 0
+
+    def _vector(self, text):
+        np = self.np
+        padded = f" {text} "
+        buckets = [zlib.crc32(padded[i:i + self.n].encode()) % self.dims
+                   for i in range(max(1, len(padded) - self.n + 1))]
+        vec = np.bincount(buckets, minlength=self.dims).astype(np.float32)
+        return np.log1p(vec, out=vec)
+
+    def _set(self, slot, vec, used):
+        self.version += 1
+        self.changed[slot] = self.version
+        self.df -= self.tf[slot] > 0
+        self.df += vec > 0
+        self.tf[slot] = vec
+        self.used[slot] = used
+
+    def add(self, slot, text):
+        self._set(slot, self._vector(text), True)
+
+    def remove(self, slot):
+        self._set(slot, self.np.zeros(self.dims, dtype=self.np.float32), False)
+
+    def unchanged(self, slot, version) -> bool:
+        """
+        Whether `slot` has not been written since `version` was read.
+        """
+        return int(self.changed[slot]) <= version
+
+    def nearest(self, text):
+        """
+        Returns (slot, cosine similarity) of the closest indexed text, or
+        (None, 0.0).
+        """
+        np = self.np
+        tf, df, used = self.tf, self.df, self.used
+        count = int(used.sum())
+        if not count:
+            return None, 0.0
+        idf = np.log((1 + count) / (1 + df)) + 1
+        query = self._vector(text) * idf
+        rows = tf * idf
+        norms = np.linalg.norm(rows, axis=1) * (np.linalg.norm(query) or 1.0)
+        scores = np.divide(rows @ query, norms, out=np.zeros(len(rows), dtype=np.float32), where=norms > 0)
+        slot = int(scores.argmax())
+        return (slot, float(scores[slot])) if used[slot] else (None, 0.0)
+
+
+class ResponseCache:
+    """
+    LRU + TTL cache of LLM answers keyed on (prompt version, normalised question).
+
+    Answers are stored name-templated (see utils.personalization), so one entry
+    serves every user. With `similarity` > 0 and NumPy available, a question
+    without an exact match is served from the most similar cached question
+    scoring at least `similarity` (cosine over character n-grams) that has
+    the same numbers in it. The similarity search runs outside the lock.
+    """
+
+    def __init__(self, max_entries=1000, ttl=3600.0, similarity=0.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.similarity = similarity
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> [answer, stored_at, slot, upstream_seconds]
+        self._slot_keys = {}
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        self._index = None  # built on the first store, so NumPy isn't imported at startup
+        self._index_unavailable = similarity <= 0
+        self._counters = {"hits": 0, "similar_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._seconds_saved = 0.0
+
+    def get(self, version: str, question: str):
+        """
+        Returns the cached (templated) answer for `question`, or None.
+        """
+        text = normalize_text(question)
+        key = (version, text)
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is not None:
+                self._counters["hits"] += 1
+                self._seconds_saved += entry[3]
+                return entry[0]
+            index = self._index
+            indexed = index.version if index is not None else None
+        if index is not None:
+            slot, score = index.nearest(text)
+            if slot is not None and score >= self.similarity:
+                with self._lock:
+                    entry = self._similar_entry(version, text, slot, index, indexed)
+        with self._lock:
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["similar_hits"] += 1
+            self._seconds_saved += entry[3]
+            return entry[0]
+
+    def _similar_entry(self, version, text, slot, index, indexed):
+        # Caller holds self._lock. The slot may have been rewritten during the search.
+        if not index.unchanged(slot, indexed):
+            return None
+        similar_key = self._slot_keys.get(slot)
+        if similar_key is None or similar_key[0] != version or _numbers(similar_key[1]) != _numbers(text):
+            return None
+        return self._live_entry(similar_key)
+
+    def put(self, version: str, question: str, answer: str, upstream_seconds: float = 0.0):
+        text = normalize_text(question)
+        if not text or self.max_entries <= 0:
+            return
+        key = (version, text)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while not self._free_slots:
+                self._remove(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+            slot = self._free_slots.pop()
+            self._entries[key] = [answer, self.clock(), slot, upstream_seconds]
+            self._slot_keys[slot] = key
+            if self._index is None and not self._index_unavailable:
+                try:
+                    self._index = NgramIndex(self.max_entries)
+                except ImportError:
+                    self._index_unavailable = True
+                    print("[Warning] NumPy not installed; response cache similarity matching disabled")
+            if self._index is not None:
+                self._index.add(slot, text)
+            self._counters["stores"] += 1
+
+    def _live_entry(self, key):
+        # Caller holds self._lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self.clock() - entry[1] > self.ttl:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        slot = entry[2]
+        del self._slot_keys[slot]
+        if self._index is not None:
+            self._index.remove(slot)
+        self._free_slots.append(slot)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            lookups = stats["hits"] + stats["similar_hits"] + stats["misses"]
+            stats["hit_ratio"] = round((stats["hits"] + stats["similar_hits"]) / lookups, 4) if lookups else 0.0
+            stats["latency_saved_seconds"] = round(self._seconds_saved, 3)
+            stats["entries"] = len(self._entries)
+            stats["similarity"] = 0.0 if self._index_unavailable else self.similarity
+            return stats
+
+
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "1000")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+    similarity=float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.9")),
+)
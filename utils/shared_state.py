@@ -0,0 +1,206 @@
+import asyncio
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # Windows: each process acts alone
+    fcntl = None
+
+# Worker processes of one deployment (uvicorn --workers, gunicorn -w; both
+# read WEB_CONCURRENCY) coordinate through small files in SHARED_STATE_DIR:
+# a lock file electing the worker that polls the price API and flushes the
+# purchase spool, and a memory-mapped slot holding the latest gold price.
+WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+SHARED_STATE_DIR = os.getenv("SHARED_STATE_DIR", "shared_state")
+
+
+def multi_worker() -> bool:
+    return WORKERS > 1
+
+
+class WorkerLeader:
+    """
+    Elects one process among those sharing `path`: the first to take an
+    exclusive flock on it leads until it exits, then the next caller of
+    `is_leader` takes over. Without fcntl every process leads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._lock = threading.Lock()
+
+    def is_leader(self) -> bool:
+        if fcntl is None or self._fd is not None:
+            return True
+        with self._lock:
+            if self._fd is not None:
+                return True
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return False
+            self._fd = fd
+            return True
+
+    def release(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)  # closing drops the flock
+                self._fd = None
+
+
+class KeyedFileLock:
+    """
+    Cross-process exclusive locks by key: each key hashes to one of `stripes`
+    byte-range locks (fcntl.lockf) on the file at `path`. Record locks belong
+    to the process, so keys of one process that share a stripe are counted
+    and the stripe is held until the last of them is released; coroutines of
+    one process still need their own per-key lock. Without fcntl this is a
+    no-op.
+    """
+
+    def __init__(self, path, stripes=65536):
+        self.path = path
+        self.stripes = stripes
+        self._fd = None
+        self._held = {}  # stripe -> holders in this process
+        self._lock = threading.Lock()
+
+    def _stripe(self, key: str) -> int:
+        return zlib.crc32(key.encode("utf-8")) % self.stripes
+
+    def _try_take(self, stripe) -> bool:
+        # Caller holds self._lock
+        held = self._held.get(stripe, 0)
+        if not held:
+            if self._fd is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, stripe)
+            except OSError:
+                return False
+        self._held[stripe] = held + 1
+        return True
+
+    async def acquire(self, key: str):
+        """
+        Waits, polling with backoff, until no other process holds the key's stripe.
+        """
+        if fcntl is None:
+            return
+        stripe, delay = self._stripe(key), 0.001
+        while True:
+            with self._lock:
+                if self._try_take(stripe):
+                    return
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+    def release(self, key: str):
+        if fcntl is None:
+            return
+        stripe = self._stripe(key)
+        with self._lock:
+            held = self._held.pop(stripe) - 1
+            if held:
+                self._held[stripe] = held
+            else:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe)
+
+
+class SharedPrice:
+    """
+    The latest gold price in a memory-mapped file shared by every worker on
+    the host. One writer at a time (flock); readers never block and retry on
+    a torn read, detected by a sequence number that is odd while a write is
+    in progress (a seqlock). Decoded values are reused until the sequence
+    changes, so a read costs a few microseconds.
+    """
+
+    _HEADER = struct.Struct("<QdH")  # sequence, published_at (Unix time), payload length
+    SIZE = 512
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._map = None
+        self._lock = threading.Lock()
+        self._cached = (0, None)  # (sequence, (info, published_at))
+
+    def _mapped(self):
+        if self._map is None:
+            with self._lock:
+                if self._map is None:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    f = open(self.path, "a+b")
+                    if os.fstat(f.fileno()).st_size < self.SIZE:
+                        f.truncate(self.SIZE)
+                    self._file = f
+                    self._map = mmap.mmap(f.fileno(), self.SIZE)
+        return self._map
+
+    def publish(self, info: dict, published_at: float):
+        payload = json.dumps(info, separators=(",", ":")).encode("utf-8")
+        if len(payload) > self.SIZE - self._HEADER.size:
+            raise ValueError("price info too large for the shared slot")
+        buf = self._mapped()
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            try:
+                seq = self._HEADER.unpack_from(buf, 0)[0]
+                seq += 1 if seq % 2 == 0 else 0  # odd: write in progress
+                self._HEADER.pack_into(buf, 0, seq, 0.0, 0)
+                buf[self._HEADER.size:self._HEADER.size + len(payload)] = payload
+                self._HEADER.pack_into(buf, 0, seq + 1, published_at, len(payload))
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+    def read(self):
+        """
+        Returns (info, published_at) for the latest published price, or None
+        if nothing has been published yet.
+        """
+        buf = self._mapped()
+        for _ in range(100):
+            seq, published_at, length = self._HEADER.unpack_from(buf, 0)
+            if seq == 0:
+                return None
+            if seq % 2:
+                continue
+            cached_seq, cached = self._cached
+            if seq == cached_seq:
+                return cached
+            payload = buf[self._HEADER.size:self._HEADER.size + length]
+            if self._HEADER.unpack_from(buf, 0)[0] != seq:
+                continue  # overwritten while copying
+            try:
+                value = (json.loads(payload), published_at)
+            except ValueError:
+                continue
+            self._cached = (seq, value)
+            return value
+        return None
+
+
+def worker_stats():
+    return {
+        "pid": os.getpid(),
+        "workers": WORKERS,
+        "leader": worker_leader.is_leader() if worker_leader is not None else True,
+    }
+
+
+worker_leader = WorkerLeader(os.path.join(SHARED_STATE_DIR, "leader.lock")) if multi_worker() else None
+shared_price = SharedPrice(os.path.join(SHARED_STATE_DIR, "gold_price.mmap")) if multi_worker() else None
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import threading
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one: the first caller
+    (the leader) runs the function, callers arriving while it is in flight
+    wait for and share its result or exception. Nothing is kept once the call
+    finishes; this is deduplication of in-flight work, not a cache.
+
+    `run`/`arun` return (result, shared), where shared is True for callers
+    that got another caller's result. Sync and async calls are tracked
+    separately.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._tasks = {}
+        self._counters = {"issued": 0, "coalesced": 0}
+
+    def _count(self, key):
+        self._counters[key] += 1
+
+    def run(self, key, fn):
+        if not self.enabled:
+            return fn(), False
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            self._count("issued" if leader else "coalesced")
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result, False
+
+    async def arun(self, key, fn):
+        """
+        Async variant of `run`; `fn()` returns an awaitable. The shared call
+        runs as its own task, so a caller being cancelled (e.g. the leader's
+        client disconnecting) does not cancel it for the others.
+        """
+        if not self.enabled:
+            return await fn(), False
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            task = self._tasks.get(key)
+            leader = task is None or task.get_loop() is not loop
+            if leader:
+                task = self._tasks[key] = asyncio.ensure_future(fn())
+                task.add_done_callback(lambda t: self._forget(key, t))
+            self._count("issued" if leader else "coalesced")
+        return await asyncio.shield(task), not leader
+
+    def _forget(self, key, task):
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # retrieved, even if every waiter has gone
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls) + len(self._tasks)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        total = stats["issued"] + stats["coalesced"]
+        stats["coalesced_ratio"] = round(stats["coalesced"] / total, 4) if total else 0.0
+        stats["in_flight"] = self.in_flight()
+        return stats
+
+    def render_prometheus(self, name, prefix="gold_agent") -> str:
+        with self._lock:
+            stats = dict(self._counters)
+        lines = [f"# TYPE {prefix}_{name}_calls_total counter"]
+        lines += [f'{prefix}_{name}_calls_total{{outcome="{k}"}} {v}' for k, v in stats.items()]
+        return "\n".join(lines) + "\n"
+
+
+# Identical opening questions asked at the same time share one LLM call
+llm_flights = SingleFlight(enabled=os.getenv("LLM_COALESCE", "1") != "0")